@@ -0,0 +1,99 @@
+import copy
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.utils import load_backend
+
+
+class Command(BaseCommand):
+    help = (
+        'Измеряет накладные расходы на соединение с БД в расчете на запрос: '
+        'без переиспользования, с постоянными соединениями и с пулом (MySQL)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Сколько запросов имитировать в каждом режиме')
+        parser.add_argument('--database', default='default', help='Псевдоним базы данных')
+
+    def _modes(self, settings_dict):
+        engine = settings_dict['ENGINE']
+        pooled = engine == 'baybyway.db.mysql_pool'
+        direct_engine = 'django.db.backends.mysql' if pooled else engine
+        options = copy.deepcopy(settings_dict['OPTIONS'])
+        pool_options = options.pop('pool', {})
+        modes = {
+            'no-reuse': {'ENGINE': direct_engine, 'OPTIONS': options, 'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False},
+            'persistent': {'ENGINE': direct_engine, 'OPTIONS': options, 'CONN_MAX_AGE': 60, 'CONN_HEALTH_CHECKS': True},
+        }
+        # Пул реализован только для MySQL
+        if direct_engine == 'django.db.backends.mysql':
+            modes['pool'] = {
+                'ENGINE': 'baybyway.db.mysql_pool',
+                'OPTIONS': {**options, 'pool': pool_options},
+                'CONN_MAX_AGE': 0,
+                'CONN_HEALTH_CHECKS': False,
+            }
+        return modes
+
+    def _run(self, alias, settings_dict, requests):
+        wrapper = load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, alias)
+        pooled = settings_dict['ENGINE'] == 'baybyway.db.mysql_pool'
+        # В режиме пула get_new_connection - это выдача из пула, а не подключение
+        checkouts = 0
+        get_new_connection = wrapper.get_new_connection
+
+        def counting_get_new_connection(conn_params):
+            nonlocal checkouts
+            checkouts += 1
+            return get_new_connection(conn_params)
+
+        wrapper.get_new_connection = counting_get_new_connection
+        timings = []
+        try:
+            for _ in range(requests):
+                started = time.perf_counter()
+                # request_started / request_finished вызывают close_old_connections()
+                wrapper.close_if_unusable_or_obsolete()
+                with wrapper.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                    cursor.fetchone()
+                wrapper.close_if_unusable_or_obsolete()
+                timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            wrapper.close()
+            connects = checkouts
+            if pooled:
+                from baybyway.db.mysql_pool.base import close_pool, get_pool
+
+                # Пул уже создан первым запросом; connect не понадобится
+                connects = get_pool(alias, None, wrapper.pool_options).created
+                close_pool(alias)
+        return timings, connects, checkouts
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        requests = options['requests']
+        base_settings = connections[alias].settings_dict
+
+        results = {}
+        for mode, overrides in self._modes(base_settings).items():
+            settings_dict = copy.deepcopy(base_settings)
+            settings_dict.update(overrides)
+            timings, connects, checkouts = self._run(f'{alias}_benchmark_{mode}', settings_dict, requests)
+            timings.sort()
+            results[mode] = statistics.mean(timings)
+            self.stdout.write(
+                f'{mode:<11} среднее {statistics.mean(timings):7.3f} мс, '
+                f'p50 {timings[len(timings) // 2]:7.3f} мс, '
+                f'p95 {timings[int(len(timings) * 0.95) - 1]:7.3f} мс, '
+                f'соединений {connects}'
+                + (f' (выдач из пула {checkouts})' if connects != checkouts else '')
+            )
+
+        baseline = results.pop('no-reuse')
+        for mode, mean in results.items():
+            self.stdout.write(self.style.SUCCESS(
+                f'{mode}: экономия {baseline - mean:.3f} мс на запрос ({(1 - mean / baseline) * 100:.0f}%)'
+            ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from baybyway.assets import build_bundles
+
+
+class Command(BaseCommand):
+    help = 'Собирает и минифицирует общие CSS/JS из assets/ в static/bundles/'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Только проверить, что бандлы актуальны')
+
+    def handle(self, *args, **options):
+        changed = build_bundles(check=options['check'])
+        if options['check'] and changed:
+            raise CommandError(f'Бандлы устарели, выполните build_assets: {", ".join(changed)}')
+        self.stdout.write(self.style.SUCCESS(f'Пересобрано бандлов: {len(changed)}'))
@@ -0,0 +1,31 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from baybyway.images import IMAGE_FIELDS, hash_field_name, process_image
+
+
+class Command(BaseCommand):
+    help = 'Строит недостающие миниатюры (WebP/JPEG) для фотографий профилей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Перестроить миниатюры всех фото заново')
+
+    def handle(self, *args, **options):
+        force = options['force']
+        processed = failed = 0
+        for model_label, field_name in IMAGE_FIELDS:
+            queryset = apps.get_model(model_label).objects.exclude(**{field_name: ''}).exclude(
+                **{f'{field_name}__isnull': True}
+            )
+            if not force:
+                queryset = queryset.filter(**{hash_field_name(field_name): ''})
+            for pk in queryset.values_list('pk', flat=True).iterator():
+                try:
+                    process_image(model_label, pk, field_name, force=force)
+                except Exception as exc:
+                    failed += 1
+                    self.stderr.write(f'{model_label} #{pk}: {exc}')
+                else:
+                    processed += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Обработано фото: {processed}, с ошибками: {failed}'))
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from baybyway.synthetic import DEFAULT_VOLUMES, PASSWORD, ScaleDataGenerator
+
+
+class Command(BaseCommand):
+    help = (
+        'Создает большой объем синтетических данных для нагрузочного тестирования '
+        '(пользователи, блог, форум, трекер) через bulk_create пачками'
+    )
+
+    def add_arguments(self, parser):
+        for name, default in DEFAULT_VOLUMES.items():
+            parser.add_argument(f'--{name.replace("_", "-")}', type=int, default=default, dest=name)
+        parser.add_argument('--days', type=int, default=365, help='За сколько последних дней распределять даты')
+        parser.add_argument('--seed', type=int, default=42, help='Зерно генератора: одинаковый seed - одинаковые данные')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Строк в одном bulk_create')
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Процессов для параллельного заполнения независимых таблиц (для SQLite оставьте 1)',
+        )
+
+    def handle(self, *args, **options):
+        volumes = {name: options[name] for name in DEFAULT_VOLUMES}
+        generator = ScaleDataGenerator(
+            volumes,
+            seed=options['seed'],
+            days=options['days'],
+            chunk_size=options['chunk_size'],
+            log=self.stdout.write,
+        )
+        started = time.monotonic()
+        try:
+            generator.run(workers=options['workers'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.monotonic() - started:.1f} с; пароль пользователей load_*: {PASSWORD}'
+        ))
@@ -0,0 +1,62 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from baybyway.benchmark import BenchmarkPlan, BenchmarkRunner, summarize
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогоняет взвешенную смесь ключевых страниц (форум, блог, справочник, трекер) '
+        'и выводит p50/p95/p99 по каждой странице'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Сколько запросов учитывать')
+        parser.add_argument('--warmup', type=int, default=50, help='Сколько запросов выполнить до замера')
+        parser.add_argument('--concurrency', type=int, default=1, help='Число параллельных потоков')
+        parser.add_argument(
+            '--base-url',
+            help='Адрес запущенного сервера, например http://127.0.0.1:8000; без него - в процессе через test Client',
+        )
+        parser.add_argument('--seed', type=int, default=42, help='Зерно выбора страниц: одинаковый seed - одинаковая смесь')
+        parser.add_argument('--json', dest='json_path', help='Сохранить результат в JSON для сравнения прогонов')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1 or options['warmup'] < 0:
+            raise CommandError('--requests и --concurrency должны быть положительными, --warmup - неотрицательным')
+        try:
+            plan = BenchmarkPlan(seed=options['seed'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        for endpoint in plan.skipped:
+            self.stdout.write(self.style.WARNING(f'Пропущена {endpoint.url_name}: нет данных или пользователя'))
+        if settings.DEBUG and not options['base_url']:
+            self.stdout.write(self.style.WARNING('DEBUG=True: запись SQL-запросов в памяти искажает время ответа'))
+
+        runner = BenchmarkRunner(base_url=options['base_url'], concurrency=options['concurrency'])
+        if options['warmup']:
+            runner.run(plan.schedule(options['warmup']))
+        results, total = runner.run(plan.schedule(options['requests']))
+        rows, overall = summarize(results, total)
+
+        header = f'{"Страница":<32}{"Запросов":>9}{"Ошибок":>8}{"p50":>9}{"p95":>9}{"p99":>9}{"Среднее":>9}'
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for row in rows + [overall]:
+            self.stdout.write(
+                f'{row["endpoint"]:<32}{row["count"]:>9}{row["errors"]:>8}'
+                f'{row["p50"]:>9.1f}{row["p95"]:>9.1f}{row["p99"]:>9.1f}{row["mean"]:>9.1f}'
+            )
+        self.stdout.write(f'Время в мс; {overall["rps"]} запросов/с за {total:.1f} с, потоков: {options["concurrency"]}')
+
+        if options['json_path']:
+            with open(options['json_path'], 'w', encoding='utf-8') as target:
+                json.dump({'options': {
+                    key: options[key] for key in ('requests', 'warmup', 'concurrency', 'base_url', 'seed')
+                }, 'endpoints': rows, 'overall': overall}, target, ensure_ascii=False, indent=2)
+
+        if overall['errors']:
+            self.stdout.write(self.style.WARNING(f'Ответов с ошибкой: {overall["errors"]}'))
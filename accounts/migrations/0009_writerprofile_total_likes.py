@@ -0,0 +1,62 @@
+# Generated by Django 5.2.6 on 2026-10-19 11:51
+
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import migrations, models
+
+
+def backfill_writer_statistics(apps, schema_editor):
+    """Исходные значения для инкрементальной статистики писателей"""
+    WriterProfile = apps.get_model('accounts', 'WriterProfile')
+    BlogPost = apps.get_model('blog', 'BlogPost')
+    BlogLike = apps.get_model('blog', 'BlogLike')
+
+    posts = {
+        row['author_id']: row
+        for row in BlogPost.objects.values('author_id').annotate(
+            articles=models.Count('id'),
+            views=models.Sum('views_count'),
+            read_time=models.Sum('read_time'),
+        ).order_by()
+    }
+    likes = dict(
+        BlogLike.objects.values('post__author_id').annotate(total=models.Count('id'))
+        .order_by().values_list('post__author_id', 'total')
+    )
+
+    writers = list(WriterProfile.objects.all())
+    for writer in writers:
+        row = posts.get(writer.user_id, {})
+        writer.articles_count = row.get('articles', 0)
+        writer.total_views = row.get('views') or 0
+        writer.total_read_time = row.get('read_time') or 0
+        writer.total_likes = likes.get(writer.user_id, 0)
+        if writer.articles_count:
+            rating = (Decimal(writer.total_likes) / writer.articles_count).quantize(
+                Decimal('0.01'), rounding=ROUND_HALF_UP
+            )
+            writer.average_rating = min(rating, Decimal('9.99'))
+        else:
+            writer.average_rating = Decimal('0')
+    WriterProfile.objects.bulk_update(
+        writers,
+        ['articles_count', 'total_views', 'total_read_time', 'total_likes', 'average_rating'],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_parentprofile_photo'),
+        ('blog', '0004_blogdislike'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='writerprofile',
+            name='total_likes',
+            field=models.PositiveIntegerField(default=0, verbose_name='Общее количество лайков'),
+        ),
+        migrations.RunPython(backfill_writer_statistics, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_writerprofile_total_likes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='parentprofile',
+            name='photo_hash',
+            field=models.CharField(blank=True, editable=False, max_length=32, verbose_name='Хеш миниатюр'),
+        ),
+        migrations.AddField(
+            model_name='writerprofile',
+            name='photo_hash',
+            field=models.CharField(blank=True, editable=False, max_length=32, verbose_name='Хеш миниатюр'),
+        ),
+    ]
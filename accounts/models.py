@@ -3,6 +3,8 @@ from django.contrib.auth.models import User
 from django.utils.translation import gettext_lazy as _
 import uuid
 
+from baybyway.images import StoredImageNamesMixin
+
 
 class Family(models.Model):
     """Модель семьи для связи родителей"""
@@ -53,7 +55,7 @@ class Child(models.Model):
         return today.year - self.birth_date.year - ((today.month, today.day) < (self.birth_date.month, self.birth_date.day))
 
 
-class ParentProfile(models.Model):
+class ParentProfile(StoredImageNamesMixin, models.Model):
     ROLE_CHOICES = [
         ('mom', _('Мама')),
         ('dad', _('Папа')),
@@ -74,6 +76,7 @@ class ParentProfile(models.Model):
     city = models.CharField(max_length=100, verbose_name=_('Город проживания'), null=True, blank=True)
     workplace = models.CharField(max_length=200, verbose_name=_('Место работы'), null=True, blank=True)
     photo = models.ImageField(upload_to='parent_photos/', verbose_name=_('Фотография профиля'), null=True, blank=True)
+    photo_hash = models.CharField(max_length=32, blank=True, editable=False, verbose_name=_('Хеш миниатюр'))
     family = models.ForeignKey(Family, on_delete=models.CASCADE, related_name='parents', verbose_name=_('Семья'), null=True, blank=True)
     family_code = models.CharField(max_length=10, unique=True, verbose_name=_('Код семьи'), null=True, blank=True)
     
@@ -129,7 +132,7 @@ class ParentProfile(models.Model):
         return self.user_type == 'parent'
 
 
-class WriterProfile(models.Model):
+class WriterProfile(StoredImageNamesMixin, models.Model):
     """Профиль писателя"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='accounts_writer_profile', verbose_name=_('Пользователь'))
     first_name = models.CharField(max_length=100, verbose_name=_('Имя'))
@@ -139,6 +142,7 @@ class WriterProfile(models.Model):
     password = models.CharField(max_length=128, blank=True, verbose_name=_('Пароль'))
     phone = models.CharField(max_length=20, blank=True, verbose_name=_('Телефон'))
     photo = models.ImageField(upload_to='writers/', blank=True, verbose_name=_('Фото'))
+    photo_hash = models.CharField(max_length=32, blank=True, editable=False, verbose_name=_('Хеш миниатюр'))
     bio = models.TextField(blank=True, verbose_name=_('Биография'))
     
     # Писательская информация
@@ -153,6 +157,7 @@ class WriterProfile(models.Model):
     total_views = models.PositiveIntegerField(default=0, verbose_name=_('Общее количество просмотров'))
     total_read_time = models.PositiveIntegerField(default=0, verbose_name=_('Общее время чтения (мин)'))
     average_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0, verbose_name=_('Средний рейтинг'))
+    total_likes = models.PositiveIntegerField(default=0, verbose_name=_('Общее количество лайков'))
     
     is_active = models.BooleanField(default=True, verbose_name=_('Активен'))
     is_approved = models.BooleanField(default=False, verbose_name=_('Одобрен'))
@@ -186,31 +191,31 @@ class WriterProfile(models.Model):
         return check_password(raw_password, self.password)
     
     def update_statistics(self):
-        """Обновить статистику писателя"""
+        """
+        Полный пересчет статистики писателя.
+
+        В обычной работе статистика поддерживается инкрементально
+        (blog.services.WriterStatisticsService), метод нужен для исправления
+        расхождений.
+        """
         from blog.models import BlogPost
         from blog.models import BlogLike
+        from blog.services import WriterStatisticsService
         
-        # Подсчет статей
-        self.articles_count = BlogPost.objects.filter(author=self.user).count()
-        
-        # Подсчет просмотров
-        self.total_views = BlogPost.objects.filter(author=self.user).aggregate(
-            total_views=models.Sum('views_count')
-        )['total_views'] or 0
-        
-        # Подсчет времени чтения
-        self.total_read_time = BlogPost.objects.filter(author=self.user).aggregate(
-            total_read_time=models.Sum('read_time')
-        )['total_read_time'] or 0
-        
-        # Подсчет рейтинга
-        likes = BlogLike.objects.filter(post__author=self.user).count()
-        if self.articles_count > 0:
-            self.average_rating = likes / self.articles_count
-        else:
-            self.average_rating = 0
+        totals = BlogPost.objects.filter(author=self.user).aggregate(
+            articles_count=models.Count('id'),
+            total_views=models.Sum('views_count'),
+            total_read_time=models.Sum('read_time'),
+        )
+        self.articles_count = totals['articles_count']
+        self.total_views = totals['total_views'] or 0
+        self.total_read_time = totals['total_read_time'] or 0
+        self.total_likes = BlogLike.objects.filter(post__author=self.user).count()
+        self.average_rating = WriterStatisticsService.rating(self.total_likes, self.articles_count)
         
-        self.save()
+        self.save(update_fields=[
+            'articles_count', 'total_views', 'total_read_time', 'total_likes', 'average_rating', 'updated_at'
+        ])
 
 
 class WriterApplication(models.Model):
@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
+
+
+# Роли пользователей, которые проверяются в шаблонах и представлениях
+ROLE_SUPPORT = 'support'
+ROLE_WRITER = 'writer'
+ROLE_DOCTOR = 'doctor'
+ROLE_FACILITY = 'facility'
+ROLE_CONSULTANT = 'consultant'
+# Родитель с типом пользователя "писатель" (дашборд приложения writer)
+ROLE_PARENT_WRITER = 'parent_writer'
+
+ROLES = (ROLE_SUPPORT, ROLE_WRITER, ROLE_DOCTOR, ROLE_FACILITY, ROLE_CONSULTANT, ROLE_PARENT_WRITER)
+
+CACHE_KEY_TEMPLATE = 'user_roles:{user_id}'
+
+
+def _cache_key(user_id):
+    return CACHE_KEY_TEMPLATE.format(user_id=user_id)
+
+
+def _compute_roles(user_id):
+    """Определяет все роли пользователя одним запросом"""
+    from support.models import SupportProfile
+    from healthcare.models import Doctor
+    from healthcare_requests.models import HealthcareFacilityRequest
+    from consultant.models import ConsultantProfile
+    from .models import ParentProfile, WriterProfile
+
+    row = User.objects.filter(pk=user_id).annotate(
+        **{
+            ROLE_SUPPORT: Exists(SupportProfile.objects.filter(user=OuterRef('pk'), is_active=True)),
+            ROLE_WRITER: Exists(WriterProfile.objects.filter(user=OuterRef('pk'))),
+            ROLE_DOCTOR: Exists(Doctor.objects.filter(user=OuterRef('pk'))),
+            ROLE_FACILITY: Exists(HealthcareFacilityRequest.objects.filter(
+                username=OuterRef('username'),
+                status='approved'
+            )),
+            ROLE_CONSULTANT: Exists(ConsultantProfile.objects.filter(user=OuterRef('pk'))),
+            ROLE_PARENT_WRITER: Exists(ParentProfile.objects.filter(user=OuterRef('pk'), user_type='writer')),
+        }
+    ).values(*ROLES).first()
+
+    if row is None:
+        return frozenset()
+    return frozenset(role for role in ROLES if row[role])
+
+
+def get_user_roles(user):
+    """
+    Возвращает множество ролей пользователя.
+
+    Роли хранятся в общем кеше и дополнительно запоминаются на объекте
+    пользователя, поэтому повторные проверки в пределах запроса не обращаются
+    ни к базе, ни к кешу.
+    """
+    if not user or not user.is_authenticated:
+        return frozenset()
+
+    roles = getattr(user, '_cached_roles', None)
+    if roles is None:
+        key = _cache_key(user.pk)
+        roles = cache.get(key)
+        if roles is None:
+            roles = _compute_roles(user.pk)
+            cache.set(key, roles, getattr(settings, 'USER_ROLES_CACHE_TIMEOUT', 3600))
+        user._cached_roles = roles
+    return roles
+
+
+def has_role(user, role):
+    """Проверяет, есть ли у пользователя указанная роль"""
+    return role in get_user_roles(user)
+
+
+def invalidate_user_roles(user_id):
+    """Сбрасывает закешированные роли пользователя"""
+    if user_id:
+        cache.delete(_cache_key(user_id))
@@ -0,0 +1,53 @@
+from functools import partial
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from baybyway.images import IMAGE_FIELDS, DerivativeQueue, image_changed
+from .roles import invalidate_user_roles
+
+
+# Профили, наличие которых определяет роль пользователя
+ROLE_PROFILE_MODELS = (
+    'support.SupportProfile',
+    'accounts.WriterProfile',
+    'healthcare.Doctor',
+    'consultant.ConsultantProfile',
+    'accounts.ParentProfile',
+)
+
+
+def _invalidate_profile_owner(sender, instance, **kwargs):
+    invalidate_user_roles(instance.user_id)
+
+
+for model_label in ROLE_PROFILE_MODELS:
+    post_save.connect(_invalidate_profile_owner, sender=model_label, weak=False,
+                      dispatch_uid=f'roles_save_{model_label}')
+    post_delete.connect(_invalidate_profile_owner, sender=model_label, weak=False,
+                        dispatch_uid=f'roles_delete_{model_label}')
+
+
+@receiver(post_save, sender='healthcare_requests.HealthcareFacilityRequest')
+@receiver(post_delete, sender='healthcare_requests.HealthcareFacilityRequest')
+def invalidate_facility_roles(sender, instance, **kwargs):
+    """Учреждение связано с пользователем только по логину"""
+    for user_id in User.objects.filter(username=instance.username).values_list('id', flat=True):
+        invalidate_user_roles(user_id)
+
+
+def _schedule_derivatives(sender, instance, created=False, update_fields=None, field_name=None, **kwargs):
+    """Миниатюры строятся в фоне после фиксации транзакции, только для нового фото"""
+    if update_fields is not None and field_name not in update_fields:
+        return
+    if not image_changed(instance, field_name, created):
+        return
+    model_label = sender._meta.label
+    transaction.on_commit(lambda: DerivativeQueue.enqueue(model_label, instance.pk, field_name))
+
+
+for model_label, field_name in IMAGE_FIELDS:
+    post_save.connect(partial(_schedule_derivatives, field_name=field_name), sender=model_label, weak=False,
+                      dispatch_uid=f'image_derivatives_{model_label}')
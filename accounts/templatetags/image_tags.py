@@ -0,0 +1,40 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+from baybyway.images import image_variants
+
+register = template.Library()
+
+
+@register.simple_tag
+def picture(fieldfile, pixels, **attrs):
+    """
+    <picture> с миниатюрами WebP/JPEG под квадрат pixels x pixels (1x и 2x).
+    Пока миниатюры не построены, выводится оригинал.
+
+    {% picture profile.photo 80 alt="Фото" class="doctor-avatar" %}
+    """
+    if not fieldfile:
+        return ''
+    variants = image_variants(fieldfile, int(pixels))
+    if variants is None:
+        return format_html('<img src="{}"{}>', fieldfile.url, flatatt(attrs))
+
+    webp, jpg = variants['webp'], variants['jpg']
+    return format_html(
+        '<picture style="display: contents;">'
+        '<source type="image/webp" srcset="{} 1x, {} 2x">'
+        '<img src="{}" srcset="{} 1x, {} 2x"{}>'
+        '</picture>',
+        webp[0], webp[1], jpg[0], jpg[0], jpg[1], flatatt(attrs)
+    )
+
+
+@register.simple_tag
+def thumbnail_url(fieldfile, pixels):
+    """URL JPEG-миниатюры (или оригинала, пока миниатюр нет)"""
+    if not fieldfile:
+        return ''
+    variants = image_variants(fieldfile, int(pixels))
+    return variants['jpg'][0] if variants else fieldfile.url
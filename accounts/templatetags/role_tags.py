@@ -0,0 +1,14 @@
+from django import template
+
+from accounts.roles import has_role as user_has_role
+
+register = template.Library()
+
+
+@register.filter
+def has_role(user, role):
+    """
+    Роль пользователя из кеша ролей, например
+    {% if user|has_role:'parent_writer' %}
+    """
+    return user_has_role(user, role)
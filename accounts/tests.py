@@ -1,3 +1,78 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.template import Context, Template
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from baybyway.synthetic import ScaleDataGenerator
+from forum.models import ForumCategory
+from support.models import SupportProfile
+
+from .models import Family, ParentProfile, WriterProfile
+from .roles import ROLE_PARENT_WRITER, ROLE_SUPPORT, ROLE_WRITER, get_user_roles, has_role
+
+
+class ScaleDataGeneratorTest(TestCase):
+    volumes = {'users': 20, 'blog_posts': 0, 'topics': 5, 'forum_posts': 0, 'tracker_rows': 0}
+
+    def generator(self):
+        return ScaleDataGenerator(self.volumes, chunk_size=50, log=lambda message: None)
+
+    def test_second_run_with_same_seed(self):
+        ForumCategory.objects.create(name='Сон')
+        self.generator().run()
+        families = Family.objects.count()
+        self.generator().run()
+        self.assertEqual(User.objects.count(), 40)
+        self.assertEqual(Family.objects.count(), 2 * families)
+
+    def test_missing_categories_insert_nothing(self):
+        with self.assertRaisesMessage(ValueError, 'create_sample_forum_data'):
+            self.generator().run()
+        self.assertFalse(User.objects.exists())
+
+
+class UserRolesCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user('writer', password='x')
+
+    def roles(self):
+        # Новый объект пользователя, как в следующем запросе
+        return get_user_roles(User.objects.get(pk=self.user.pk))
+
+    def test_roles_are_computed_once(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(get_user_roles(self.user), frozenset())
+        with self.assertNumQueries(0):
+            self.assertFalse(has_role(self.user, ROLE_WRITER))
+            self.assertEqual(get_user_roles(User(pk=self.user.pk, username='writer')), frozenset())
+
+    def test_profile_changes_invalidate_roles(self):
+        self.assertEqual(self.roles(), frozenset())
+        profile = WriterProfile.objects.create(user=self.user, first_name='А', last_name='Б', email='a@example.com')
+        self.assertEqual(self.roles(), {ROLE_WRITER})
+        profile.delete()
+        self.assertEqual(self.roles(), frozenset())
+
+        parent = ParentProfile.objects.create(user=self.user)
+        self.assertEqual(self.roles(), frozenset())
+        parent.user_type = 'writer'
+        parent.save()
+        self.assertEqual(self.roles(), {ROLE_PARENT_WRITER})
+
+        support = SupportProfile.objects.create(user=self.user, employee_id='S1', department='-', phone='1')
+        self.assertIn(ROLE_SUPPORT, self.roles())
+        support.is_active = False
+        support.save()
+        self.assertNotIn(ROLE_SUPPORT, self.roles())
+
+    def test_template_filter_and_views_use_cache(self):
+        ParentProfile.objects.create(user=self.user, user_type='writer')
+        template = Template("{% load role_tags %}{% if user|has_role:'parent_writer' %}writer{% endif %}")
+        self.assertEqual(template.render(Context({'user': self.user})), 'writer')
+
+        self.client.login(username='writer', password='x')
+        response = self.client.get(reverse('accounts:writer_dashboard'))
+        self.assertRedirects(response, reverse('accounts:writer_login'), fetch_redirect_response=False)
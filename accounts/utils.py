@@ -1,6 +1,8 @@
 from django.shortcuts import redirect
 from django.urls import reverse
 
+from .roles import has_role, ROLE_PARENT_WRITER, ROLE_SUPPORT
+
 
 def get_user_redirect_url(user):
     """Определяет URL для перенаправления пользователя после авторизации"""
@@ -9,11 +11,11 @@ def get_user_redirect_url(user):
         return None
     
     # Сотрудники техподдержки
-    if hasattr(user, 'supportprofile') and user.supportprofile.is_active:
+    if has_role(user, ROLE_SUPPORT):
         return reverse('support:dashboard')
     
     # Писатели
-    if hasattr(user, 'parent_profile') and user.parent_profile.is_writer:
+    if has_role(user, ROLE_PARENT_WRITER):
         return reverse('writer:dashboard')
     
     # Обычные пользователи (родители) - остаются на главной странице
@@ -4,18 +4,23 @@ from django.contrib.auth import login, authenticate
 from django.contrib import messages
 from django.utils.translation import gettext_lazy as _
 from django.core.paginator import Paginator
-from django.db.models import Count, Sum, Avg
+from django.db.models import Count, Sum, Q
 from django.utils import timezone
+from django.utils.formats import date_format
 from datetime import timedelta
+from baybyway.db.routing import replica_reads
+from baybyway.timeseries import TimeSeriesService
 from .models import WriterProfile
+from .roles import has_role, ROLE_WRITER
 from .forms import WriterLoginForm, WriterProfileForm, WriterPasswordForm
-from blog.models import BlogPost, BlogAnalytics
+from blog.models import BlogPost
+from blog.services import WriterAnalyticsService
 
 
 def writer_login(request):
     """Вход для писателей"""
     # Если писатель уже авторизован, перенаправляем на дашборд
-    if request.user.is_authenticated and hasattr(request.user, 'accounts_writer_profile'):
+    if has_role(request.user, ROLE_WRITER):
         return redirect('accounts:writer_dashboard')
     
     if request.method == 'POST':
@@ -75,53 +80,45 @@ def writer_login(request):
 def writer_dashboard(request):
     """Дашборд писателя"""
     # Проверяем, что пользователь является писателем
-    if not hasattr(request.user, 'accounts_writer_profile'):
+    if not has_role(request.user, ROLE_WRITER):
         messages.error(request, _('Доступ запрещен. Только для писателей.'))
         return redirect('accounts:writer_login')
     
     writer = request.user.accounts_writer_profile
     
-    # Обновляем статистику
-    writer.update_statistics()
-    
-    # Получаем статистику статей
+    # Статистика писателя поддерживается инкрементально (WriterStatisticsService),
+    # здесь только счетчики по статусам одним агрегатом
     articles = BlogPost.objects.filter(author=request.user)
-    published_articles = articles.filter(status='published')
-    pending_articles = articles.filter(status='pending')
-    draft_articles = articles.filter(status='draft')
-    
-    # Статистика за последние 30 дней
     thirty_days_ago = timezone.now() - timedelta(days=30)
-    recent_articles = articles.filter(created_at__gte=thirty_days_ago)
-    recent_views = articles.filter(created_at__gte=thirty_days_ago).aggregate(
-        total_views=Sum('views_count')
-    )['total_views'] or 0
+    counts = articles.aggregate(
+        published_count=Count('id', filter=Q(status='published')),
+        pending_count=Count('id', filter=Q(status='pending')),
+        draft_count=Count('id', filter=Q(status='draft')),
+        recent_articles_count=Count('id', filter=Q(created_at__gte=thirty_days_ago)),
+        recent_views=Sum('views_count', filter=Q(created_at__gte=thirty_days_ago)),
+    )
     
     # Топ статей по просмотрам
-    top_articles = published_articles.order_by('-views_count')[:5]
-    
-    # Статистика по месяцам
-    monthly_stats = []
-    for i in range(6):
-        month_start = timezone.now() - timedelta(days=30*i)
-        month_end = month_start + timedelta(days=30)
-        month_articles = articles.filter(created_at__gte=month_start, created_at__lt=month_end).count()
-        monthly_stats.append({
-            'month': month_start.strftime('%B'),
-            'articles': month_articles
-        })
+    top_articles = articles.filter(status='published').order_by('-views_count')[:5]
+    
+    # Статистика по календарным месяцам, от текущего к прошлым
+    series = TimeSeriesService.get_series(articles, f'writer_articles:{request.user.pk}')
+    monthly_stats = [
+        {'month': date_format(point['period'], 'F'), 'articles': point['value']}
+        for point in reversed(series)
+    ]
     
     context = {
         'writer': writer,
-        'articles_count': articles.count(),
-        'published_count': published_articles.count(),
-        'pending_count': pending_articles.count(),
-        'draft_count': draft_articles.count(),
+        'articles_count': writer.articles_count,
+        'published_count': counts['published_count'],
+        'pending_count': counts['pending_count'],
+        'draft_count': counts['draft_count'],
         'total_views': writer.total_views,
         'total_read_time': writer.total_read_time,
         'average_rating': writer.average_rating,
-        'recent_articles_count': recent_articles.count(),
-        'recent_views': recent_views,
+        'recent_articles_count': counts['recent_articles_count'],
+        'recent_views': counts['recent_views'] or 0,
         'top_articles': top_articles,
         'monthly_stats': monthly_stats,
         'title': _('Дашборд писателя')
@@ -133,7 +130,7 @@ def writer_dashboard(request):
 @login_required
 def writer_articles(request):
     """Статьи писателя"""
-    if not hasattr(request.user, 'accounts_writer_profile'):
+    if not has_role(request.user, ROLE_WRITER):
         messages.error(request, _('Доступ запрещен. Только для писателей.'))
         return redirect('accounts:writer_login')
     
@@ -169,7 +166,7 @@ def writer_articles(request):
 @login_required
 def writer_article_create(request):
     """Создание статьи"""
-    if not hasattr(request.user, 'accounts_writer_profile'):
+    if not has_role(request.user, ROLE_WRITER):
         messages.error(request, _('Доступ запрещен. Только для писателей.'))
         return redirect('accounts:writer_login')
     
@@ -212,7 +209,7 @@ def writer_article_create(request):
 @login_required
 def writer_article_edit(request, article_id):
     """Редактирование статьи"""
-    if not hasattr(request.user, 'accounts_writer_profile'):
+    if not has_role(request.user, ROLE_WRITER):
         messages.error(request, _('Доступ запрещен. Только для писателей.'))
         return redirect('accounts:writer_login')
     
@@ -240,53 +237,26 @@ def writer_article_edit(request, article_id):
 
 
 @login_required
+@replica_reads
 def writer_analytics(request):
     """Аналитика писателя"""
-    if not hasattr(request.user, 'accounts_writer_profile'):
+    if not has_role(request.user, ROLE_WRITER):
         messages.error(request, _('Доступ запрещен. Только для писателей.'))
         return redirect('accounts:writer_login')
     
     writer = request.user.accounts_writer_profile
     
-    # Получаем аналитику
-    articles = BlogPost.objects.filter(author=request.user, status='published')
-    
-    # Статистика по статьям
-    article_stats = []
-    for article in articles:
-        analytics = BlogAnalytics.objects.filter(blog_post=article)
-        stats = {
-            'article': article,
-            'views': article.views_count,
-            'read_time': article.read_time,
-            'readers_count': analytics.count(),
-            'avg_progress': analytics.aggregate(avg_progress=Avg('read_progress'))['avg_progress'] or 0,
-            'avg_duration': analytics.aggregate(avg_duration=Avg('view_duration'))['avg_duration'] or 0,
-        }
-        article_stats.append(stats)
-    
-    # Статистика читателей
-    all_analytics = BlogAnalytics.objects.filter(blog_post__author=request.user)
-    
-    # По возрасту
-    age_stats = all_analytics.values('user_age').annotate(count=Count('id')).order_by('user_age')
-    
-    # По полу
-    gender_stats = all_analytics.values('user_gender').annotate(count=Count('id'))
-    
-    # По городам
-    city_stats = all_analytics.values('user_city').annotate(count=Count('id')).order_by('-count')[:10]
-    
-    # По устройствам
-    device_stats = all_analytics.values('device_type').annotate(count=Count('id'))
+    # Статистика по статьям и читателям - по одному агрегирующему запросу
+    article_stats = WriterAnalyticsService.get_article_stats(request.user)
+    demographics = WriterAnalyticsService.get_demographics(request.user)
     
     context = {
         'writer': writer,
         'article_stats': article_stats,
-        'age_stats': age_stats,
-        'gender_stats': gender_stats,
-        'city_stats': city_stats,
-        'device_stats': device_stats,
+        'age_stats': demographics['age_stats'],
+        'gender_stats': demographics['gender_stats'],
+        'city_stats': demographics['city_stats'],
+        'device_stats': demographics['device_stats'],
         'title': _('Аналитика')
     }
     
@@ -296,7 +266,7 @@ def writer_analytics(request):
 @login_required
 def writer_profile_edit(request):
     """Редактирование профиля писателя"""
-    if not hasattr(request.user, 'accounts_writer_profile'):
+    if not has_role(request.user, ROLE_WRITER):
         messages.error(request, _('Доступ запрещен. Только для писателей.'))
         return redirect('accounts:writer_login')
     
@@ -323,7 +293,7 @@ def writer_profile_edit(request):
 @login_required
 def writer_password_change(request):
     """Смена пароля писателя"""
-    if not hasattr(request.user, 'accounts_writer_profile'):
+    if not has_role(request.user, ROLE_WRITER):
         messages.error(request, _('Доступ запрещен. Только для писателей.'))
         return redirect('accounts:writer_login')
     
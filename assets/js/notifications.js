@@ -0,0 +1,27 @@
+// Счетчик непрочитанных уведомлений в навигации
+function updateNotificationCount() {
+    const countElement = document.getElementById('notification-count');
+    // Счетчик есть только у авторизованных пользователей
+    if (!countElement) {
+        return;
+    }
+    fetch('/notifications/api/count/')
+        .then(response => response.json())
+        .then(data => {
+            countElement.textContent = data.count;
+            if (data.count > 0) {
+                countElement.style.display = 'inline';
+            } else {
+                countElement.style.display = 'none';
+            }
+        })
+        .catch(error => console.error('Ошибка обновления счетчика уведомлений:', error));
+}
+
+// Обновляем счетчик при загрузке страницы и каждые 30 секунд
+document.addEventListener('DOMContentLoaded', function() {
+    if (document.getElementById('notification-count')) {
+        updateNotificationCount();
+        setInterval(updateNotificationCount, 30000);
+    }
+});
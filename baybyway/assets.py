@@ -0,0 +1,77 @@
+"""
+Сборка статических бандлов сайта.
+
+Исходники общих стилей и скриптов лежат в assets/. Команда build_assets
+склеивает их, минифицирует и пишет в static/bundles/, откуда они попадают
+в collectstatic. Отпечаток содержимого в имени файла добавляет
+CompressedManifestStaticFilesStorage, поэтому бандлы отдаются с
+долгоживущими заголовками кеширования.
+"""
+import re
+
+from django.conf import settings
+
+ASSETS_DIR = settings.BASE_DIR / 'assets'
+OUTPUT_DIR = settings.BASE_DIR / 'static'
+
+# Бандл (путь в static/) -> исходники из assets/ в порядке подключения
+BUNDLES = {
+    'bundles/base.css': ['css/base.css'],
+    'bundles/base.js': ['js/navbar.js', 'js/notifications.js'],
+}
+
+CSS_COMMENT_RE = re.compile(r'/\*.*?\*/', re.DOTALL)
+CSS_WHITESPACE_RE = re.compile(r'\s+')
+CSS_PUNCTUATION_RE = re.compile(r'\s*([{};,>])\s*')
+CSS_COLON_RE = re.compile(r':\s+')
+JS_LINE_COMMENT_RE = re.compile(r'^\s*//.*$', re.MULTILINE)
+
+
+def minify_css(text):
+    text = CSS_COMMENT_RE.sub('', text)
+    text = CSS_WHITESPACE_RE.sub(' ', text)
+    text = CSS_PUNCTUATION_RE.sub(r'\1', text)
+    # Пробел перед двоеточием не трогаем: в селекторе ".a :hover" он значим
+    text = CSS_COLON_RE.sub(':', text)
+    return text.replace(';}', '}').strip() + '\n'
+
+
+def minify_js(text):
+    """
+    Консервативная минификация без разбора синтаксиса: убираются строки-комментарии,
+    отступы и пустые строки. Переводы строк сохраняются, чтобы не зависеть
+    от автоматической расстановки точек с запятой.
+    """
+    text = JS_LINE_COMMENT_RE.sub('', text)
+    return '\n'.join(line.strip() for line in text.splitlines() if line.strip()) + '\n'
+
+
+MINIFIERS = {
+    '.css': minify_css,
+    '.js': minify_js,
+}
+
+
+def render_bundle(name):
+    """Содержимое бандла из текущих исходников"""
+    minify = MINIFIERS[name[name.rindex('.'):]]
+    sources = [(ASSETS_DIR / source).read_text(encoding='utf-8') for source in BUNDLES[name]]
+    return minify('\n'.join(sources))
+
+
+def build_bundles(check=False):
+    """
+    Пересобирает бандлы; возвращает список изменившихся.
+    При check=True файлы не пишутся - только проверяется, что они актуальны.
+    """
+    changed = []
+    for name in BUNDLES:
+        content = render_bundle(name)
+        target = OUTPUT_DIR / name
+        if target.exists() and target.read_text(encoding='utf-8') == content:
+            continue
+        changed.append(name)
+        if not check:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_text(content, encoding='utf-8')
+    return changed
@@ -0,0 +1,249 @@
+"""
+Нагрузочный прогон по смеси ключевых страниц.
+
+BenchmarkPlan выбирает из базы идентификаторы тем, статей, категорий и
+тегов (популярность по закону Ципфа, как у реального трафика) и строит
+детерминированную по seed последовательность запросов с весами ENDPOINTS.
+BenchmarkRunner выполняет ее либо в процессе через django.test.Client,
+либо по HTTP к запущенному серверу (base_url), в concurrency потоков,
+и собирает время ответа по каждой странице.
+
+Страницы для вошедших пользователей запрашиваются с сессией пользователя
+load_* из generate_scale_data; сессия создается напрямую в хранилище
+сессий, поэтому сервер должен работать с той же базой (или кешем).
+"""
+import math
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from importlib import import_module
+from typing import NamedTuple
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from baybyway.synthetic import TAGS, USERNAME_PREFIX, ZipfSampler
+from blog.models import BlogPost
+from forum.models import ForumCategory, ForumTag, Topic
+from healthcare.models import HealthcareFacility
+
+# Сколько объектов каждого вида участвует в выборке
+SAMPLE_SIZE = 5000
+
+
+class Endpoint(NamedTuple):
+    url_name: str
+    weight: int
+    # Ключ пула объектов для аргумента pk/slug; None - страница без аргументов
+    pool: str = None
+    # 'parent' или 'writer' - страница требует входа пользователя с такой ролью
+    role: str = None
+
+
+ENDPOINTS = (
+    Endpoint('forum:index', 10),
+    Endpoint('forum:topic_detail', 20, 'topics'),
+    Endpoint('forum:category_detail', 6, 'categories'),
+    Endpoint('forum:tag_detail', 4, 'tags'),
+    Endpoint('forum:search', 4, 'queries'),
+    Endpoint('blog:blog_list', 10),
+    Endpoint('blog:post_detail', 18, 'blog_posts'),
+    Endpoint('healthcare:index', 4),
+    Endpoint('healthcare:doctor_list', 3),
+    Endpoint('healthcare:facility_detail', 3, 'facilities'),
+    Endpoint('tracker:dashboard', 6, role='parent'),
+    Endpoint('accounts:writer_analytics', 2, role='writer'),
+)
+
+
+def percentile(sorted_values, fraction):
+    """Перцентиль по ближайшему рангу для отсортированного списка"""
+    if not sorted_values:
+        return None
+    index = math.ceil(fraction * len(sorted_values)) - 1
+    return sorted_values[min(max(index, 0), len(sorted_values) - 1)]
+
+
+def create_session(user):
+    """Ключ новой сессии, в которой user уже вошел (как Client.force_login)"""
+    engine = import_module(settings.SESSION_ENGINE)
+    session = engine.SessionStore()
+    session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.save()
+    return session.session_key
+
+
+class BenchmarkPlan:
+    def __init__(self, seed=42, endpoints=ENDPOINTS):
+        self.rng = random.Random(seed)
+        self.pools = self._load_pools()
+        self.sessions = self._load_sessions()
+        self.endpoints = []
+        self.skipped = []
+        for endpoint in endpoints:
+            missing = (endpoint.pool and endpoint.pool not in self.pools) or (
+                endpoint.role and endpoint.role not in self.sessions
+            )
+            (self.skipped if missing else self.endpoints).append(endpoint)
+        if not self.endpoints:
+            raise ValueError('Нет ни одной страницы для прогона: заполните базу командой generate_scale_data')
+
+    def _load_pools(self):
+        sources = {
+            'topics': Topic.objects.filter(is_active=True).values_list('pk', flat=True),
+            'categories': ForumCategory.objects.values_list('pk', flat=True),
+            'tags': ForumTag.objects.values_list('slug', flat=True),
+            'blog_posts': BlogPost.objects.filter(is_published=True).values_list('pk', flat=True),
+            'facilities': HealthcareFacility.objects.values_list('pk', flat=True),
+        }
+        pools = {}
+        for name, queryset in sources.items():
+            items = list(queryset.order_by('-pk')[:SAMPLE_SIZE])
+            if items:
+                pools[name] = ZipfSampler(items, self.rng)
+        pools['queries'] = ZipfSampler(TAGS, self.rng)
+        return pools
+
+    def _load_sessions(self):
+        users = User.objects.filter(username__startswith=USERNAME_PREFIX, is_active=True).order_by('pk')
+        roles = {
+            'parent': users.filter(parent_profile__isnull=False).first(),
+            'writer': users.filter(accounts_writer_profile__isnull=False).first(),
+        }
+        return {role: create_session(user) for role, user in roles.items() if user is not None}
+
+    def _path(self, endpoint):
+        if endpoint.pool == 'queries':
+            return reverse(endpoint.url_name) + '?' + urllib.parse.urlencode(
+                {'search_query': self.pools['queries'].one(self.rng)}
+            )
+        if endpoint.pool == 'tags':
+            return reverse(endpoint.url_name, kwargs={'slug': self.pools['tags'].one(self.rng)})
+        if endpoint.pool:
+            return reverse(endpoint.url_name, kwargs={'pk': self.pools[endpoint.pool].one(self.rng)})
+        return reverse(endpoint.url_name)
+
+    def schedule(self, count):
+        """Список (страница, путь, ключ сессии) длиной count"""
+        chosen = self.rng.choices(self.endpoints, weights=[endpoint.weight for endpoint in self.endpoints], k=count)
+        return [
+            (endpoint, self._path(endpoint), self.sessions.get(endpoint.role))
+            for endpoint in chosen
+        ]
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # Редирект - это ответ страницы, а не повод для второго запроса
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class BenchmarkRunner:
+    def __init__(self, base_url=None, concurrency=1, timeout=30):
+        self.base_url = base_url.rstrip('/') if base_url else None
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _client(self):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = Client(raise_request_exception=False)
+        return client
+
+    def _opener(self):
+        opener = getattr(self._local, 'opener', None)
+        if opener is None:
+            opener = self._local.opener = urllib.request.build_opener(_NoRedirect)
+        return opener
+
+    def _fetch_local(self, path, session_key):
+        client = self._client()
+        if session_key:
+            client.cookies[settings.SESSION_COOKIE_NAME] = session_key
+        else:
+            client.cookies.pop(settings.SESSION_COOKIE_NAME, None)
+        response = client.get(path, secure=settings.SECURE_SSL_REDIRECT)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response.status_code
+
+    def _fetch_http(self, path, session_key):
+        request = urllib.request.Request(self.base_url + path)
+        if session_key:
+            request.add_header('Cookie', f'{settings.SESSION_COOKIE_NAME}={session_key}')
+        try:
+            with self._opener().open(request, timeout=self.timeout) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as exc:
+            exc.read()
+            return exc.code
+        except (urllib.error.URLError, OSError):
+            return None
+
+    def _execute(self, item):
+        endpoint, path, session_key = item
+        fetch = self._fetch_http if self.base_url else self._fetch_local
+        started = time.perf_counter()
+        status = fetch(path, session_key)
+        return endpoint.url_name, time.perf_counter() - started, status
+
+    def run(self, schedule):
+        """
+        Выполняет запросы schedule. Возвращает ({страница: {'latencies': [...],
+        'errors': N}}, общее время в секундах). Ошибка - статус >= 400 или
+        отсутствие ответа; редиректы считаются успешными ответами.
+        """
+        results = defaultdict(lambda: {'latencies': [], 'errors': 0})
+        # Client обращается к серверу под именем testserver
+        hosts = nullcontext() if self.base_url else override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']
+        )
+        started = time.perf_counter()
+        with hosts, ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for name, elapsed, status in executor.map(self._execute, schedule):
+                results[name]['latencies'].append(elapsed)
+                if status is None or status >= 400:
+                    results[name]['errors'] += 1
+        return dict(results), time.perf_counter() - started
+
+
+def summarize(results, total_seconds):
+    """Строки отчета по страницам (время в мс) и итоговая строка"""
+    rows = []
+    everything = []
+    errors = 0
+    for name in sorted(results, key=lambda key: -len(results[key]['latencies'])):
+        latencies = sorted(value * 1000 for value in results[name]['latencies'])
+        everything.extend(latencies)
+        errors += results[name]['errors']
+        rows.append(_row(name, latencies, results[name]['errors']))
+    everything.sort()
+    overall = _row('ALL', everything, errors)
+    overall['rps'] = round(len(everything) / total_seconds, 1) if total_seconds else None
+    return rows, overall
+
+
+def _row(name, latencies, errors):
+    return {
+        'endpoint': name,
+        'count': len(latencies),
+        'errors': errors,
+        'p50': percentile(latencies, 0.50),
+        'p95': percentile(latencies, 0.95),
+        'p99': percentile(latencies, 0.99),
+        'mean': sum(latencies) / len(latencies) if latencies else None,
+    }
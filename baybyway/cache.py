@@ -0,0 +1,40 @@
+"""
+Кеш-бэкенды Django с учетом попаданий и промахов для метрик.
+
+Поведение не меняется; get и get_many дополнительно передают результат
+в baybyway.metrics (по префиксу ключа до первого двоеточия).
+"""
+from django.core.cache.backends import filebased, locmem, redis
+
+from baybyway.metrics import record_cache_lookup
+
+_missing = object()
+
+
+class MeteredCacheMixin:
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _missing, version=version)
+        if value is _missing:
+            record_cache_lookup(key, 0, 1)
+            return default
+        record_cache_lookup(key, 1, 0)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = super().get_many(keys, version=version)
+        if keys:
+            record_cache_lookup(keys[0], len(found), len(keys) - len(found))
+        return found
+
+
+class RedisCache(MeteredCacheMixin, redis.RedisCache):
+    pass
+
+
+class FileBasedCache(MeteredCacheMixin, filebased.FileBasedCache):
+    pass
+
+
+class LocMemCache(MeteredCacheMixin, locmem.LocMemCache):
+    pass
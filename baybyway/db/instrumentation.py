@@ -0,0 +1,153 @@
+"""
+Учет SQL-запросов в рамках HTTP-запроса.
+
+QueryInstrumentationMiddleware подключает execute_wrapper ко всем
+соединениям и по окончании запроса пишет в логгер baybyway.sql одну
+JSON-строку: число запросов, суммарное время в БД, повторяющиеся запросы
+(признак N+1) с местом вызова в коде проекта и медленные запросы.
+Запросы сравниваются по отпечатку - SQL без значений параметров.
+
+При SQL_INSTRUMENTATION=False middleware отключается при запуске и ничего
+не стоит; SQL_INSTRUMENTATION_SAMPLE_RATE задает долю учитываемых запросов.
+С SQL_INSTRUMENTATION_SERVER_TIMING итог добавляется в заголовок
+Server-Timing и виден в инструментах разработчика браузера.
+"""
+import json
+import logging
+import os
+import random
+import re
+import sys
+import time
+from contextlib import ExitStack
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('baybyway.sql')
+
+# Сколько медленных и повторяющихся запросов попадает в одну запись лога
+MAX_REPORTED = 10
+MAX_SQL_LENGTH = 500
+
+IN_LIST_RE = re.compile(r'\bIN \((?:%s, )*%s\)', re.IGNORECASE)
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+WHITESPACE_RE = re.compile(r'\s+')
+
+_own_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql):
+    """SQL без значений: одинаковые запросы с разными параметрами совпадают"""
+    sql = IN_LIST_RE.sub('IN (...)', sql)
+    sql = STRING_RE.sub('?', sql)
+    sql = NUMBER_RE.sub('?', sql)
+    return WHITESPACE_RE.sub(' ', sql.replace('%s', '?')).strip()
+
+
+def call_site():
+    """Ближайший к запросу кадр стека из кода проекта (не Django и не библиотек)"""
+    root = str(settings.BASE_DIR) + os.sep
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(root) and not filename.startswith(_own_dir) and 'site-packages' not in filename:
+            return f'{os.path.relpath(filename, root)}:{frame.f_lineno} {frame.f_code.co_name}'
+        frame = frame.f_back
+    return None
+
+
+class QueryRecorder:
+    """execute_wrapper, накапливающий статистику запросов"""
+
+    def __init__(self, slow_ms, duplicate_threshold):
+        self.slow_seconds = slow_ms / 1000
+        self.duplicate_threshold = duplicate_threshold
+        self.count = 0
+        self.duration = 0.0
+        # отпечаток -> [число выполнений, суммарное время, место первого повтора]
+        self.fingerprints = {}
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self._record(sql, time.perf_counter() - started, context['connection'].alias)
+
+    def _record(self, sql, elapsed, alias):
+        self.count += 1
+        self.duration += elapsed
+        key = fingerprint(sql)
+        stats = self.fingerprints.get(key)
+        if stats is None:
+            stats = self.fingerprints[key] = [0, 0.0, None]
+        stats[0] += 1
+        stats[1] += elapsed
+        # Стек нужен только для повторов и медленных запросов
+        if stats[0] == 2:
+            stats[2] = call_site()
+        if elapsed >= self.slow_seconds and len(self.slow) < MAX_REPORTED:
+            self.slow.append({
+                'db': alias,
+                'ms': round(elapsed * 1000, 2),
+                'sql': sql[:MAX_SQL_LENGTH],
+                'call_site': call_site(),
+            })
+
+    def duplicates(self):
+        found = [
+            {'count': count, 'ms': round(duration * 1000, 2), 'sql': key[:MAX_SQL_LENGTH], 'call_site': site}
+            for key, (count, duration, site) in self.fingerprints.items()
+            if count >= self.duplicate_threshold
+        ]
+        found.sort(key=lambda entry: entry['count'], reverse=True)
+        return found[:MAX_REPORTED]
+
+
+class QueryInstrumentationMiddleware:
+    def __init__(self, get_response):
+        if not settings.SQL_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.SQL_INSTRUMENTATION_SAMPLE_RATE:
+            return self.get_response(request)
+
+        recorder = QueryRecorder(settings.SQL_SLOW_QUERY_MS, settings.SQL_DUPLICATE_THRESHOLD)
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+
+        duplicates = recorder.duplicates()
+        match = request.resolver_match
+        report = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'queries': recorder.count,
+            'db_ms': round(recorder.duration * 1000, 2),
+            'duplicates': duplicates,
+            'slow': recorder.slow,
+        }
+        level = logging.WARNING if duplicates or recorder.slow else logging.INFO
+        logger.log(level, json.dumps(report, ensure_ascii=False))
+
+        if settings.SQL_INSTRUMENTATION_SERVER_TIMING:
+            timing = f'db;dur={report["db_ms"]};desc="{recorder.count} queries"'
+            if duplicates:
+                timing += f', dup;desc="{len(duplicates)} repeated"'
+            existing = response.get('Server-Timing')
+            response['Server-Timing'] = f'{existing}, {timing}' if existing else timing
+        return response
@@ -0,0 +1,94 @@
+"""
+MySQL-бэкенд с пулом соединений процесса (ENGINE = 'baybyway.db.mysql_pool').
+
+Параметры пула задаются в OPTIONS['pool']: max_size, max_idle, timeout,
+check_after (см. baybyway.db.pool.ConnectionPool). CONN_MAX_AGE должен быть 0:
+Django "закрывает" соединение в конце запроса, а бэкенд возвращает его в пул.
+Состояние сессии (init_command, уровень изоляции) настраивается один раз
+на физическое соединение.
+"""
+import os
+import threading
+
+from django.db.backends.mysql import base as mysql_base
+
+from baybyway.db.pool import ConnectionPool
+
+Database = mysql_base.Database
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _is_alive(connection):
+    try:
+        connection.ping()
+    except Database.Error:
+        return False
+    return True
+
+
+def get_pool(alias, connect, options):
+    # После fork воркер не должен делить сокеты с родителем
+    key = (os.getpid(), alias)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(connect, _is_alive, **options)
+        return pool
+
+
+class DatabaseWrapper(mysql_base.DatabaseWrapper):
+    pool_options = {}
+    _pool = None
+    _fresh_connection = True
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pool_options = params.pop('pool', {})
+        return params
+
+    def get_new_connection(self, conn_params):
+        pool = get_pool(
+            self.alias,
+            lambda: super(DatabaseWrapper, self).get_new_connection(conn_params),
+            self.pool_options,
+        )
+        acquired = pool.acquire()
+        if acquired is None:
+            raise Database.OperationalError(
+                f'Пул соединений "{self.alias}" исчерпан ({pool.max_size}) за {pool.timeout} с'
+            )
+        self._pool = pool
+        connection, self._fresh_connection = acquired
+        return connection
+
+    def init_connection_state(self):
+        if self._fresh_connection:
+            super().init_connection_state()
+
+    def _set_autocommit(self, autocommit):
+        # get_autocommit() читает флаг клиента и не обращается к серверу
+        if self.connection.get_autocommit() != autocommit:
+            super()._set_autocommit(autocommit)
+
+    def _close(self):
+        if self.connection is None or self._pool is None:
+            return super()._close()
+        # Соединение с незавершенной транзакцией или после ошибок в пул не возвращается
+        discard = (
+            self.errors_occurred
+            or self.in_atomic_block
+            or self.connection.get_autocommit() != self.settings_dict['AUTOCOMMIT']
+        )
+        pool, self._pool = self._pool, None
+        with self.wrap_database_errors:
+            pool.release(self.connection, discard=discard)
+
+
+def close_pool(alias):
+    """Закрывает и забывает пул соединений alias в текущем процессе"""
+    with _pools_lock:
+        pool = _pools.pop((os.getpid(), alias), None)
+    if pool is not None:
+        pool.close_all()
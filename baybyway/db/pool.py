@@ -0,0 +1,94 @@
+"""
+Пул физических соединений с БД внутри процесса.
+
+Нужен многопоточным и ASGI-воркерам: соединение берется из пула при первом
+запросе к БД и возвращается в конце HTTP-запроса, поэтому число соединений
+ограничено размером пула, а не числом потоков. Соединения, простоявшие
+дольше max_idle, закрываются; простоявшие дольше check_after перед выдачей
+проверяются ping-ом.
+"""
+import threading
+import time
+
+
+class ConnectionPool:
+    """Ограниченный пул соединений; свободные выдаются в порядке LIFO"""
+
+    def __init__(self, connect, is_alive, max_size=10, max_idle=300, timeout=10, check_after=30):
+        self._connect = connect
+        self._is_alive = is_alive
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.check_after = check_after
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        # (соединение, момент возврата) по возрастанию времени возврата
+        self._idle = []
+        self.created = 0
+
+    @staticmethod
+    def _close_quietly(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _reap(self, now):
+        """Забирает из пула соединения, простоявшие дольше max_idle"""
+        with self._lock:
+            expired = 0
+            while expired < len(self._idle) and now - self._idle[expired][1] > self.max_idle:
+                expired += 1
+            stale, self._idle = self._idle[:expired], self._idle[expired:]
+        for connection, released_at in stale:
+            self._close_quietly(connection)
+
+    def acquire(self):
+        """
+        Возвращает (соединение, новое ли оно) или None, если за timeout
+        секунд не освободилось ни одного места в пуле.
+        """
+        if not self._slots.acquire(timeout=self.timeout):
+            return None
+        try:
+            now = time.monotonic()
+            self._reap(now)
+            while True:
+                with self._lock:
+                    if not self._idle:
+                        break
+                    connection, released_at = self._idle.pop()
+                if now - released_at <= self.check_after or self._is_alive(connection):
+                    return connection, False
+                self._close_quietly(connection)
+
+            connection = self._connect()
+            with self._lock:
+                self.created += 1
+            return connection, True
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, connection, discard=False):
+        try:
+            if discard:
+                self._close_quietly(connection)
+            else:
+                with self._lock:
+                    self._idle.append((connection, time.monotonic()))
+        finally:
+            self._slots.release()
+        self._reap(time.monotonic())
+
+    def idle_count(self):
+        with self._lock:
+            return len(self._idle)
+
+    def close_all(self):
+        """Закрывает свободные соединения (выданные закроются при возврате)"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection, released_at in idle:
+            self._close_quietly(connection)
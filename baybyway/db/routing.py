@@ -0,0 +1,153 @@
+"""
+Чтение с реплики для страниц, которые только читают данные.
+
+Маршрутизатор отправляет запросы на чтение в базу REPLICA_ALIAS только
+внутри read_replica(): представления помечаются декоратором replica_reads
+или примесью ReplicaReadsMixin, отдельные участки кода - самим
+контекстным менеджером. Все остальное, включая записи, идет в default.
+
+Чтение своих записей: после POST/PUT/PATCH/DELETE сессия на
+DB_REPLICA_STICKY_SECONDS закрепляется за основной базой
+(ReplicaStickinessMiddleware), чтобы пользователь не увидел устаревшие
+данные из-за задержки репликации. Представления, которые пишут только
+служебные данные (например, beacon аналитики), помечаются replica_neutral
+и сессию не закрепляют; анонимные запросы без сессии тоже пропускаются,
+чтобы не создавать ради них запись сессии. Если реплика недоступна, чтения на
+DB_REPLICA_RETRY_SECONDS возвращаются на основную базу.
+
+Локально реплику можно изобразить вторым файлом SQLite:
+DATABASES['replica'] = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': 'replica.sqlite3'}
+"""
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+REPLICA_ALIAS = 'replica'
+STICKY_SESSION_KEY = '_db_primary_until'
+UNSAFE_METHODS = frozenset({'POST', 'PUT', 'PATCH', 'DELETE'})
+# Таблицы, которые всегда читаются с основной базы
+PRIMARY_ONLY_APPS = frozenset({'sessions'})
+
+_use_replica = ContextVar('use_replica', default=False)
+# Момент (time.monotonic), до которого реплика считается недоступной
+_replica_down_until = 0.0
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+def _replica_available():
+    global _replica_down_until
+    if time.monotonic() < _replica_down_until:
+        return False
+    try:
+        # Для открытого соединения - проверка CONN_HEALTH_CHECKS, иначе подключение
+        connections[REPLICA_ALIAS].ensure_connection()
+    except DatabaseError:
+        _replica_down_until = time.monotonic() + settings.DB_REPLICA_RETRY_SECONDS
+        logger.warning('Реплика БД недоступна, чтение с основной базы %s с', settings.DB_REPLICA_RETRY_SECONDS)
+        return False
+    return True
+
+
+def is_sticky(request):
+    """Сессия недавно что-то записала и читает с основной базы"""
+    session = getattr(request, 'session', None)
+    return session is not None and session.get(STICKY_SESSION_KEY, 0) > time.time()
+
+
+@contextmanager
+def read_replica(request=None):
+    """
+    Направляет чтения внутри блока на реплику, если она настроена и доступна.
+    С request учитываются метод запроса и закрепление сессии за основной базой.
+    """
+    enabled = (
+        replica_configured()
+        and (request is None or (request.method in ('GET', 'HEAD') and not is_sticky(request)))
+        and _replica_available()
+    )
+    token = _use_replica.set(enabled)
+    try:
+        yield enabled
+    finally:
+        _use_replica.reset(token)
+
+
+def replica_reads(view_func):
+    """Декоратор представления-функции, которое только читает данные"""
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        with read_replica(request):
+            return view_func(request, *args, **kwargs)
+
+    return wrapper
+
+
+def replica_neutral(view_func):
+    """
+    Помечает представление, запись которого не нужно сразу читать
+    (например, события аналитики): после него сессия не закрепляется
+    за основной базой
+    """
+    view_func.replica_neutral = True
+    return view_func
+
+
+class ReplicaReadsMixin:
+    """Примесь для классовых представлений, которые только читают данные"""
+
+    def dispatch(self, request, *args, **kwargs):
+        with read_replica(request):
+            response = super().dispatch(request, *args, **kwargs)
+            # TemplateResponse рендерится после выхода из представления, а ленивые
+            # QuerySet в шаблоне тоже должны читаться с реплики
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+            return response
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and model._meta.app_label not in PRIMARY_ONLY_APPS:
+            return REPLICA_ALIAS
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика содержит те же данные, что и основная база
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_ALIAS
+
+
+class ReplicaStickinessMiddleware:
+    """Закрепляет сессию за основной базой после запросов, изменяющих данные"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (request.method in UNSAFE_METHODS and replica_configured() and response.status_code < 500
+                and not getattr(request, '_replica_neutral', False)):
+            session = getattr(request, 'session', None)
+            # Без сохраненной сессии пользователь ничего своего не читает - не создаем ее
+            if session is not None and session.session_key is not None:
+                session[STICKY_SESSION_KEY] = time.time() + settings.DB_REPLICA_STICKY_SECONDS
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._replica_neutral = getattr(view_func, 'replica_neutral', False)
@@ -0,0 +1,232 @@
+"""
+Производные изображения (миниатюры и WebP) для фотографий профилей.
+
+После загрузки фото фоновый поток строит квадратные миниатюры фиксированных
+размеров в WebP и JPEG. Имена производных строятся из хеша содержимого
+исходника (derivatives/ab/<hash>-96.webp), поэтому их можно кешировать
+навсегда: новое фото получает новые имена. Хеш хранится в поле модели
+<поле>_hash; пока оно пустое, шаблоны показывают оригинал.
+"""
+import hashlib
+import logging
+import queue
+import threading
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Стороны квадратных миниатюр в пикселях, по возрастанию
+DERIVATIVE_SIZES = (48, 96, 160, 320)
+DERIVATIVE_FORMATS = {'webp': 'WEBP', 'jpg': 'JPEG'}
+DERIVATIVE_QUALITY = 82
+DERIVATIVES_DIR = 'derivatives'
+
+# Фото, для которых строятся производные: (модель, поле)
+IMAGE_FIELDS = (
+    ('accounts.ParentProfile', 'photo'),
+    ('accounts.WriterProfile', 'photo'),
+    ('healthcare.Doctor', 'photo'),
+    ('support.SupportProfile', 'avatar'),
+)
+
+
+def hash_field_name(field_name):
+    return f'{field_name}_hash'
+
+
+def image_field_names(model):
+    return [field_name for model_label, field_name in IMAGE_FIELDS if model_label == model._meta.label]
+
+
+def derivative_name(digest, size, ext):
+    return f'{DERIVATIVES_DIR}/{digest[:2]}/{digest}-{size}.{ext}'
+
+
+def content_hash(fieldfile):
+    digest = hashlib.sha256()
+    with fieldfile.open('rb') as source:
+        for chunk in source.chunks():
+            digest.update(chunk)
+    return digest.hexdigest()[:32]
+
+
+def pick_size(pixels):
+    """Наименьшая миниатюра не меньше pixels (или самая большая)"""
+    for size in DERIVATIVE_SIZES:
+        if size >= pixels:
+            return size
+    return DERIVATIVE_SIZES[-1]
+
+
+def _encode(image, image_format):
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        # JPEG без прозрачности - подкладываем белый фон
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A') if 'A' in image.getbands() else None)
+        image = background
+    buffer = BytesIO()
+    image.save(buffer, image_format, quality=DERIVATIVE_QUALITY, optimize=image_format == 'JPEG')
+    return ContentFile(buffer.getvalue())
+
+
+def generate_derivatives(fieldfile, force=False, digest=None):
+    """Строит все миниатюры фото и возвращает хеш содержимого (digest - уже посчитанный хеш)"""
+    digest = digest or content_hash(fieldfile)
+    storage = fieldfile.storage
+    with fieldfile.open('rb') as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+    image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+
+    for size in DERIVATIVE_SIZES:
+        # Маленькие исходники не растягиваем
+        side = min(size, *image.size)
+        thumbnail = ImageOps.fit(image, (side, side), Image.Resampling.LANCZOS)
+        for ext, image_format in DERIVATIVE_FORMATS.items():
+            name = derivative_name(digest, size, ext)
+            if storage.exists(name):
+                if not force:
+                    continue
+                storage.delete(name)
+            storage.save(name, _encode(thumbnail, image_format))
+    return digest
+
+
+def process_image(model_label, pk, field_name, force=False):
+    """Обновляет производные фото одной записи; возвращает хеш или None"""
+    model = apps.get_model(model_label)
+    hash_field = hash_field_name(field_name)
+    instance = model.objects.filter(pk=pk).only(field_name, hash_field).first()
+    if instance is None:
+        return None
+
+    fieldfile = getattr(instance, field_name)
+    if not fieldfile:
+        if getattr(instance, hash_field):
+            model.objects.filter(pk=pk).update(**{hash_field: ''})
+        return None
+
+    digest = content_hash(fieldfile)
+    if digest != getattr(instance, hash_field) or force:
+        generate_derivatives(fieldfile, force=force, digest=digest)
+        # Фото могли заменить, пока строились миниатюры
+        model.objects.filter(pk=pk, **{field_name: fieldfile.name}).update(**{hash_field: digest})
+    return digest
+
+
+class StoredImageNamesMixin:
+    """
+    Примесь моделей из IMAGE_FIELDS: запоминает имена файлов фото при
+    загрузке из базы, чтобы после сохранения ставить в очередь только
+    действительно замененные фото
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stored_image_names = {
+            field_name: instance.__dict__[field_name] or ''
+            for field_name in image_field_names(cls) if field_name in instance.__dict__
+        }
+        return instance
+
+
+def image_changed(instance, field_name, created):
+    """Имя файла фото отличается от сохраненного в базе до этого save()"""
+    stored = getattr(instance, '_stored_image_names', None)
+    if stored is None:
+        # Объект не из базы: сравнить не с чем
+        stored = instance._stored_image_names = {}
+        known = False
+    elif field_name not in stored:
+        # Отложенное поле без присваивания не сохранялось (и не загружаем его ради проверки)
+        if field_name not in instance.__dict__:
+            return False
+        known = False
+    else:
+        known = True
+    name = getattr(instance, field_name).name or ''
+    if created:
+        changed = bool(name)
+    elif known:
+        changed = stored[field_name] != name
+    else:
+        changed = True
+    stored[field_name] = name
+    return changed
+
+
+class DerivativeQueue:
+    """
+    Очередь построения производных в фоновом потоке процесса.
+
+    Задачи ставятся после фиксации транзакции. При остановке процесса
+    необработанные задачи теряются - их восстанавливает команда
+    generate_image_derivatives.
+    """
+
+    _queue = queue.Queue()
+    _lock = threading.Lock()
+    _worker = None
+
+    @classmethod
+    def enqueue(cls, model_label, pk, field_name):
+        if not settings.IMAGE_DERIVATIVES_ASYNC:
+            cls._process(model_label, pk, field_name)
+            return
+        cls._queue.put((model_label, pk, field_name))
+        cls._ensure_worker()
+
+    @classmethod
+    def pending_count(cls):
+        return cls._queue.qsize()
+
+    @staticmethod
+    def _process(model_label, pk, field_name):
+        try:
+            process_image(model_label, pk, field_name)
+        except Exception:
+            logger.exception('Не удалось построить миниатюры %s #%s.%s', model_label, pk, field_name)
+
+    @classmethod
+    def _ensure_worker(cls):
+        if cls._worker is not None and cls._worker.is_alive():
+            return
+        with cls._lock:
+            if cls._worker is not None and cls._worker.is_alive():
+                return
+            cls._worker = threading.Thread(target=cls._run, name='image-derivatives', daemon=True)
+            cls._worker.start()
+
+    @classmethod
+    def _run(cls):
+        from django.db import close_old_connections
+
+        while True:
+            task = cls._queue.get()
+            try:
+                cls._process(*task)
+            finally:
+                close_old_connections()
+                cls._queue.task_done()
+
+
+def image_variants(fieldfile, pixels):
+    """
+    URL миниатюр для отображения в квадрате pixels x pixels:
+    {'webp': (1x, 2x), 'jpg': (1x, 2x)} или None, если миниатюр еще нет.
+    """
+    digest = getattr(fieldfile.instance, hash_field_name(fieldfile.field.name), '')
+    if not digest:
+        return None
+    storage = fieldfile.storage
+    sizes = (pick_size(pixels), pick_size(pixels * 2))
+    return {
+        ext: tuple(storage.url(derivative_name(digest, size, ext)) for size in sizes)
+        for ext in DERIVATIVE_FORMATS
+    }
@@ -0,0 +1,352 @@
+"""
+Метрики приложения в формате Prometheus.
+
+MetricsMiddleware считает запросы по представлениям (имя URL), статусы,
+гистограмму длительности и число SQL-запросов; кеш-бэкенды baybyway.cache
+считают попадания и промахи. Каждый процесс gunicorn держит счетчики
+в памяти и раз в METRICS_FLUSH_INTERVAL секунд записывает их в свой файл
+в METRICS_DIR. Представление metrics_view складывает файлы всех процессов;
+счетчики завершившихся процессов переносятся в общий архив, чтобы суммы
+не уменьшались после перезапуска воркеров. Глубина очередей фоновой
+обработки - мгновенное значение, она суммируется только по живым процессам.
+
+Эндпоинт доступен только с адресов METRICS_ALLOWED_NETWORKS и только
+напрямую, не через nginx (см. nginx_baybyway.conf).
+"""
+import atexit
+import fcntl
+import ipaddress
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import Http404, HttpResponse
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Метрика -> (тип, описание)
+METRICS = {
+    'baybyway_http_requests_total': ('counter', 'HTTP requests by view, method and status code.'),
+    'baybyway_http_request_duration_seconds': ('histogram', 'HTTP request latency by view.'),
+    'baybyway_db_queries_total': ('counter', 'SQL queries executed while handling requests, by view.'),
+    'baybyway_db_query_seconds_total': ('counter', 'Time spent in SQL queries while handling requests, by view.'),
+    'baybyway_cache_requests_total': ('counter', 'Cache lookups by key prefix and result (hit/miss).'),
+    'baybyway_queue_depth': ('gauge', 'Items waiting in in-process background queues (live workers).'),
+}
+
+# Очереди фоновой обработки: имя -> функция без аргументов, возвращающая длину
+QUEUE_GAUGES = {
+    'image_derivatives': 'baybyway.images.DerivativeQueue.pending_count',
+    'blog_read_progress': 'blog.services.ReadProgressBuffer.pending_count',
+    'consultation_chat_subscriptions': 'consultant.realtime.subscription_count',
+}
+
+# Прочие методы сводятся к 'other', чтобы число рядов было ограничено
+HTTP_METHODS = frozenset({'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'})
+
+PROCESS_FILE_PREFIX = 'process-'
+ARCHIVE_FILE = 'archive.json'
+LOCK_FILE = '.lock'
+
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _resolve(path):
+    """import_string, допускающий метод класса: 'app.module.Class.method'"""
+    try:
+        return import_string(path)
+    except ImportError:
+        owner, attr = path.rsplit('.', 1)
+        return getattr(import_string(owner), attr)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _write_json(path, data):
+    """Атомарная запись: читатель видит либо старый, либо новый файл"""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'w') as tmp:
+            json.dump(data, tmp)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _read_json(path):
+    try:
+        with open(path) as source:
+            return json.load(source)
+    except (OSError, ValueError):
+        return None
+
+
+class MetricsStore:
+    """Счетчики процесса с периодической записью в METRICS_DIR"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = defaultdict(float)
+        self._pid = None
+        self._path = None
+        self._worker = None
+
+    @property
+    def directory(self):
+        return Path(settings.METRICS_DIR)
+
+    def _check_process(self):
+        # После fork счетчики родителя не должны попасть в файл потомка
+        pid = os.getpid()
+        if pid != self._pid:
+            self._pid = pid
+            self._values = defaultdict(float)
+            self._path = self.directory / f'{PROCESS_FILE_PREFIX}{pid}-{uuid.uuid4().hex[:8]}.json'
+            self._worker = None
+
+    def inc(self, name, labels, amount=1):
+        with self._lock:
+            self._check_process()
+            self._values[(name, _labels_key(labels))] += amount
+        self._ensure_worker()
+
+    def observe(self, name, labels, value):
+        """Наблюдение гистограммы: накопительные корзины, сумма и количество"""
+        with self._lock:
+            self._check_process()
+            # Нулевые корзины тоже пишутся: histogram_quantile нужен полный набор
+            for bound in DURATION_BUCKETS:
+                self._values[(f'{name}_bucket', _labels_key({**labels, 'le': repr(bound)}))] += value <= bound
+            self._values[(f'{name}_bucket', _labels_key({**labels, 'le': '+Inf'}))] += 1
+            self._values[(f'{name}_sum', _labels_key(labels))] += value
+            self._values[(f'{name}_count', _labels_key(labels))] += 1
+        self._ensure_worker()
+
+    @staticmethod
+    def _queue_depths():
+        depths = []
+        for queue, path in QUEUE_GAUGES.items():
+            try:
+                depths.append(['baybyway_queue_depth', [['queue', queue]], _resolve(path)()])
+            except Exception:
+                logger.exception('Не удалось получить глубину очереди %s', queue)
+        return depths
+
+    def flush(self):
+        with self._lock:
+            self._check_process()
+            counters = [[name, list(labels), value] for (name, labels), value in self._values.items()]
+            path = self._path
+        self.directory.mkdir(parents=True, exist_ok=True)
+        _write_json(path, {'pid': self._pid, 'counters': counters, 'gauges': self._queue_depths()})
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(target=self._run, name='metrics-flush', daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            time.sleep(settings.METRICS_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Не удалось записать метрики процесса')
+
+    @contextmanager
+    def _directory_lock(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / LOCK_FILE, 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def collect(self):
+        """Сумма по всем процессам: {(имя, метки): значение}"""
+        self.flush()
+        totals = defaultdict(float)
+        with self._directory_lock():
+            archive_path = self.directory / ARCHIVE_FILE
+            archive = defaultdict(float)
+            for name, labels, value in _read_json(archive_path) or []:
+                archive[(name, tuple(map(tuple, labels)))] += value
+
+            dead = []
+            for path in self.directory.glob(f'{PROCESS_FILE_PREFIX}*.json'):
+                data = _read_json(path)
+                if data is None:
+                    continue
+                alive = _pid_alive(data['pid'])
+                target = totals if alive else archive
+                for name, labels, value in data['counters']:
+                    target[(name, tuple(map(tuple, labels)))] += value
+                if alive:
+                    for name, labels, value in data['gauges']:
+                        totals[(name, tuple(map(tuple, labels)))] += value
+                else:
+                    dead.append(path)
+
+            if dead:
+                _write_json(archive_path, [[name, list(labels), value] for (name, labels), value in archive.items()])
+                for path in dead:
+                    path.unlink(missing_ok=True)
+
+        for key, value in archive.items():
+            totals[key] += value
+        return totals
+
+
+store = MetricsStore()
+
+
+@atexit.register
+def _flush_on_exit():
+    if store._pid == os.getpid():
+        try:
+            store.flush()
+        except Exception:
+            pass
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value):
+    return repr(int(value)) if float(value).is_integer() else repr(value)
+
+
+def render(totals):
+    """Текстовый формат Prometheus 0.0.4"""
+    samples = defaultdict(list)
+    for (name, labels), value in totals.items():
+        family = name
+        for suffix in ('_bucket', '_sum', '_count'):
+            if name.endswith(suffix) and name[:-len(suffix)] in METRICS:
+                family = name[:-len(suffix)]
+        samples[family].append((name, labels, value))
+
+    lines = []
+    for family in sorted(samples):
+        metric_type, description = METRICS.get(family, ('untyped', ''))
+        lines.append(f'# HELP {family} {description}')
+        lines.append(f'# TYPE {family} {metric_type}')
+        for name, labels, value in sorted(samples[family], key=_sample_order):
+            label_text = ','.join(f'{key}="{_escape(val)}"' for key, val in labels)
+            lines.append(f'{name}{{{label_text}}} {_format_value(value)}' if label_text else f'{name} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def _sample_order(sample):
+    name, labels, value = sample
+    plain = tuple(item for item in labels if item[0] != 'le')
+    le = dict(labels).get('le')
+    bound = float('inf') if le == '+Inf' else float(le) if le is not None else 0.0
+    return plain, name, bound
+
+
+@lru_cache(maxsize=None)
+def _allowed_networks(networks):
+    return tuple(ipaddress.ip_network(network.strip(), strict=False) for network in networks.split(',') if network.strip())
+
+
+def is_internal(request):
+    # Запрос через nginx приходит с 127.0.0.1, но с X-Forwarded-For
+    if 'x-forwarded-for' in request.headers:
+        return False
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in network for network in _allowed_networks(settings.METRICS_ALLOWED_NETWORKS))
+
+
+def metrics_view(request):
+    """Эндпоинт для Prometheus"""
+    if not settings.METRICS_ENABLED or not is_internal(request):
+        raise Http404
+    return HttpResponse(render(store.collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def record_cache_lookup(key, hits, misses):
+    if not settings.METRICS_ENABLED:
+        return
+    prefix = key.split(':', 1)[0] if isinstance(key, str) and ':' in key else 'other'
+    if hits:
+        store.inc('baybyway_cache_requests_total', {'prefix': prefix, 'result': 'hit'}, hits)
+    if misses:
+        store.inc('baybyway_cache_requests_total', {'prefix': prefix, 'result': 'miss'}, misses)
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = _QueryCounter()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(queries))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = request.resolver_match
+        # Имя URL, а не путь: число рядов не зависит от идентификаторов в URL
+        view = match.view_name if match else 'unresolved'
+        method = request.method if request.method in HTTP_METHODS else 'other'
+        store.inc('baybyway_http_requests_total', {
+            'view': view, 'method': method, 'status': str(response.status_code),
+        })
+        store.observe('baybyway_http_request_duration_seconds', {'view': view}, elapsed)
+        if queries.count:
+            store.inc('baybyway_db_queries_total', {'view': view}, queries.count)
+            store.inc('baybyway_db_query_seconds_total', {'view': view}, queries.duration)
+        return response
@@ -0,0 +1,132 @@
+"""
+Выдача закрытых файлов из MEDIA_ROOT.
+
+Права доступа проверяет представление, а байты отдает nginx по заголовку
+X-Accel-Redirect (internal-location из nginx_baybyway.conf). Если
+PROTECTED_MEDIA_ACCEL_PREFIX не задан, файл отдается потоком из Django
+с ETag/Last-Modified и одним диапазоном Range; файл читается блоками
+и целиком в память не загружается.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import content_disposition_header, http_date
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+class RangeFileWrapper:
+    """Итератор по байтам [start, start + length) открытого файла"""
+
+    def __init__(self, fileobj, start, length):
+        self.fileobj = fileobj
+        self.start = start
+        self.length = length
+
+    def __iter__(self):
+        self.fileobj.seek(self.start)
+        remaining = self.length
+        while remaining > 0:
+            chunk = self.fileobj.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+    def close(self):
+        self.fileobj.close()
+
+
+def parse_range(header, size):
+    """
+    Возвращает (start, end) для одного диапазона, None - если заголовок
+    нужно проигнорировать, и False - если диапазон невыполним (416).
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        if start >= size:
+            return False
+        return start, min(int(last), size - 1) if last else size - 1
+    if last:
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            return False
+        return max(size - suffix, 0), size - 1
+    return None
+
+
+def _finalize(response, filename, as_attachment):
+    response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+    patch_cache_control(response, private=True)
+    return response
+
+
+def serve_protected(request, fieldfile, as_attachment=False):
+    """Отдает файл из FileField после того, как вызывающий проверил права"""
+    if not fieldfile:
+        raise Http404
+
+    name = fieldfile.name
+    filename = os.path.basename(name)
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    accel_prefix = settings.PROTECTED_MEDIA_ACCEL_PREFIX
+    if accel_prefix:
+        # Range, ETag и sendfile обрабатывает nginx
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = accel_prefix + quote(name)
+        return _finalize(response, filename, as_attachment)
+
+    storage = fieldfile.storage
+    try:
+        size = storage.size(name)
+        modified = int(storage.get_modified_time(name).timestamp())
+    except (FileNotFoundError, NotImplementedError):
+        raise Http404
+
+    etag = f'"{modified:x}-{size:x}"'
+    response = get_conditional_response(request, etag=etag, last_modified=modified)
+    if response is not None:
+        return response
+
+    byte_range = None
+    range_header = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    if range_header and if_range in (None, etag, http_date(modified)):
+        byte_range = parse_range(range_header, size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    fileobj = storage.open(name, 'rb')
+    if byte_range is None:
+        response = FileResponse(fileobj, content_type=content_type)
+        response['Content-Length'] = size
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            RangeFileWrapper(fileobj, start, end - start + 1),
+            status=206,
+            content_type=content_type,
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(modified)
+    return _finalize(response, filename, as_attachment)
@@ -69,7 +69,11 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',  # Static files with far-future cache headers
+    'baybyway.metrics.MetricsMiddleware',  # Prometheus request metrics (METRICS_ENABLED)
+    'baybyway.db.instrumentation.QueryInstrumentationMiddleware',  # Per-request SQL stats (SQL_INSTRUMENTATION)
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'baybyway.db.routing.ReplicaStickinessMiddleware',  # Read-your-writes for replica reads
     'django.middleware.locale.LocaleMiddleware',  # For internationalization
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -137,6 +141,42 @@ else:
         }
     }
 
+# Соединения с MySQL переиспользуются между запросами (CONN_MAX_AGE) и проверяются
+# перед первым запросом к БД (CONN_HEALTH_CHECKS). DB_POOL включает пул соединений
+# процесса для многопоточных и ASGI-воркеров: соединение возвращается в пул в конце
+# каждого запроса, а число соединений ограничено DB_POOL_MAX_SIZE.
+DB_POOL = config('DB_POOL', default=False, cast=bool)
+DATABASES['default'].update({
+    'CONN_MAX_AGE': 0 if DB_POOL else config('DB_CONN_MAX_AGE', default=60, cast=int),
+    'CONN_HEALTH_CHECKS': True,
+})
+if DB_POOL:
+    DATABASES['default']['ENGINE'] = 'baybyway.db.mysql_pool'
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+        'max_idle': config('DB_POOL_MAX_IDLE', default=300, cast=int),
+        'timeout': config('DB_POOL_TIMEOUT', default=10, cast=int),
+    }
+
+# Реплика для чтения: страницы каталога, ленты и аналитики (baybyway.db.routing).
+# Без DB_REPLICA_HOST все запросы идут в основную базу.
+DB_REPLICA_HOST = config('DB_REPLICA_HOST', default='')
+if DB_REPLICA_HOST:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': DB_REPLICA_HOST,
+        'PORT': config('DB_REPLICA_PORT', default=DATABASES['default']['PORT']),
+        'USER': config('DB_REPLICA_USER', default=DATABASES['default']['USER']),
+        'PASSWORD': config('DB_REPLICA_PASSWORD', default=DATABASES['default']['PASSWORD']),
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['baybyway.db.routing.ReplicaRouter']
+# Сколько секунд после изменяющего запроса сессия читает с основной базы
+DB_REPLICA_STICKY_SECONDS = config('DB_REPLICA_STICKY_SECONDS', default=10, cast=int)
+# На сколько секунд отказаться от реплики после ошибки подключения
+DB_REPLICA_RETRY_SECONDS = config('DB_REPLICA_RETRY_SECONDS', default=30, cast=int)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -189,10 +229,20 @@ STATICFILES_DIRS = [
 
 if ENVIRONMENT == 'production':
     STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
-    # WhiteNoise configuration for production
-    STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+    # WhiteNoise: имена с хешем содержимого, gzip/brotli и кеширование на год
+    STATICFILES_BACKEND = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 else:
     STATIC_ROOT = BASE_DIR / 'staticfiles'
+    STATICFILES_BACKEND = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': STATICFILES_BACKEND,
+    },
+}
 
 # Media files
 MEDIA_URL = '/media/'
@@ -214,6 +264,115 @@ LOGOUT_REDIRECT_URL = '/'
 # Custom user model (optional, using default for now)
 # AUTH_USER_MODEL = 'accounts.CustomUser'
 
+# Cache
+# Кеш должен быть общим для всех воркеров gunicorn, иначе сброс
+# закешированных данных (роли, статистика) не дойдет до других процессов
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'baybyway.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+elif ENVIRONMENT == 'production':
+    CACHES = {
+        'default': {
+            'BACKEND': 'baybyway.cache.FileBasedCache',
+            'LOCATION': config('CACHE_DIR', default=os.path.join(BASE_DIR, 'cache')),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'baybyway.cache.LocMemCache',
+            'LOCATION': 'unique-snowflake',
+        }
+    }
+
+# Время жизни закешированных ролей пользователей (секунды)
+USER_ROLES_CACHE_TIMEOUT = config('USER_ROLES_CACHE_TIMEOUT', default=3600, cast=int)
+
+# Время жизни снимка статистики дашборда техподдержки (секунды)
+SUPPORT_DASHBOARD_CACHE_TIMEOUT = config('SUPPORT_DASHBOARD_CACHE_TIMEOUT', default=120, cast=int)
+
+# Как часто пересчитывается снимок статистики дашборда учреждения (секунды)
+FACILITY_DASHBOARD_CACHE_TIMEOUT = config('FACILITY_DASHBOARD_CACHE_TIMEOUT', default=300, cast=int)
+
+# Буфер аналитики чтения статей (blog.services.ReadProgressBuffer)
+BLOG_ANALYTICS_FLUSH_INTERVAL = config('BLOG_ANALYTICS_FLUSH_INTERVAL', default=10, cast=int)
+BLOG_ANALYTICS_FLUSH_SIZE = config('BLOG_ANALYTICS_FLUSH_SIZE', default=500, cast=int)
+BLOG_ANALYTICS_SAMPLE_THRESHOLD = config('BLOG_ANALYTICS_SAMPLE_THRESHOLD', default=2000, cast=int)
+BLOG_ANALYTICS_SAMPLE_RATE = config('BLOG_ANALYTICS_SAMPLE_RATE', default=0.1, cast=float)
+BLOG_ANALYTICS_MAX_PENDING = config('BLOG_ANALYTICS_MAX_PENDING', default=10000, cast=int)
+
+# Ограничение числа уведомлений об упоминаниях и цитатах на одно сообщение форума
+FORUM_MAX_MENTION_NOTIFICATIONS = config('FORUM_MAX_MENTION_NOTIFICATIONS', default=10, cast=int)
+FORUM_MAX_QUOTE_NOTIFICATIONS = config('FORUM_MAX_QUOTE_NOTIFICATIONS', default=5, cast=int)
+
+# Сколько секунд воркер помнит соответствие username -> пользователь для упоминаний
+FORUM_USERNAME_CACHE_TTL = config('FORUM_USERNAME_CACHE_TTL', default=60, cast=int)
+
+# Ветки обсуждения форума: корневых сообщений на странице и глубина, после которой ответы сворачиваются
+FORUM_THREADS_PER_PAGE = config('FORUM_THREADS_PER_PAGE', default=10, cast=int)
+FORUM_THREAD_COLLAPSE_DEPTH = config('FORUM_THREAD_COLLAPSE_DEPTH', default=5, cast=int)
+
+# Время жизни закешированного облака тегов форума (секунды)
+FORUM_TAG_CLOUD_CACHE_TIMEOUT = config('FORUM_TAG_CLOUD_CACHE_TIMEOUT', default=600, cast=int)
+
+# Сколько неучтенных действий репутации форума запрос учитывает сам, не дожидаясь
+# таймера apply_reputation_actions (0 - только таймер)
+FORUM_REPUTATION_APPLY_THRESHOLD = config('FORUM_REPUTATION_APPLY_THRESHOLD', default=500, cast=int)
+
+# Время жизни снимка результатов завершенного опроса (секунды)
+FORUM_POLL_RESULTS_CACHE_TIMEOUT = config('FORUM_POLL_RESULTS_CACHE_TIMEOUT', default=3600, cast=int)
+
+# Время жизни закешированных временных рядов дашбордов (секунды)
+TIMESERIES_CACHE_TIMEOUT = config('TIMESERIES_CACHE_TIMEOUT', default=300, cast=int)
+
+# Сколько просмотров статьи копится в кеше перед записью в базу;
+# остаток раз в минуту пишет flush_blog_views (baybyway-blog-views.timer)
+BLOG_VIEWS_FLUSH_THRESHOLD = config('BLOG_VIEWS_FLUSH_THRESHOLD', default=20, cast=int)
+
+# Чат консультаций. SSE-поток (CONSULTATION_CHAT_SSE) включать только при запуске через
+# ASGI (uvicorn) и с брокером, общим для всех воркеров: под WSGI gunicorn поток держит
+# синхронный воркер до CONSULTATION_CHAT_STREAM_TIMEOUT и ничего не отдает до конца.
+# Без SSE страница опрашивает новые сообщения раз в CONSULTATION_CHAT_POLL_INTERVAL секунд
+CONSULTATION_CHAT_SSE = config('CONSULTATION_CHAT_SSE', default=False, cast=bool)
+CONSULTATION_CHAT_POLL_INTERVAL = config('CONSULTATION_CHAT_POLL_INTERVAL', default=5, cast=int)
+# Брокер событий, размер очереди подписчика, интервал keepalive
+# и максимальная длительность SSE-потока (секунды), сообщений в одной выборке
+CONSULTATION_CHAT_BACKEND = config('CONSULTATION_CHAT_BACKEND', default='consultant.realtime.InProcessBroker')
+CONSULTATION_CHAT_QUEUE_SIZE = config('CONSULTATION_CHAT_QUEUE_SIZE', default=100, cast=int)
+CONSULTATION_CHAT_KEEPALIVE = config('CONSULTATION_CHAT_KEEPALIVE', default=15, cast=int)
+CONSULTATION_CHAT_STREAM_TIMEOUT = config('CONSULTATION_CHAT_STREAM_TIMEOUT', default=300, cast=int)
+CONSULTATION_CHAT_BACKLOG_SIZE = config('CONSULTATION_CHAT_BACKLOG_SIZE', default=200, cast=int)
+
+# Префикс internal-location nginx для X-Accel-Redirect закрытых файлов (например /protected-media/).
+# Пустое значение - файлы отдает сам Django потоком с поддержкой Range
+PROTECTED_MEDIA_ACCEL_PREFIX = config('PROTECTED_MEDIA_ACCEL_PREFIX', default='')
+
+# Строить миниатюры фото в фоновом потоке (False - сразу при сохранении)
+IMAGE_DERIVATIVES_ASYNC = config('IMAGE_DERIVATIVES_ASYNC', default=True, cast=bool)
+
+# Учет SQL-запросов по HTTP-запросам (baybyway.db.instrumentation): доля учитываемых
+# запросов, порог медленного запроса (мс), с какого числа повторов запрос считается N+1
+# и добавлять ли итог в заголовок Server-Timing
+SQL_INSTRUMENTATION = config('SQL_INSTRUMENTATION', default=False, cast=bool)
+SQL_INSTRUMENTATION_SAMPLE_RATE = config('SQL_INSTRUMENTATION_SAMPLE_RATE', default=1.0, cast=float)
+SQL_SLOW_QUERY_MS = config('SQL_SLOW_QUERY_MS', default=100, cast=int)
+SQL_DUPLICATE_THRESHOLD = config('SQL_DUPLICATE_THRESHOLD', default=3, cast=int)
+SQL_INSTRUMENTATION_SERVER_TIMING = config('SQL_INSTRUMENTATION_SERVER_TIMING', default=False, cast=bool)
+
+# Метрики Prometheus (baybyway.metrics): каталог файлов процессов, период их записи
+# (секунды) и сети, с которых доступен /metrics/
+METRICS_ENABLED = config('METRICS_ENABLED', default=ENVIRONMENT == 'production', cast=bool)
+METRICS_DIR = config('METRICS_DIR', default=os.path.join(BASE_DIR, 'metrics'))
+METRICS_FLUSH_INTERVAL = config('METRICS_FLUSH_INTERVAL', default=5, cast=int)
+METRICS_ALLOWED_NETWORKS = config(
+    'METRICS_ALLOWED_NETWORKS', default='127.0.0.0/8,::1/128,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16'
+)
+
 # =============================================================================
 # PRODUCTION SETTINGS
 # =============================================================================
@@ -281,14 +440,6 @@ if ENVIRONMENT == 'production':
     EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
     EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
     
-    # Cache settings (Redis recommended for production)
-    CACHES = {
-        'default': {
-            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-            'LOCATION': 'unique-snowflake',
-        }
-    }
-    
     # Session settings
     SESSION_ENGINE = 'django.contrib.sessions.backends.db'
     SESSION_COOKIE_AGE = 1209600  # 2 weeks
@@ -0,0 +1,549 @@
+"""
+Синтетические данные в объеме продакшна для нагрузочного тестирования.
+
+ScaleDataGenerator создает пользователей с семьями и детьми, писателей и
+статьи блога, темы и сообщения форума и записи трекера через bulk_create
+пачками по chunk_size. Первичные ключи назначаются заранее (после текущего
+максимума), поэтому внешние ключи известны без обратных запросов к базе.
+
+Распределения близки к реальным: активность авторов и популярность тем
+убывают по закону Ципфа, новых записей больше, чем старых, ответы
+в теме появляются в основном вскоре после ее создания.
+
+bulk_create не вызывает save() и сигналы, поэтому денормализованные
+счетчики форума, индекс тегов и статистика писателей пересчитываются
+в конце (refresh_rollups). Пользователи получают логины load_<id> и общий
+пароль PASSWORD - под ними можно входить при прогоне бенчмарка.
+"""
+import itertools
+import math
+import multiprocessing
+import random
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from datetime import time as dt_time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from accounts.models import Child, Family, ParentProfile, WriterProfile
+from blog.models import BlogPost
+from forum.models import ForumCategory, Post, Topic, TopicTag
+from forum.rendering import RENDERER_VERSION, render_content
+from forum.services import TopicTagService
+from tracker.models import BabyCry, BabyFeeding, BabyGrowth, BabySleep
+
+USERNAME_PREFIX = 'load_'
+PASSWORD = 'load-test-password'
+
+DEFAULT_VOLUMES = {
+    'users': 1000,
+    'blog_posts': 2000,
+    'topics': 1000,
+    'forum_posts': 10000,
+    'tracker_rows': 20000,
+}
+
+# Доли записей трекера по таблицам: кормления и сон записывают чаще всего
+TRACKER_SHARES = {
+    'BabyFeeding': 45,
+    'BabySleep': 35,
+    'BabyCry': 12,
+    'BabyGrowth': 8,
+}
+TRACKER_MODELS = {model.__name__: model for model in (BabyFeeding, BabySleep, BabyCry, BabyGrowth)}
+# Таблицы с одной записью на пользователя в день: шаг между датами записей (дни)
+DAILY_TRACKER_STEPS = {
+    'BabySleep': 1,
+    'BabyGrowth': 7,
+}
+
+FIRST_NAMES = ['Айгуль', 'Нурлан', 'Мария', 'Алексей', 'Айпери', 'Бакыт', 'Елена', 'Тимур', 'Асель', 'Дмитрий']
+LAST_NAMES = ['Асанова', 'Иванов', 'Токтогулова', 'Смирнов', 'Абдыкадырова', 'Петров', 'Жумабаев', 'Орлова']
+CHILD_NAMES = ['Алия', 'Эмир', 'София', 'Арслан', 'Амина', 'Максим', 'Айша', 'Данияр', 'Ева', 'Нурсултан']
+# Города с весами: большая часть аудитории - столица
+CITIES = {'Бишкек': 55, 'Ош': 15, 'Каракол': 6, 'Джалал-Абад': 6, 'Токмок': 5, 'Нарын': 3, 'Талас': 3, 'Алматы': 7}
+TAGS = [
+    'сон', 'прикорм', 'грудное вскармливание', 'колики', 'зубы', 'температура', 'прививки', 'развитие',
+    'детский сад', 'игрушки', 'аллергия', 'режим дня', 'истерики', 'прогулки', 'смесь', 'врач',
+    'беременность', 'роды', 'первый год', 'горшок', 'массаж', 'купание', 'одежда', 'безопасность',
+]
+PARAGRAPHS = [
+    'Первые месяцы ребенок спит много, но короткими периодами, и это нормально.',
+    'Прикорм обычно начинают с овощного пюре из одного компонента, вводя по одному продукту.',
+    'Если температура держится дольше трех дней, обязательно покажите ребенка врачу.',
+    'Режим дня помогает и малышу, и родителям: старайтесь укладывать ребенка в одно и то же время.',
+    'Колики чаще всего проходят к трем-четырем месяцам; помогает теплая пеленка и массаж животика.',
+    'Прогулки на свежем воздухе нужны каждый день, если нет сильного мороза или жары.',
+    'Не сравнивайте своего ребенка с другими - каждый развивается в своем темпе.',
+    'Подскажите, кто сталкивался с такой ситуацией и что вам помогло?',
+    'У нас было то же самое, через пару недель все наладилось.',
+    'Спасибо всем за советы, попробуем и напишем о результатах.',
+]
+
+# Сколько готовых текстов (с HTML) переиспользуется в сообщениях
+CONTENT_POOL_SIZE = 200
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+class ZipfSampler:
+    """Выбор с частотой ~1/rank^exponent: немногие элементы дают большую часть выборки"""
+
+    def __init__(self, items, rng, exponent=1.1):
+        self.items = list(items)
+        # Популярность не должна совпадать с порядком первичных ключей
+        rng.shuffle(self.items)
+        self.cum_weights = list(itertools.accumulate(1 / (rank + 1) ** exponent for rank in range(len(self.items))))
+
+    def sample(self, rng, k=1):
+        return rng.choices(self.items, cum_weights=self.cum_weights, k=k)
+
+    def one(self, rng):
+        return self.sample(rng)[0]
+
+
+def weighted_choice(rng, weights):
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def recent_datetime(rng, now, days):
+    """Момент за последние days дней; новых записей больше, чем старых"""
+    return now - timedelta(days=days * (1 - math.sqrt(rng.random())))
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """
+    bulk_create вызывает pre_save полей auto_now/auto_now_add и затирает
+    заданные даты; на время генерации эти флаги снимаются.
+    """
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+# Генератор для дочерних процессов (fork наследует его данные без сериализации)
+_active_generator = None
+
+
+def _run_task_in_child(name):
+    connections.close_all()
+    return name, _active_generator.run_task(name)
+
+
+class ScaleDataGenerator:
+    def __init__(self, volumes, seed=42, days=365, chunk_size=5000, writer_share=0.01, log=print):
+        self.volumes = {**DEFAULT_VOLUMES, **volumes}
+        self.seed = seed
+        self.days = days
+        self.chunk_size = chunk_size
+        self.writer_share = writer_share
+        self.log = log
+        self.now = timezone.now()
+        # Заполняются по ходу генерации
+        self.parent_ids = []
+        self.writer_ids = []
+        # (pk ребенка, pk пользователя-родителя, дата рождения)
+        self.children = []
+        # pk темы -> дата создания
+        self.topic_created = {}
+
+    def rng(self, name):
+        # Строковый seed детерминирован и не зависит от PYTHONHASHSEED
+        return random.Random(f'{self.seed}:{name}')
+
+    @staticmethod
+    def next_pk(model):
+        return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+    def insert(self, model, objects, total, label=None):
+        inserted = 0
+        with explicit_timestamps(model):
+            for chunk in chunks(objects, self.chunk_size):
+                with transaction.atomic():
+                    model.objects.bulk_create(chunk, batch_size=self.chunk_size)
+                inserted += len(chunk)
+                if inserted % (self.chunk_size * 20) < self.chunk_size or inserted == total:
+                    self.log(f'{label or model._meta.label}: {inserted}/{total}')
+        return inserted
+
+    # Пользователи, семьи, дети, писатели
+
+    def generate_users(self):
+        count = self.volumes['users']
+        if not count:
+            return
+        rng = self.rng('users')
+        first_pk = self.next_pk(User)
+        password = make_password(PASSWORD)
+        joined = {}
+
+        def users():
+            for pk in range(first_pk, first_pk + count):
+                joined[pk] = recent_datetime(rng, self.now, self.days)
+                yield User(
+                    pk=pk,
+                    username=f'{USERNAME_PREFIX}{pk}',
+                    email=f'{USERNAME_PREFIX}{pk}@example.com',
+                    password=password,
+                    first_name=rng.choice(FIRST_NAMES),
+                    last_name=rng.choice(LAST_NAMES),
+                    date_joined=joined[pk],
+                )
+
+        self.insert(User, users(), count)
+
+        user_ids = list(range(first_pk, first_pk + count))
+        writers_count = max(1, int(count * self.writer_share)) if self.volumes['blog_posts'] else 0
+        rng.shuffle(user_ids)
+        self.writer_ids = sorted(user_ids[:writers_count])
+        self.parent_ids = sorted(user_ids[writers_count:])
+
+        self.insert(WriterProfile, (
+            WriterProfile(
+                user_id=pk,
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=rng.choice(LAST_NAMES),
+                email=f'{USERNAME_PREFIX}{pk}@example.com',
+                specialization='Педиатрия',
+                languages='ru',
+                is_approved=True,
+                created_at=joined[pk],
+                updated_at=joined[pk],
+            )
+            for pk in self.writer_ids
+        ), writers_count)
+
+        self.generate_families(rng, joined)
+
+    def generate_families(self, rng, joined):
+        families, profiles, children = [], [], []
+        child_pk = self.next_pk(Child)
+        index = 0
+        while index < len(self.parent_ids):
+            # Около трети семей - оба родителя
+            members = self.parent_ids[index:index + (2 if rng.random() < 0.35 else 1)]
+            index += len(members)
+            created = joined[members[0]]
+            # id не из rng: при повторном запуске с тем же seed он совпал бы с уже вставленным
+            family = Family(id=uuid.uuid4(), name=f'Семья {rng.choice(LAST_NAMES)}',
+                            created_at=created, updated_at=created)
+            families.append(family)
+
+            for position, user_id in enumerate(members):
+                role = ('mom', 'dad')[position] if len(members) == 2 else ('mom' if rng.random() < 0.8 else 'dad')
+                age = min(max(int(rng.gauss(31, 5)), 18), 55)
+                profiles.append(ParentProfile(
+                    user_id=user_id,
+                    role=role,
+                    family_id=family.id,
+                    city=weighted_choice(rng, CITIES),
+                    birth_date=(self.now - timedelta(days=age * 365 + rng.randrange(365))).date(),
+                    created_at=joined[user_id],
+                    updated_at=joined[user_id],
+                ))
+
+            for _ in range(rng.choices((1, 2, 3), weights=(60, 30, 10))[0]):
+                birth_date = (self.now - timedelta(days=rng.randrange(30, 3 * 365))).date()
+                children.append(Child(
+                    pk=child_pk, family_id=family.id, name=rng.choice(CHILD_NAMES), birth_date=birth_date,
+                    gender=rng.choice(('male', 'female')), created_at=created, updated_at=created,
+                ))
+                self.children.append((child_pk, members[0], birth_date))
+                child_pk += 1
+
+        self.insert(Family, families, len(families))
+        self.insert(ParentProfile, profiles, len(profiles))
+        self.insert(Child, children, len(children))
+
+    # Форум
+
+    def content_pool(self, rng):
+        """Готовые тексты с HTML: рендер каждого сообщения занял бы больше, чем вставка"""
+        pool = []
+        for _ in range(CONTENT_POOL_SIZE):
+            content = '\n\n'.join(rng.sample(PARAGRAPHS, rng.randint(1, 4)))
+            pool.append((content, render_content(content)))
+        return pool
+
+    def generate_topics(self):
+        count = self.volumes['topics']
+        if not count:
+            return
+        # Наличие категорий и авторов проверено в check_prerequisites
+        categories = list(ForumCategory.objects.filter(is_active=True).values_list('pk', flat=True))
+        authors = self.parent_ids or list(User.objects.values_list('pk', flat=True)[:10000])
+
+        rng = self.rng('topics')
+        pool = self.content_pool(rng)
+        author_sampler = ZipfSampler(authors, rng)
+        category_sampler = ZipfSampler(categories, rng, exponent=0.7)
+        tag_sampler = ZipfSampler(TAGS, rng)
+        # normalize ограничивает число тегов одной темы, поэтому нормализуем по одному
+        tag_ids = TopicTagService.get_or_create_tags(
+            {slug: name for tag in TAGS for slug, name in TopicTagService.normalize(tag).items()}
+        )
+        first_pk = self.next_pk(Topic)
+
+        links = []
+
+        def topics():
+            for pk in range(first_pk, first_pk + count):
+                created = recent_datetime(rng, self.now, self.days)
+                content, content_html = rng.choice(pool)
+                tags = TopicTagService.normalize(', '.join(tag_sampler.sample(rng, rng.randint(0, 3))))
+                links.extend(TopicTag(topic_id=pk, tag_id=tag_ids[slug]) for slug in tags)
+                self.topic_created[pk] = created
+                yield Topic(
+                    pk=pk,
+                    title=f'{rng.choice(TAGS).capitalize()}: вопрос #{pk}',
+                    content=content,
+                    content_html=content_html,
+                    content_html_version=RENDERER_VERSION,
+                    category_id=category_sampler.one(rng),
+                    author_id=author_sampler.one(rng),
+                    status='closed' if rng.random() < 0.1 else 'open',
+                    views_count=int(rng.lognormvariate(4, 1.2)),
+                    tags=', '.join(tags.values()),
+                    created_at=created,
+                    updated_at=created,
+                    last_activity=created,
+                )
+
+        self.insert(Topic, topics(), count)
+        self.insert(TopicTag, links, len(links))
+
+    def generate_forum_posts(self):
+        count = self.volumes['forum_posts']
+        topic_created = self.topic_created or dict(
+            Topic.objects.filter(is_active=True).values_list('pk', 'created_at')[:100000]
+        )
+        if not count or not topic_created:
+            return 0
+        authors = self.parent_ids or list(User.objects.values_list('pk', flat=True)[:10000])
+        rng = self.rng('forum_posts')
+        pool = self.content_pool(rng)
+        topic_sampler = ZipfSampler(topic_created, rng)
+        author_sampler = ZipfSampler(authors, rng)
+        # Последние сообщения темы: (pk, path, depth, created_at) - кандидаты в родители ответа
+        recent = {}
+        segment = Post.PATH_SEGMENT_LENGTH
+        first_pk = self.next_pk(Post)
+
+        def posts():
+            for pk in range(first_pk, first_pk + count):
+                topic_id = topic_sampler.one(rng)
+                topic_start = topic_created[topic_id]
+                created = topic_start + (self.now - topic_start) * rng.random() ** 3
+                thread = recent.setdefault(topic_id, deque(maxlen=10))
+                path, depth, parent_id = str(pk).zfill(segment), 0, None
+                if thread and rng.random() < 0.35:
+                    parent_id, parent_path, parent_depth, parent_created = rng.choice(thread)
+                    # Как Post.assign_path: глубже MAX_THREAD_DEPTH ответ становится соседом родителя
+                    prefix, depth = parent_path, parent_depth + 1
+                    if depth > Post.MAX_THREAD_DEPTH:
+                        prefix, depth = parent_path[:-segment], parent_depth
+                    path = prefix + str(pk).zfill(segment)
+                    created = max(created, min(parent_created + timedelta(minutes=rng.randint(1, 600)), self.now))
+                thread.append((pk, path, depth, created))
+                content, content_html = rng.choice(pool)
+                yield Post(
+                    pk=pk,
+                    topic_id=topic_id,
+                    author_id=author_sampler.one(rng),
+                    content=content,
+                    content_html=content_html,
+                    content_html_version=RENDERER_VERSION,
+                    parent_post_id=parent_id,
+                    path=path,
+                    depth=depth,
+                    is_approved=rng.random() < 0.9,
+                    is_hidden=rng.random() < 0.01,
+                    likes_count=int(rng.paretovariate(2)) - 1,
+                    created_at=created,
+                    updated_at=created,
+                )
+
+        return self.insert(Post, posts(), count)
+
+    # Блог
+
+    def generate_blog_posts(self):
+        count = self.volumes['blog_posts']
+        if not count or not self.writer_ids:
+            return 0
+        rng = self.rng('blog_posts')
+        author_sampler = ZipfSampler(self.writer_ids, rng, exponent=0.9)
+
+        def posts():
+            for _ in range(count):
+                created = recent_datetime(rng, self.now, self.days)
+                published = rng.random() < 0.9
+                views = int(rng.lognormvariate(5, 1.5))
+                yield BlogPost(
+                    author_id=author_sampler.one(rng),
+                    title=f'{rng.choice(TAGS).capitalize()}: советы родителям',
+                    content='\n'.join(f'<p>{paragraph}</p>' for paragraph in rng.sample(PARAGRAPHS, rng.randint(3, 8))),
+                    views=views,
+                    views_count=views,
+                    read_time=rng.randint(2, 15),
+                    category=rng.choices(('mom', 'dad', 'general'), weights=(50, 15, 35))[0],
+                    language='ru' if rng.random() < 0.85 else 'ky',
+                    is_published=published,
+                    is_approved=published,
+                    status='published' if published else rng.choice(('draft', 'pending')),
+                    created_at=created,
+                    updated_at=created,
+                )
+
+        return self.insert(BlogPost, posts(), count)
+
+    # Трекер
+
+    def tracker_row(self, model, rng, pk, child_id, user_id, birth_date, day):
+        created = self.now
+        if model is BabyFeeding:
+            feeding_type = rng.choices(('breast', 'formula', 'solid', 'mixed'), weights=(45, 25, 15, 15))[0]
+            return BabyFeeding(
+                pk=pk, user_id=user_id, child_id=child_id, date=day,
+                time=dt_time(rng.randrange(24), rng.randrange(60)), feeding_type=feeding_type,
+                amount='' if feeding_type == 'breast' else f'{rng.randrange(60, 240, 10)} мл',
+                duration=rng.randint(5, 40) if feeding_type == 'breast' else None, created_at=created,
+            )
+        if model is BabySleep:
+            return BabySleep(
+                pk=pk, user_id=user_id, child_id=child_id, date=day,
+                hours_slept=Decimal(f'{min(max(rng.gauss(12, 2), 4), 20):.1f}'),
+                sleep_quality=rng.choices(('excellent', 'good', 'fair', 'poor'), weights=(20, 45, 25, 10))[0],
+                created_at=created,
+            )
+        if model is BabyCry:
+            return BabyCry(
+                pk=pk, user_id=user_id, child_id=child_id, date=day, minutes_cried=int(rng.expovariate(1 / 15)) + 1,
+                reason=rng.choices(('hunger', 'tired', 'discomfort', 'pain', 'attention', 'other'),
+                                   weights=(30, 25, 20, 5, 15, 5))[0],
+                created_at=created,
+            )
+        months = max((day - birth_date).days, 0) / 30.4
+        return BabyGrowth(
+            pk=pk, user_id=user_id, child_id=child_id, date=day,
+            height=Decimal(f'{50 + 25 * math.log1p(months / 3) + rng.gauss(0, 2):.2f}'),
+            weight=Decimal(f'{3.4 + 8 * math.log1p(months / 4) + rng.gauss(0, 0.5):.2f}'),
+            created_at=created,
+        )
+
+    def generate_tracker(self, model_name):
+        model = TRACKER_MODELS[model_name]
+        count = self.volumes['tracker_rows'] * TRACKER_SHARES[model_name] // sum(TRACKER_SHARES.values())
+        if not count or not self.children:
+            return 0
+        rng = self.rng(model_name)
+        # Активные семьи ведут трекер гораздо подробнее остальных
+        child_sampler = ZipfSampler(range(len(self.children)), rng, exponent=0.8)
+        first_pk = self.next_pk(model)
+        today = self.now.date()
+        step = DAILY_TRACKER_STEPS.get(model_name)
+        # Для таблиц с уникальностью (user, date) - сколько дней назад следующая запись пользователя
+        next_offset = {}
+
+        def rows():
+            pk = first_pk
+            misses = 0
+            while pk < first_pk + count:
+                child_id, user_id, birth_date = self.children[child_sampler.one(rng)]
+                age_days = max((today - birth_date).days, 1)
+                if step is None:
+                    offset = rng.randrange(age_days)
+                else:
+                    offset = next_offset.get(user_id, 0)
+                    if offset >= age_days:
+                        # Дни этого пользователя закончились; если заняты почти все - останавливаемся
+                        misses += 1
+                        if misses > 1000:
+                            self.log(f'{model._meta.label}: свободных дат не осталось после {pk - first_pk} записей')
+                            return
+                        continue
+                    next_offset[user_id] = offset + step
+                misses = 0
+                yield self.tracker_row(model, rng, pk, child_id, user_id, birth_date, today - timedelta(days=offset))
+                pk += 1
+
+        return self.insert(model, rows(), count)
+
+    # Запуск
+
+    def tasks(self):
+        """Независимые таблицы, которые можно заполнять параллельно"""
+        return ['forum_posts', 'blog_posts', *TRACKER_SHARES]
+
+    def run_task(self, name):
+        if name == 'forum_posts':
+            return self.generate_forum_posts()
+        if name == 'blog_posts':
+            return self.generate_blog_posts()
+        return self.generate_tracker(name)
+
+    def check_prerequisites(self):
+        """Проверки до первой вставки, чтобы ошибка не оставляла половину данных"""
+        if not self.volumes['topics']:
+            return
+        if not ForumCategory.objects.filter(is_active=True).exists():
+            raise ValueError('Нет активных категорий форума: сначала выполните create_sample_forum_data')
+        if not self.volumes['users'] and not User.objects.exists():
+            raise ValueError('Нет пользователей - авторов тем: задайте --users больше 0')
+
+    def run(self, workers=1):
+        global _active_generator
+        self.check_prerequisites()
+        self.generate_users()
+        self.generate_topics()
+
+        if workers > 1:
+            # Соединения родителя не должны достаться потомкам
+            connections.close_all()
+            _active_generator = self
+            try:
+                with multiprocessing.get_context('fork').Pool(workers) as pool:
+                    results = dict(pool.imap_unordered(_run_task_in_child, self.tasks()))
+            finally:
+                _active_generator = None
+        else:
+            results = {name: self.run_task(name) for name in self.tasks()}
+
+        self.refresh_rollups()
+        return results
+
+    def refresh_rollups(self):
+        """Счетчики, которые при обычной работе поддерживают save() и сигналы"""
+        if self.volumes['topics'] or self.volumes['forum_posts']:
+            call_command('repair_forum_counters', stdout=_NullWriter())
+        for writer in WriterProfile.objects.filter(user_id__in=self.writer_ids):
+            writer.update_statistics()
+
+
+class _NullWriter:
+    def write(self, *args, **kwargs):
+        pass
+
+    def flush(self):
+        pass
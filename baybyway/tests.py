@@ -0,0 +1,464 @@
+import importlib.util
+import json
+import shutil
+import tempfile
+from datetime import date, datetime
+from io import BytesIO
+from unittest import mock, skipUnless
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.http import Http404, HttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from PIL import Image
+
+from accounts.models import ParentProfile, WriterProfile
+from baybyway import images, metrics, timeseries
+from baybyway.db import instrumentation, pool as pool_module
+from baybyway.db.instrumentation import MAX_REPORTED, QueryInstrumentationMiddleware, fingerprint
+from baybyway.db.pool import ConnectionPool
+from baybyway.images import DERIVATIVE_SIZES, DerivativeQueue, derivative_name, pick_size, process_image
+from baybyway.timeseries import TimeSeriesService
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        self.enterContext(mock.patch.object(pool_module.time, 'monotonic', lambda: self.now))
+        self.opened = []
+        self.alive = True
+
+    def connect(self):
+        connection = FakeConnection(len(self.opened))
+        self.opened.append(connection)
+        return connection
+
+    def pool(self, **options):
+        return ConnectionPool(self.connect, lambda connection: self.alive, **options)
+
+    def test_released_connection_is_reused(self):
+        pool = self.pool()
+        connection, fresh = pool.acquire()
+        self.assertTrue(fresh)
+        pool.release(connection)
+        self.assertEqual(pool.acquire(), (connection, False))
+        self.assertEqual(pool.created, 1)
+
+    def test_size_is_bounded_and_acquire_times_out(self):
+        pool = self.pool(max_size=2, timeout=0.01)
+        first, second = pool.acquire(), pool.acquire()
+        self.assertIsNone(pool.acquire())
+        self.assertEqual(pool.created, 2)
+
+        pool.release(first[0])
+        self.assertEqual(pool.acquire(), (first[0], False))
+        self.assertIsNone(pool.acquire())
+        pool.release(second[0], discard=True)
+        self.assertEqual(pool.acquire()[1], True)
+        self.assertEqual(pool.created, 3)
+
+    def test_failed_connect_frees_slot(self):
+        pool = ConnectionPool(mock.Mock(side_effect=OSError), lambda connection: True, max_size=1, timeout=0.01)
+        with self.assertRaises(OSError):
+            pool.acquire()
+        with self.assertRaises(OSError):
+            # Место не потеряно: второй вызов снова пытается подключиться
+            pool.acquire()
+
+    def test_idle_connections_are_reaped(self):
+        pool = self.pool(max_idle=60)
+        old, _ = pool.acquire()
+        recent, _ = pool.acquire()
+        pool.release(old)
+        self.now += 50
+        pool.release(recent)
+        self.now += 20
+
+        self.assertEqual(pool.acquire(), (recent, False))
+        self.assertTrue(old.closed)
+        self.assertEqual(pool.idle_count(), 0)
+
+    def test_stale_connection_is_checked_before_reuse(self):
+        pool = self.pool(check_after=30)
+        connection, _ = pool.acquire()
+        pool.release(connection)
+        self.now += 40
+        self.alive = False
+
+        replacement, fresh = pool.acquire()
+        self.assertTrue(fresh)
+        self.assertIsNot(replacement, connection)
+        self.assertTrue(connection.closed)
+
+    def test_discarded_connection_is_closed(self):
+        pool = self.pool(max_size=1, timeout=0.01)
+        connection, _ = pool.acquire()
+        pool.release(connection, discard=True)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.idle_count(), 0)
+        self.assertTrue(pool.acquire()[1])
+
+    def test_close_all_closes_idle(self):
+        pool = self.pool()
+        connection, _ = pool.acquire()
+        pool.release(connection)
+        pool.close_all()
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.idle_count(), 0)
+
+
+@skipUnless(importlib.util.find_spec('MySQLdb'), 'нужен mysqlclient')
+class PooledDatabaseWrapperTest(SimpleTestCase):
+    """Какие соединения бэкенд возвращает в пул, а какие закрывает"""
+
+    def wrapper(self, **state):
+        from baybyway.db.mysql_pool.base import DatabaseWrapper
+
+        wrapper = DatabaseWrapper({
+            'ENGINE': 'baybyway.db.mysql_pool', 'NAME': 'test', 'USER': '', 'PASSWORD': '', 'HOST': '', 'PORT': '',
+            'OPTIONS': {}, 'AUTOCOMMIT': True, 'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'ATOMIC_REQUESTS': False,
+            'TIME_ZONE': None, 'TEST': {},
+        }, 'pool_test')
+        wrapper.connection = mock.Mock(**{'get_autocommit.return_value': True})
+        wrapper._pool = mock.Mock()
+        for name, value in state.items():
+            setattr(wrapper, name, value)
+        return wrapper
+
+    def released_with(self, **state):
+        wrapper = self.wrapper(**state)
+        pool, connection = wrapper._pool, wrapper.connection
+        wrapper._close()
+        pool.release.assert_called_once_with(connection, discard=mock.ANY)
+        return pool.release.call_args.kwargs['discard']
+
+    def test_clean_connection_returns_to_pool(self):
+        self.assertFalse(self.released_with())
+
+    def test_connection_after_error_is_discarded(self):
+        self.assertTrue(self.released_with(errors_occurred=True))
+
+    def test_connection_in_transaction_is_discarded(self):
+        self.assertTrue(self.released_with(in_atomic_block=True))
+
+
+class TimeSeriesServiceTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Местное время (Asia/Bishkek): границы месяцев не совпадают с UTC
+        for number, moment in enumerate([
+            datetime(2024, 11, 30, 23, 59),
+            datetime(2024, 12, 1, 0, 0),
+            datetime(2025, 1, 31, 23, 59),
+            datetime(2025, 2, 1, 0, 0),
+            datetime(2025, 2, 1, 0, 30),
+        ]):
+            user = User.objects.create_user(f'user{number}')
+            User.objects.filter(pk=user.pk).update(date_joined=timezone.make_aware(moment))
+            ParentProfile.objects.create(user=user)
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def values(self, series):
+        return [(point['period'], point['value']) for point in series]
+
+    def test_months_follow_local_calendar_and_gaps_are_zero(self):
+        series = TimeSeriesService.compute(User.objects.all(), 'date_joined', count=5, until=date(2025, 4, 15))
+        self.assertEqual(self.values(series), [
+            (date(2024, 12, 1), 1),
+            (date(2025, 1, 1), 1),
+            (date(2025, 2, 1), 2),
+            (date(2025, 3, 1), 0),
+            (date(2025, 4, 1), 0),
+        ])
+
+    def test_start_bound_compares_datetime_column(self):
+        with CaptureQueriesContext(connection) as queries:
+            TimeSeriesService.compute(User.objects.all(), 'date_joined', count=3, until=date(2025, 2, 10))
+        self.assertNotIn('django_datetime_cast_date', queries[0]['sql'])
+        self.assertEqual(
+            TimeSeriesService._since(User.objects.all(), 'date_joined', date(2024, 12, 1)),
+            {'date_joined__gte': timezone.make_aware(datetime(2024, 12, 1))},
+        )
+
+    def test_related_field_path(self):
+        series = TimeSeriesService.compute(
+            ParentProfile.objects.all(), 'user__date_joined', granularity=TimeSeriesService.WEEK, count=2,
+            until=date(2025, 2, 2),
+        )
+        self.assertEqual(self.values(series), [(date(2025, 1, 20), 0), (date(2025, 1, 27), 3)])
+
+    def test_series_is_cached_per_current_period(self):
+        with mock.patch.object(timeseries.timezone, 'localdate', return_value=date(2025, 2, 10)):
+            first = TimeSeriesService.get_series(User.objects.all(), 'users', 'date_joined', count=2)
+            with self.assertNumQueries(0):
+                self.assertEqual(TimeSeriesService.get_series(User.objects.all(), 'users', 'date_joined', count=2),
+                                 first)
+        self.assertIsNotNone(cache.get('timeseries:users:month:2:2025-02-01'))
+
+        with mock.patch.object(timeseries.timezone, 'localdate', return_value=date(2025, 3, 1)):
+            with self.assertNumQueries(1):
+                series = TimeSeriesService.get_series(User.objects.all(), 'users', 'date_joined', count=2)
+        self.assertEqual(self.values(series), [(date(2025, 2, 1), 2), (date(2025, 3, 1), 0)])
+
+    def test_unknown_granularity(self):
+        with self.assertRaises(ValueError):
+            TimeSeriesService.compute(User.objects.all(), 'date_joined', granularity='hour')
+
+
+def png(color='red', size=(400, 300)):
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return ContentFile(buffer.getvalue())
+
+
+@override_settings(IMAGE_DERIVATIVES_ASYNC=False)
+class ImageDerivativesTest(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        user = User.objects.create_user('writer')
+        self.writer = WriterProfile.objects.create(user=user, first_name='А', last_name='Б', email='a@example.com')
+
+    def upload(self, color='red'):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.writer.photo.save(f'{color}.png', png(color))
+        self.writer.refresh_from_db()
+
+    def render(self, pixels):
+        return Template('{% load image_tags %}{% picture photo ' + str(pixels) + ' alt="Фото" %}').render(
+            Context({'photo': self.writer.photo})
+        )
+
+    def test_pick_size(self):
+        self.assertEqual([pick_size(pixels) for pixels in (1, 48, 49, 160, 161, 1000)], [48, 48, 96, 160, 320, 320])
+
+    def test_picture_falls_back_to_original(self):
+        with mock.patch.object(DerivativeQueue, 'enqueue'), self.captureOnCommitCallbacks(execute=True):
+            self.writer.photo.save('red.png', png())
+        self.assertEqual(self.render(80), f'<img src="{self.writer.photo.url}" alt="Фото">')
+
+    def test_upload_builds_derivatives_once(self):
+        with mock.patch.object(images, 'content_hash', wraps=images.content_hash) as content_hash:
+            self.upload()
+        self.assertEqual(content_hash.call_count, 1)
+        digest = self.writer.photo_hash
+        self.assertEqual(len(digest), 32)
+        for size in DERIVATIVE_SIZES:
+            for ext in ('webp', 'jpg'):
+                self.assertTrue(default_storage.exists(derivative_name(digest, size, ext)))
+
+        html = self.render(80)
+        self.assertIn(f'srcset="{default_storage.url(derivative_name(digest, 96, "webp"))} 1x, '
+                      f'{default_storage.url(derivative_name(digest, 160, "webp"))} 2x"', html)
+        self.assertNotIn(self.writer.photo.url, html)
+
+    def test_unchanged_photo_is_not_queued(self):
+        self.upload()
+        with mock.patch.object(DerivativeQueue, 'enqueue') as enqueue, self.captureOnCommitCallbacks(execute=True):
+            self.writer.bio = 'Педиатр'
+            self.writer.save()
+            deferred = WriterProfile.objects.only('pk', 'user', 'bio').get(pk=self.writer.pk)
+            with self.assertNumQueries(1):
+                deferred.save()
+        enqueue.assert_not_called()
+
+        self.upload('blue')
+        self.assertEqual(self.writer.photo_hash, process_image('accounts.WriterProfile', self.writer.pk, 'photo'))
+
+    def test_process_image_clears_hash_without_photo(self):
+        self.upload()
+        WriterProfile.objects.filter(pk=self.writer.pk).update(photo='')
+        self.assertIsNone(process_image('accounts.WriterProfile', self.writer.pk, 'photo'))
+        self.writer.refresh_from_db()
+        self.assertEqual(self.writer.photo_hash, '')
+
+
+def repeated_lookups_view(request):
+    for pk in range(3):
+        User.objects.filter(pk=pk).first()
+    response = HttpResponse()
+    response['Server-Timing'] = 'app;dur=1'
+    return response
+
+
+@override_settings(
+    SQL_INSTRUMENTATION=True, SQL_INSTRUMENTATION_SAMPLE_RATE=1.0, SQL_SLOW_QUERY_MS=10000,
+    SQL_DUPLICATE_THRESHOLD=3, SQL_INSTRUMENTATION_SERVER_TIMING=True,
+)
+class QueryInstrumentationTest(TestCase):
+    def setUp(self):
+        self.middleware = QueryInstrumentationMiddleware(repeated_lookups_view)
+        self.request = RequestFactory().get('/probe/')
+        self.request.resolver_match = None
+
+    def report(self, level='WARNING'):
+        with self.assertLogs('baybyway.sql', level) as logs:
+            response = self.middleware(self.request)
+        return response, json.loads(logs.records[0].getMessage())
+
+    def test_fingerprint_collapses_values(self):
+        self.assertEqual(
+            fingerprint("SELECT *  FROM t WHERE id IN (%s, %s, %s) AND name = 'O''Brien' AND n > 10 LIMIT 21"),
+            'SELECT * FROM t WHERE id IN (...) AND name = ? AND n > ? LIMIT ?',
+        )
+        self.assertEqual(fingerprint('SELECT 1 FROM t WHERE id IN (%s)'), fingerprint('SELECT 2 FROM t WHERE id IN (%s, %s)'))
+
+    def test_repeated_queries_are_reported_with_call_site(self):
+        response, report = self.report()
+        self.assertEqual(report['queries'], 3)
+        self.assertEqual(report['path'], '/probe/')
+        [duplicate] = report['duplicates']
+        self.assertEqual(duplicate['count'], 3)
+        self.assertIn('LIMIT ?', duplicate['sql'])
+        self.assertTrue(duplicate['call_site'].startswith('baybyway/tests.py:'))
+        self.assertTrue(duplicate['call_site'].endswith(' repeated_lookups_view'))
+        self.assertEqual(report['slow'], [])
+
+    @override_settings(SQL_DUPLICATE_THRESHOLD=4)
+    def test_below_threshold_logs_info(self):
+        response, report = self.report('INFO')
+        self.assertEqual(report['duplicates'], [])
+
+    @override_settings(SQL_SLOW_QUERY_MS=0)
+    def test_slow_queries_are_listed(self):
+        response, report = self.report()
+        self.assertEqual(len(report['slow']), 3)
+        self.assertEqual(report['slow'][0]['db'], 'default')
+        self.assertTrue(report['slow'][0]['call_site'].endswith(' repeated_lookups_view'))
+
+        def many_queries(request):
+            for pk in range(MAX_REPORTED + 5):
+                User.objects.filter(pk=pk).exists()
+            return HttpResponse()
+
+        with self.assertLogs('baybyway.sql', 'WARNING') as logs:
+            QueryInstrumentationMiddleware(many_queries)(self.request)
+        self.assertEqual(len(json.loads(logs.records[0].getMessage())['slow']), MAX_REPORTED)
+
+    def test_server_timing_header_is_appended(self):
+        response, report = self.report()
+        self.assertEqual(
+            response['Server-Timing'],
+            f'app;dur=1, db;dur={report["db_ms"]};desc="3 queries", dup;desc="1 repeated"',
+        )
+
+    @override_settings(SQL_INSTRUMENTATION_SAMPLE_RATE=0.25)
+    def test_sample_rate(self):
+        with mock.patch.object(instrumentation.random, 'random', return_value=0.3), self.assertNoLogs('baybyway.sql'):
+            response = self.middleware(self.request)
+        self.assertEqual(response['Server-Timing'], 'app;dur=1')
+        with mock.patch.object(instrumentation.random, 'random', return_value=0.2):
+            self.report()
+
+    @override_settings(SQL_INSTRUMENTATION=False)
+    def test_disabled_middleware_is_unused(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            QueryInstrumentationMiddleware(repeated_lookups_view)
+
+
+class MetricsTest(SimpleTestCase):
+    def setUp(self):
+        metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, metrics_dir)
+        self.enterContext(override_settings(METRICS_DIR=metrics_dir))
+        self.directory = metrics.Path(metrics_dir)
+        self.store = metrics.MetricsStore()
+        self.enterContext(mock.patch.object(self.store, '_ensure_worker'))
+        self.enterContext(mock.patch.dict(metrics.QUEUE_GAUGES, {'probe': 'baybyway.tests.queue_depth'}, clear=True))
+
+    def test_render_counters(self):
+        text = metrics.render({
+            ('baybyway_http_requests_total', (('method', 'GET'), ('status', '200'), ('view', 'blog:list'))): 3.0,
+            ('baybyway_db_query_seconds_total', (('view', 'say "hi"\n'),)): 0.25,
+            ('custom_total', ()): 1,
+        })
+        self.assertEqual(text.splitlines(), [
+            '# HELP baybyway_db_query_seconds_total Time spent in SQL queries while handling requests, by view.',
+            '# TYPE baybyway_db_query_seconds_total counter',
+            'baybyway_db_query_seconds_total{view="say \\"hi\\"\\n"} 0.25',
+            '# HELP baybyway_http_requests_total HTTP requests by view, method and status code.',
+            '# TYPE baybyway_http_requests_total counter',
+            'baybyway_http_requests_total{method="GET",status="200",view="blog:list"} 3',
+            '# HELP custom_total ',
+            '# TYPE custom_total untyped',
+            'custom_total 1',
+        ])
+
+    def test_histogram_buckets_are_ordered_by_bound(self):
+        self.store.observe('baybyway_http_request_duration_seconds', {'view': 'home'}, 0.03)
+        self.store.observe('baybyway_http_request_duration_seconds', {'view': 'home'}, 3.0)
+        lines = metrics.render(dict(self.store._values)).splitlines()
+        buckets = [line for line in lines if '_bucket' in line]
+        self.assertEqual(
+            [line.split('le="')[1].split('"')[0] for line in buckets],
+            [repr(bound) for bound in metrics.DURATION_BUCKETS] + ['+Inf'],
+        )
+        self.assertIn('baybyway_http_request_duration_seconds_bucket{le="0.025",view="home"} 0', lines)
+        self.assertIn('baybyway_http_request_duration_seconds_bucket{le="0.05",view="home"} 1', lines)
+        self.assertIn('baybyway_http_request_duration_seconds_bucket{le="+Inf",view="home"} 2', lines)
+        self.assertEqual(lines[-2:], [
+            'baybyway_http_request_duration_seconds_count{view="home"} 2',
+            'baybyway_http_request_duration_seconds_sum{view="home"} 3.03',
+        ])
+
+    def test_collect_folds_dead_worker_into_archive(self):
+        # Файл воркера, который уже завершился
+        dead = 4194305
+        metrics._write_json(self.directory / f'{metrics.PROCESS_FILE_PREFIX}{dead}-x.json', {
+            'pid': dead,
+            'counters': [['baybyway_http_requests_total', [['view', 'home']], 5]],
+            'gauges': [['baybyway_queue_depth', [['queue', 'probe']], 7]],
+        })
+        key = ('baybyway_http_requests_total', (('view', 'home'),))
+        self.store.inc('baybyway_http_requests_total', {'view': 'home'}, 2)
+
+        with mock.patch.object(metrics, '_pid_alive', lambda pid: pid != dead):
+            totals = self.store.collect()
+            self.assertEqual(totals[key], 7)
+            self.assertEqual(totals[('baybyway_queue_depth', (('queue', 'probe'),))], 4)
+            self.assertEqual(
+                sorted(path.name for path in self.directory.glob('*.json')),
+                sorted([metrics.ARCHIVE_FILE, self.store._path.name]),
+            )
+            # Повторный сбор не удваивает архив
+            self.assertEqual(self.store.collect()[key], 7)
+
+    def test_is_internal(self):
+        factory = RequestFactory()
+        self.assertTrue(metrics.is_internal(factory.get('/metrics/', REMOTE_ADDR='127.0.0.1')))
+        self.assertTrue(metrics.is_internal(factory.get('/metrics/', REMOTE_ADDR='10.1.2.3')))
+        self.assertFalse(metrics.is_internal(factory.get('/metrics/', REMOTE_ADDR='8.8.8.8')))
+        self.assertFalse(metrics.is_internal(factory.get('/metrics/', REMOTE_ADDR='')))
+        self.assertFalse(metrics.is_internal(
+            factory.get('/metrics/', REMOTE_ADDR='127.0.0.1', HTTP_X_FORWARDED_FOR='203.0.113.5')
+        ))
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_view_is_hidden_when_disabled(self):
+        with self.assertRaises(Http404):
+            metrics.metrics_view(RequestFactory().get('/metrics/', REMOTE_ADDR='127.0.0.1'))
+
+
+def queue_depth():
+    return 4
@@ -0,0 +1,133 @@
+"""
+Временные ряды для дашбордов.
+
+Ряд любой модели строится одним запросом GROUP BY Trunc*(поле даты) по
+календарным периодам, недостающие периоды заполняются нулями.
+"""
+from datetime import date, datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.db.models import Count
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek, TruncYear
+from django.utils import timezone
+
+
+class TimeSeriesService:
+    """Агрегация queryset по календарным периодам"""
+
+    DAY = 'day'
+    WEEK = 'week'
+    MONTH = 'month'
+    YEAR = 'year'
+
+    TRUNC_FUNCTIONS = {
+        DAY: TruncDay,
+        WEEK: TruncWeek,
+        MONTH: TruncMonth,
+        YEAR: TruncYear,
+    }
+
+    CACHE_PREFIX = 'timeseries:'
+
+    @classmethod
+    def period_start(cls, day, granularity):
+        """Начало периода, содержащего дату"""
+        if granularity == cls.DAY:
+            return day
+        if granularity == cls.WEEK:
+            return day - timedelta(days=day.weekday())
+        if granularity == cls.MONTH:
+            return day.replace(day=1)
+        if granularity == cls.YEAR:
+            return day.replace(month=1, day=1)
+        raise ValueError(f'Unknown granularity: {granularity}')
+
+    @classmethod
+    def previous_period(cls, start, granularity):
+        """Начало предыдущего периода"""
+        if granularity == cls.DAY:
+            return start - timedelta(days=1)
+        if granularity == cls.WEEK:
+            return start - timedelta(days=7)
+        return cls.period_start(start - timedelta(days=1), granularity)
+
+    @classmethod
+    def periods(cls, granularity, count, until=None):
+        """Начала последних count периодов, от старых к новым"""
+        current = cls.period_start(until or timezone.localdate(), granularity)
+        starts = [current]
+        for i in range(count - 1):
+            starts.append(cls.previous_period(starts[-1], granularity))
+        return starts[::-1]
+
+    @staticmethod
+    def _resolve_field(model, date_field):
+        """Поле по пути через связи (doctor__created_at)"""
+        *relations, name = date_field.split('__')
+        for relation in relations:
+            model = model._meta.get_field(relation).related_model
+        return model._meta.get_field(name)
+
+    @classmethod
+    def _since(cls, queryset, date_field, start):
+        """
+        Фильтр "не раньше начала первого периода". DateTimeField сравнивается
+        с началом локального дня: __date обернул бы столбец в DATE() и не дал
+        бы использовать индекс
+        """
+        try:
+            field = cls._resolve_field(queryset.model, date_field)
+        except (FieldDoesNotExist, AttributeError):
+            # Не поле модели (например, аннотация) - считаем, что это дата и время
+            field = models.DateTimeField()
+        if isinstance(field, models.DateTimeField):
+            start = timezone.make_aware(datetime.combine(start, time.min))
+        return {f'{date_field}__gte': start}
+
+    @classmethod
+    def compute(cls, queryset, date_field='created_at', granularity=MONTH, count=6, aggregate=None, until=None):
+        """
+        Ряд [{'period': date, 'value': число}, ...] от старых периодов к новым.
+
+        aggregate - агрегатное выражение для значения (по умолчанию Count('pk')).
+        """
+        trunc = cls.TRUNC_FUNCTIONS.get(granularity)
+        if trunc is None:
+            raise ValueError(f'Unknown granularity: {granularity}')
+
+        starts = cls.periods(granularity, count, until)
+        rows = queryset.filter(**cls._since(queryset, date_field, starts[0])).annotate(
+            period=trunc(date_field, output_field=models.DateField())
+        ).values('period').annotate(value=aggregate or Count('pk')).order_by()
+
+        values = {}
+        for row in rows:
+            period = row['period']
+            if not isinstance(period, date):
+                # Некоторые бэкенды отдают строку
+                period = date.fromisoformat(str(period)[:10])
+            values[period] = row['value'] or 0
+        return [{'period': start, 'value': values.get(start, 0)} for start in starts]
+
+    @classmethod
+    def get_series(cls, queryset, cache_key, date_field='created_at', granularity=MONTH, count=6,
+                   aggregate=None, timeout=None):
+        """
+        Ряд с кешированием на короткое время.
+
+        cache_key должен однозначно описывать queryset и агрегат
+        (например, 'doctor_consultations:42'); текущий период входит в ключ,
+        поэтому ряд сам обновляется при смене периода.
+        """
+        until = timezone.localdate()
+        key = f'{cls.CACHE_PREFIX}{cache_key}:{granularity}:{count}:{cls.period_start(until, granularity).isoformat()}'
+        series = cache.get(key)
+        if series is None:
+            series = cls.compute(queryset, date_field, granularity, count, aggregate, until)
+            if timeout is None:
+                timeout = getattr(settings, 'TIMESERIES_CACHE_TIMEOUT', 300)
+            cache.set(key, series, timeout)
+        return series
@@ -20,6 +20,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.views.generic import TemplateView
 from django.shortcuts import render
+from baybyway.metrics import metrics_view
 
 def home_view(request):
     return render(request, 'home.html')
@@ -38,6 +39,7 @@ urlpatterns = [
     path('support/', include('support.urls')),
     path('notifications/', include('notifications.urls')),
     path('i18n/', include('django.conf.urls.i18n')),
+    path('metrics/', metrics_view, name='metrics'),
 ]
 
 if settings.DEBUG:
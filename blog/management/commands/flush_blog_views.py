@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from blog.services import BlogViewBuffer
+
+
+class Command(BaseCommand):
+    help = 'Записывает накопленные в кеше просмотры статей в базу данных'
+
+    def handle(self, *args, **options):
+        flushed = BlogViewBuffer.flush_all()
+        self.stdout.write(self.style.SUCCESS(f'Записано просмотров: {flushed}'))
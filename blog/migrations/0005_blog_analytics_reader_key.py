@@ -0,0 +1,41 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_reader_keys(apps, schema_editor):
+    """Существующие записи аналитики принадлежат зарегистрированным читателям"""
+    BlogAnalytics = apps.get_model('blog', 'BlogAnalytics')
+    rows = list(BlogAnalytics.objects.only('id', 'user_id'))
+    for row in rows:
+        row.reader_key = f'u:{row.user_id}'
+    BlogAnalytics.objects.bulk_update(rows, ['reader_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_blogdislike'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='bloganalytics',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='blog_analytics', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AddField(
+            model_name='bloganalytics',
+            name='reader_key',
+            field=models.CharField(default='', max_length=40, verbose_name='Ключ читателя'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_reader_keys, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='bloganalytics',
+            unique_together={('blog_post', 'user'), ('blog_post', 'reader_key')},
+        ),
+    ]
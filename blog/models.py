@@ -40,9 +40,21 @@ class BlogPost(models.Model):
         verbose_name_plural = _('Статьи блога')
         ordering = ['-created_at']
     
+    # Поля, от которых зависит статистика автора (accounts.WriterProfile)
+    STATISTICS_FIELDS = ('author_id', 'read_time', 'views_count')
+    
     def __str__(self):
         return self.title
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем состояние для инкрементального обновления статистики автора
+        instance._statistics_state = {
+            field: instance.__dict__[field] for field in cls.STATISTICS_FIELDS if field in instance.__dict__
+        }
+        return instance
+    
     def get_absolute_url(self):
         from django.urls import reverse
         return reverse('blog:post_detail', kwargs={'pk': self.pk})
@@ -115,7 +127,9 @@ class BlogDislike(models.Model):
 class BlogAnalytics(models.Model):
     """Аналитика статей блога"""
     blog_post = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='analytics', verbose_name=_('Статья'))
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='blog_analytics', verbose_name=_('Пользователь'))
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='blog_analytics', null=True, blank=True, verbose_name=_('Пользователь'))
+    # 'u:<id пользователя>' или 's:<id анонимного читателя>'
+    reader_key = models.CharField(max_length=40, verbose_name=_('Ключ читателя'))
     view_duration = models.PositiveIntegerField(default=0, verbose_name=_('Время просмотра (сек)'))
     read_progress = models.PositiveIntegerField(default=0, verbose_name=_('Прогресс чтения (%)'))
     user_age = models.PositiveIntegerField(null=True, blank=True, verbose_name=_('Возраст пользователя'))
@@ -135,7 +149,8 @@ class BlogAnalytics(models.Model):
     class Meta:
         verbose_name = _('Аналитика статьи')
         verbose_name_plural = _('Аналитика статей')
-        unique_together = ['blog_post', 'user']
+        unique_together = [['blog_post', 'user'], ['blog_post', 'reader_key']]
     
     def __str__(self):
-        return f"{self.blog_post.title} - {self.user.username}"
\ No newline at end of file
+        reader = self.user.username if self.user_id else _('Аноним')
+        return f"{self.blog_post.title} - {reader}"
\ No newline at end of file
@@ -0,0 +1,390 @@
+import atexit
+import logging
+import random
+import threading
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Case, Count, F, FloatField, Value, When
+from django.db.models.functions import Cast, Greatest, Least
+
+from .models import BlogPost, BlogAnalytics
+
+
+logger = logging.getLogger(__name__)
+
+
+def _add(field, delta):
+    """
+    Приращение счетчика без ухода в минус: столбцы беззнаковые, и в MySQL
+    даже промежуточное отрицательное значение дает ошибку диапазона
+    """
+    if delta >= 0:
+        return F(field) + delta
+    return Case(When(**{f'{field}__gte': -delta}, then=F(field) + delta), default=Value(0))
+
+
+class WriterAnalyticsService:
+    """Аналитика статей писателя"""
+
+    DEMOGRAPHIC_FIELDS = ('user_age', 'user_gender', 'user_city', 'device_type')
+
+    @staticmethod
+    def get_article_stats(author):
+        """
+        Статистика по опубликованным статьям автора одним GROUP BY:
+        число читателей, средний прогресс и среднее время чтения.
+        """
+        articles = BlogPost.objects.filter(author=author, status='published').annotate(
+            readers_count=Count('analytics'),
+            avg_progress=Avg('analytics__read_progress'),
+            avg_duration=Avg('analytics__view_duration'),
+        )
+        return [
+            {
+                'article': article,
+                'views': article.views_count,
+                'read_time': article.read_time,
+                'readers_count': article.readers_count,
+                'avg_progress': article.avg_progress or 0,
+                'avg_duration': article.avg_duration or 0,
+            }
+            for article in articles
+        ]
+
+    @classmethod
+    def get_demographics(cls, author, top_cities=10):
+        """
+        Разбивка читателей по возрасту, полу, городу и устройству.
+
+        Все четыре разбивки собираются из одного запроса, сгруппированного
+        по комбинации демографических полей.
+        """
+        rows = BlogAnalytics.objects.filter(blog_post__author=author).values(
+            *cls.DEMOGRAPHIC_FIELDS
+        ).annotate(count=Count('id')).order_by()
+
+        totals = {field: defaultdict(int) for field in cls.DEMOGRAPHIC_FIELDS}
+        for row in rows:
+            for field in cls.DEMOGRAPHIC_FIELDS:
+                totals[field][row[field]] += row['count']
+
+        def breakdown(field):
+            return [{field: value, 'count': count} for value, count in totals[field].items()]
+
+        age_stats = sorted(breakdown('user_age'), key=lambda stat: (stat['user_age'] is None, stat['user_age'] or 0))
+        city_stats = sorted(breakdown('user_city'), key=lambda stat: -stat['count'])[:top_cities]
+
+        return {
+            'age_stats': age_stats,
+            'gender_stats': breakdown('user_gender'),
+            'city_stats': city_stats,
+            'device_stats': breakdown('device_type'),
+        }
+
+
+class WriterStatisticsService:
+    """
+    Инкрементальная статистика писателя (accounts.WriterProfile).
+
+    Счетчики меняются атомарными UPDATE с F() по событиям статей, лайков и
+    сброса буфера просмотров, поэтому дашборд только читает готовые числа.
+    """
+
+    # Максимум, который помещается в WriterProfile.average_rating (3 знака, 2 после запятой)
+    MAX_RATING = Decimal('9.99')
+
+    @classmethod
+    def rating(cls, likes, articles):
+        """Средний рейтинг: лайки на статью"""
+        if not articles:
+            return Decimal('0')
+        value = Decimal(likes) / Decimal(articles)
+        return min(value.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP), cls.MAX_RATING)
+
+    @classmethod
+    def apply(cls, author_id, articles=0, views=0, read_time=0, likes=0):
+        """Применяет приращения к статистике автора (без профиля писателя - no-op)"""
+        from accounts.models import WriterProfile
+
+        deltas = {
+            'articles_count': articles,
+            'total_views': views,
+            'total_read_time': read_time,
+            'total_likes': likes,
+        }
+        deltas = {field: _add(field, delta) for field, delta in deltas.items() if delta}
+        if not author_id or not deltas:
+            return
+
+        writers = WriterProfile.objects.filter(user_id=author_id)
+        with transaction.atomic():
+            writers.update(**deltas)
+            if articles or likes:
+                # Отдельный UPDATE: в MySQL присваивания в SET видят уже
+                # обновленные значения, в остальных базах - старые
+                writers.update(average_rating=Case(
+                    When(articles_count=0, then=Value(0.0)),
+                    default=Least(
+                        Cast(F('total_likes'), FloatField()) / F('articles_count'),
+                        Value(float(cls.MAX_RATING)),
+                    ),
+                    output_field=FloatField(),
+                ))
+
+
+class BlogViewBuffer:
+    """
+    Буфер просмотров статей в кеше.
+
+    Каждый просмотр - только cache.incr; в базу (BlogPost.views/views_count и
+    статистику автора) просмотры пишутся пачкой при достижении порога
+    BLOG_VIEWS_FLUSH_THRESHOLD или командой flush_blog_views.
+    """
+
+    CACHE_PREFIX = 'blog_post_views:'
+
+    @classmethod
+    def _key(cls, post_id):
+        return f'{cls.CACHE_PREFIX}{post_id}'
+
+    @classmethod
+    def record(cls, post):
+        """Учитывает просмотр и возвращает число еще не записанных в базу просмотров"""
+        key = cls._key(post.pk)
+        cache.add(key, 0, timeout=None)
+        try:
+            pending = cache.incr(key)
+        except ValueError:
+            # Ключ вытеснили между add и incr - пишем просмотр сразу
+            cls._write(post.pk, post.author_id, 1)
+            return 0
+
+        if pending >= getattr(settings, 'BLOG_VIEWS_FLUSH_THRESHOLD', 20):
+            cls.flush(post.pk, post.author_id, pending)
+            return 0
+        return pending
+
+    @classmethod
+    def flush(cls, post_id, author_id, pending=None):
+        """Переносит накопленные просмотры статьи в базу"""
+        key = cls._key(post_id)
+        if pending is None:
+            pending = cache.get(key) or 0
+        if pending <= 0:
+            return 0
+        try:
+            # decr, а не delete: просмотры, пришедшие после чтения, остаются в буфере
+            cache.decr(key, pending)
+        except ValueError:
+            return 0
+        cls._write(post_id, author_id, pending)
+        return pending
+
+    @classmethod
+    def flush_all(cls, batch_size=500):
+        """Сбрасывает буфер всех статей, возвращает число записанных просмотров"""
+        flushed = 0
+        posts = BlogPost.objects.order_by('pk').values_list('pk', 'author_id')
+        last_pk = 0
+        while True:
+            batch = list(posts.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                return flushed
+            last_pk = batch[-1][0]
+            pending = cache.get_many([cls._key(post_id) for post_id, author_id in batch])
+            for post_id, author_id in batch:
+                if pending.get(cls._key(post_id)):
+                    flushed += cls.flush(post_id, author_id, pending[cls._key(post_id)])
+
+    @staticmethod
+    def _write(post_id, author_id, views):
+        with transaction.atomic():
+            BlogPost.objects.filter(pk=post_id).update(
+                views=F('views') + views,
+                views_count=F('views_count') + views,
+            )
+            WriterStatisticsService.apply(author_id, views=views)
+
+
+class ReadProgressBuffer:
+    """
+    Буфер событий чтения статей (beacon) для BlogAnalytics.
+
+    События складываются в память процесса и сразу сворачиваются по ключу
+    (статья, читатель): прогресс - максимум, время просмотра - сумма.
+    Фоновый поток раз в BLOG_ANALYTICS_FLUSH_INTERVAL секунд (или при
+    накоплении BLOG_ANALYTICS_FLUSH_SIZE читателей) записывает буфер пачкой:
+    вставка новых строк и UPDATE с F(). Под нагрузкой новые читатели принимаются с вероятностью
+    BLOG_ANALYTICS_SAMPLE_RATE, а сверх BLOG_ANALYTICS_MAX_PENDING -
+    отбрасываются; события уже известных читателей принимаются всегда.
+
+    При аварийной остановке процесса несброшенные события теряются - для
+    аналитики это допустимо.
+    """
+
+    MAX_DURATION_PER_EVENT = 3600
+    DEVICE_TYPES = ('desktop', 'mobile', 'tablet')
+
+    _lock = threading.Lock()
+    _flush_lock = threading.Lock()
+    _wakeup = threading.Event()
+    _pending = {}
+    _worker = None
+
+    @staticmethod
+    def _setting(name, default):
+        return getattr(settings, f'BLOG_ANALYTICS_{name}', default)
+
+    @staticmethod
+    def reader_key(user=None, anonymous_id=None):
+        """Ключ читателя: пользователь или анонимный идентификатор из cookie"""
+        if user is not None and user.is_authenticated:
+            return f'u:{user.pk}'
+        if anonymous_id:
+            return f's:{anonymous_id}'
+        return None
+
+    @classmethod
+    def record(cls, post_id, reader_key, user_id=None, progress=0, duration=0, device_type='desktop'):
+        """Добавляет событие в буфер; возвращает False, если оно отброшено"""
+        progress = max(0, min(int(progress), 100))
+        duration = max(0, min(int(duration), cls.MAX_DURATION_PER_EVENT))
+        if device_type not in cls.DEVICE_TYPES:
+            device_type = 'desktop'
+
+        key = (post_id, reader_key)
+        with cls._lock:
+            event = cls._pending.get(key)
+            if event is None:
+                pending = len(cls._pending)
+                if pending >= cls._setting('MAX_PENDING', 10000):
+                    return False
+                if (pending >= cls._setting('SAMPLE_THRESHOLD', 2000)
+                        and random.random() >= cls._setting('SAMPLE_RATE', 0.1)):
+                    return False
+                cls._pending[key] = {
+                    'user_id': user_id,
+                    'read_progress': progress,
+                    'view_duration': duration,
+                    'device_type': device_type,
+                }
+                pending += 1
+            else:
+                event['read_progress'] = max(event['read_progress'], progress)
+                event['view_duration'] += duration
+                event['device_type'] = device_type
+                pending = len(cls._pending)
+
+        cls._ensure_worker()
+        if pending >= cls._setting('FLUSH_SIZE', 500):
+            cls._wakeup.set()
+        return True
+
+    @classmethod
+    def pending_count(cls):
+        with cls._lock:
+            return len(cls._pending)
+
+    @classmethod
+    def flush(cls):
+        """Записывает накопленные события в базу, возвращает число читателей"""
+        with cls._flush_lock:
+            with cls._lock:
+                events, cls._pending = cls._pending, {}
+            if not events:
+                return 0
+            try:
+                cls._upsert(events)
+            except Exception:
+                logger.exception('Не удалось записать аналитику чтения (%s читателей)', len(events))
+                return 0
+            return len(events)
+
+    @classmethod
+    def _upsert(cls, events):
+        """
+        Новые строки вставляются с ignore_conflicts, затем каждая строка
+        меняется UPDATE с F(): буферы разных воркеров gunicorn пишут одного
+        и того же читателя, и сумма в Python затерла бы время соседа.
+        """
+        from accounts.models import ParentProfile
+
+        post_ids = {post_id for post_id, reader_key in events}
+        post_ids = set(BlogPost.objects.filter(pk__in=post_ids).values_list('pk', flat=True))
+        events = {key: event for key, event in events.items() if key[0] in post_ids}
+        if not events:
+            return
+
+        existing = set(BlogAnalytics.objects.filter(
+            blog_post_id__in=post_ids,
+            reader_key__in={reader_key for post_id, reader_key in events},
+        ).values_list('blog_post_id', 'reader_key'))
+
+        # Демография новых зарегистрированных читателей из профиля родителя
+        new_user_ids = {
+            event['user_id'] for key, event in events.items() if event['user_id'] and key not in existing
+        }
+        profiles = {
+            profile.user_id: profile
+            for profile in ParentProfile.objects.filter(user_id__in=new_user_ids).only(
+                'user_id', 'role', 'birth_date', 'city'
+            )
+        } if new_user_ids else {}
+
+        rows = []
+        for (post_id, reader_key), event in events.items():
+            if (post_id, reader_key) in existing:
+                continue
+            # Нулевые прогресс и время: значения события добавит общий UPDATE ниже
+            row = BlogAnalytics(blog_post_id=post_id, reader_key=reader_key, user_id=event['user_id'])
+            cls._fill_demographics(row, profiles.get(event['user_id']))
+            rows.append(row)
+
+        with transaction.atomic():
+            # Строку мог вставить другой воркер между чтением и вставкой - ее обновит UPDATE
+            BlogAnalytics.objects.bulk_create(rows, batch_size=500, ignore_conflicts=True)
+            for (post_id, reader_key), event in events.items():
+                BlogAnalytics.objects.filter(blog_post_id=post_id, reader_key=reader_key).update(
+                    read_progress=Greatest(F('read_progress'), Value(event['read_progress'])),
+                    view_duration=F('view_duration') + event['view_duration'],
+                    device_type=event['device_type'],
+                )
+
+    @staticmethod
+    def _fill_demographics(row, profile):
+        if profile is None:
+            return
+        if profile.birth_date:
+            today = date.today()
+            birth_date = profile.birth_date
+            row.user_age = today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
+        row.user_city = profile.city or ''
+        row.user_gender = {'mom': 'female', 'dad': 'male'}.get(profile.role, '')
+
+    @classmethod
+    def _ensure_worker(cls):
+        if cls._worker is not None and cls._worker.is_alive():
+            return
+        with cls._lock:
+            if cls._worker is not None and cls._worker.is_alive():
+                return
+            cls._worker = threading.Thread(target=cls._run, name='blog-analytics-compactor', daemon=True)
+            cls._worker.start()
+
+    @classmethod
+    def _run(cls):
+        from django.db import close_old_connections
+
+        while True:
+            cls._wakeup.wait(cls._setting('FLUSH_INTERVAL', 10))
+            cls._wakeup.clear()
+            cls.flush()
+            close_old_connections()
+
+
+atexit.register(ReadProgressBuffer.flush)
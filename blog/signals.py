@@ -0,0 +1,62 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import BlogPost, BlogLike
+from .services import WriterStatisticsService
+
+
+@receiver(post_save, sender=BlogPost)
+def update_writer_statistics_on_post_save(sender, instance, created, **kwargs):
+    state = getattr(instance, '_statistics_state', None)
+    if created:
+        WriterStatisticsService.apply(
+            instance.author_id, articles=1, views=instance.views_count, read_time=instance.read_time
+        )
+    elif state is not None:
+        old_author_id = state.get('author_id', instance.author_id)
+        old_read_time = state.get('read_time', instance.read_time)
+        old_views = state.get('views_count', instance.views_count)
+        if old_author_id != instance.author_id:
+            # Статья перешла к другому автору вместе с лайками
+            likes = instance.likes.count()
+            WriterStatisticsService.apply(
+                old_author_id, articles=-1, views=-old_views, read_time=-old_read_time, likes=-likes
+            )
+            WriterStatisticsService.apply(
+                instance.author_id, articles=1, views=instance.views_count,
+                read_time=instance.read_time, likes=likes
+            )
+        else:
+            WriterStatisticsService.apply(
+                instance.author_id,
+                views=instance.views_count - old_views,
+                read_time=instance.read_time - old_read_time,
+            )
+    # Без исходного состояния (объект создан вручную с pk) дельту не посчитать
+
+    instance._statistics_state = {field: getattr(instance, field) for field in BlogPost.STATISTICS_FIELDS}
+
+
+@receiver(post_delete, sender=BlogPost)
+def update_writer_statistics_on_post_delete(sender, instance, **kwargs):
+    # Лайки статьи удаляются каскадом и учитываются своим обработчиком
+    WriterStatisticsService.apply(
+        instance.author_id, articles=-1, views=-instance.views_count, read_time=-instance.read_time
+    )
+
+
+def _like_author_id(like):
+    if BlogLike.post.is_cached(like):
+        return like.post.author_id
+    return BlogPost.objects.filter(pk=like.post_id).values_list('author_id', flat=True).first()
+
+
+@receiver(post_save, sender=BlogLike)
+def update_writer_statistics_on_like(sender, instance, created, **kwargs):
+    if created:
+        WriterStatisticsService.apply(_like_author_id(instance), likes=1)
+
+
+@receiver(post_delete, sender=BlogLike)
+def update_writer_statistics_on_unlike(sender, instance, **kwargs):
+    WriterStatisticsService.apply(_like_author_id(instance), likes=-1)
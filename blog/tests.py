@@ -1,3 +1,254 @@
-from django.test import TestCase
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.signed_cookies import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.http import HttpResponse
+from django.template import engines
+from django.template.response import TemplateResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.views import View
+
+from baybyway.db import routing
+from baybyway.db.routing import (
+    REPLICA_ALIAS, STICKY_SESSION_KEY, ReplicaReadsMixin, ReplicaRouter, ReplicaStickinessMiddleware, read_replica,
+)
+
+from accounts.models import WriterProfile
+
+from .models import BlogAnalytics, BlogLike, BlogPost
+from .services import BlogViewBuffer, ReadProgressBuffer
+
+
+@override_settings(DB_REPLICA_STICKY_SECONDS=10, DB_REPLICA_RETRY_SECONDS=30)
+class ReplicaRoutingTest(SimpleTestCase):
+    """Маршрутизация чтений на реплику (сама реплика подменяется)"""
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+        routing._replica_down_until = 0.0
+        self.addCleanup(setattr, routing, '_replica_down_until', 0.0)
+        self.enterContext(mock.patch.object(routing, 'replica_configured', return_value=True))
+        self.replica = mock.Mock()
+        self.enterContext(mock.patch.object(routing, 'connections', {REPLICA_ALIAS: self.replica}))
+
+    def request(self, method='get', session=None):
+        request = getattr(self.factory, method)('/')
+        request.session = session if session is not None else {}
+        return request
+
+    def test_reads_use_primary_outside_replica_block(self):
+        self.assertEqual(self.router.db_for_read(BlogPost), 'default')
+
+    def test_reads_inside_block_use_replica_and_writes_primary(self):
+        with read_replica() as enabled:
+            self.assertTrue(enabled)
+            self.assertEqual(self.router.db_for_read(BlogPost), REPLICA_ALIAS)
+            self.assertEqual(self.router.db_for_read(User), REPLICA_ALIAS)
+            self.assertEqual(self.router.db_for_read(Session), 'default')
+            self.assertEqual(self.router.db_for_write(BlogPost), 'default')
+        self.assertEqual(self.router.db_for_read(BlogPost), 'default')
+
+    def test_replica_is_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate(REPLICA_ALIAS, 'blog'))
+        self.assertTrue(self.router.allow_migrate('default', 'blog'))
+
+    def test_unsafe_methods_and_sticky_sessions_read_primary(self):
+        with read_replica(self.request('post')) as enabled:
+            self.assertFalse(enabled)
+        sticky = {STICKY_SESSION_KEY: time.time() + 5}
+        with read_replica(self.request(session=sticky)) as enabled:
+            self.assertFalse(enabled)
+        expired = {STICKY_SESSION_KEY: time.time() - 1}
+        with read_replica(self.request(session=expired)) as enabled:
+            self.assertTrue(enabled)
+
+    def test_unavailable_replica_is_skipped_for_retry_window(self):
+        self.replica.ensure_connection.side_effect = DatabaseError
+        with self.assertLogs('baybyway.db.routing', 'WARNING'), read_replica() as enabled:
+            self.assertFalse(enabled)
+        self.replica.ensure_connection.side_effect = None
+        with read_replica() as enabled:
+            self.assertFalse(enabled)
+        self.assertEqual(self.replica.ensure_connection.call_count, 1)
+
+        routing._replica_down_until = 0.0
+        with read_replica() as enabled:
+            self.assertTrue(enabled)
+
+    def test_template_response_is_rendered_inside_replica_block(self):
+        # Ленивые QuerySet шаблона вычисляются при рендере, после выхода из dispatch
+        class ProbeView(ReplicaReadsMixin, View):
+            def get(self, request):
+                template = engines['django'].from_string('{{ probe }}')
+                return TemplateResponse(request, template, {'probe': lambda: routing._use_replica.get()})
+
+        response = ProbeView.as_view()(self.request())
+        self.assertEqual(response.content, b'True')
+
+    def session(self):
+        # Сессия из cookie: сохранение не обращается к базе
+        session = SessionStore()
+        session.save()
+        return session
+
+    def test_middleware_pins_session_after_write(self):
+        middleware = ReplicaStickinessMiddleware(lambda request: HttpResponse())
+        session = self.session()
+        middleware(self.request('post', session))
+        self.assertGreater(session[STICKY_SESSION_KEY], time.time())
+
+        session = self.session()
+        middleware(self.request('get', session))
+        self.assertNotIn(STICKY_SESSION_KEY, session)
+
+        failing = ReplicaStickinessMiddleware(lambda request: HttpResponse(status=500))
+        session = self.session()
+        failing(self.request('post', session))
+        self.assertNotIn(STICKY_SESSION_KEY, session)
+
+    def test_middleware_skips_beacons_and_missing_sessions(self):
+        from .views import read_beacon
+
+        middleware = ReplicaStickinessMiddleware(lambda request: HttpResponse(status=204))
+        session = self.session()
+        request = self.request('post', session)
+        middleware.process_view(request, read_beacon, (), {'pk': 1})
+        middleware(request)
+        self.assertNotIn(STICKY_SESSION_KEY, session)
+
+        session = SessionStore()
+        request = self.request('post', session)
+        middleware(request)
+        self.assertFalse(session.modified)
+
+
+class ReadProgressBufferTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author', password='x')
+        cls.post = BlogPost.objects.create(author=cls.author, title='Сон', content='-', category='general', language='ru')
+
+    def setUp(self):
+        # Фоновый поток писал бы в базу из другого соединения
+        self.enterContext(mock.patch.object(ReadProgressBuffer, '_ensure_worker'))
+        ReadProgressBuffer._pending = {}
+        self.addCleanup(setattr, ReadProgressBuffer, '_pending', {})
+
+    def row(self, reader_key='s:' + 'a' * 32):
+        return BlogAnalytics.objects.values('read_progress', 'view_duration', 'device_type').get(
+            blog_post=self.post, reader_key=reader_key,
+        )
+
+    def test_events_are_coalesced_per_reader(self):
+        reader_key = 's:' + 'a' * 32
+        ReadProgressBuffer.record(self.post.pk, reader_key, progress=40, duration=15)
+        ReadProgressBuffer.record(self.post.pk, reader_key, progress=30, duration=15, device_type='mobile')
+        ReadProgressBuffer.record(self.post.pk, 's:' + 'b' * 32, progress=10, duration=5, device_type='tv')
+        self.assertEqual(ReadProgressBuffer.pending_count(), 2)
+
+        self.assertEqual(ReadProgressBuffer.flush(), 2)
+        self.assertEqual(self.row(), {'read_progress': 40, 'view_duration': 30, 'device_type': 'mobile'})
+        self.assertEqual(self.row('s:' + 'b' * 32)['device_type'], 'desktop')
+        self.assertEqual(ReadProgressBuffer.pending_count(), 0)
+
+    def test_flushes_for_same_reader_add_up(self):
+        # Как если бы одного читателя сбросили два воркера
+        reader_key = 's:' + 'a' * 32
+        ReadProgressBuffer.record(self.post.pk, reader_key, progress=70, duration=15)
+        ReadProgressBuffer.flush()
+        ReadProgressBuffer.record(self.post.pk, reader_key, progress=50, duration=15)
+        ReadProgressBuffer.flush()
+        self.assertEqual(self.row(), {'read_progress': 70, 'view_duration': 30, 'device_type': 'desktop'})
+
+    def test_row_inserted_by_other_worker_is_updated(self):
+        reader_key = 's:' + 'a' * 32
+        ReadProgressBuffer.record(self.post.pk, reader_key, progress=20, duration=15)
+        bulk_create = BlogAnalytics.objects.bulk_create
+
+        def other_worker_first(rows, **kwargs):
+            # Другой воркер вставил строку между чтением существующих и вставкой
+            BlogAnalytics.objects.create(blog_post=self.post, reader_key=reader_key, view_duration=45)
+            return bulk_create(rows, **kwargs)
+
+        with mock.patch.object(BlogAnalytics.objects, 'bulk_create', side_effect=other_worker_first):
+            ReadProgressBuffer.flush()
+        self.assertEqual(self.row(), {'read_progress': 20, 'view_duration': 60, 'device_type': 'desktop'})
+
+    def test_events_for_missing_post_are_dropped(self):
+        ReadProgressBuffer.record(self.post.pk + 1000, 's:' + 'a' * 32, progress=10, duration=5)
+        ReadProgressBuffer.record(self.post.pk, 's:' + 'a' * 32, progress=10, duration=5)
+        self.assertEqual(ReadProgressBuffer.flush(), 2)
+        self.assertEqual(BlogAnalytics.objects.count(), 1)
+
+    @override_settings(BLOG_ANALYTICS_MAX_PENDING=1)
+    def test_new_readers_are_dropped_when_full(self):
+        self.assertTrue(ReadProgressBuffer.record(self.post.pk, 's:' + 'a' * 32, duration=5))
+        self.assertFalse(ReadProgressBuffer.record(self.post.pk, 's:' + 'b' * 32, duration=5))
+        self.assertTrue(ReadProgressBuffer.record(self.post.pk, 's:' + 'a' * 32, duration=5))
+
+    def test_beacon_only_buffers_event(self):
+        reader = User.objects.create_user('reader', password='x')
+        self.client.force_login(reader)
+        with self.assertNumQueries(2):
+            # Сессия и пользователь; аналитика пишется позже
+            response = self.client.post(reverse('blog:read_beacon', args=[self.post.pk]), {
+                'progress': 55, 'duration': 15,
+            })
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(BlogAnalytics.objects.exists())
+        ReadProgressBuffer.flush()
+        self.assertEqual(self.row(f'u:{reader.pk}')['read_progress'], 55)
+
+
+class WriterStatisticsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author', password='x')
+        cls.writer = WriterProfile.objects.create(
+            user=cls.author, first_name='Айгуль', last_name='Асанова', email='a@example.com',
+            specialization='Педиатрия', languages='ru',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def stats(self):
+        return WriterProfile.objects.values('articles_count', 'total_views', 'total_likes').get(pk=self.writer.pk)
+
+    def test_deletes_do_not_go_below_zero(self):
+        post = BlogPost.objects.create(author=self.author, title='Сон', content='-', category='general', language='ru')
+        BlogLike.objects.create(post=post, user=self.author)
+        # Статистика разошлась с данными, например после ручной правки
+        WriterProfile.objects.filter(pk=self.writer.pk).update(articles_count=0, total_likes=0)
+        post.delete()
+        self.assertEqual(self.stats(), {'articles_count': 0, 'total_views': 0, 'total_likes': 0})
+
+    @override_settings(BLOG_VIEWS_FLUSH_THRESHOLD=3)
+    def test_views_are_written_at_threshold(self):
+        post = BlogPost.objects.create(author=self.author, title='Сон', content='-', category='general', language='ru')
+        self.assertEqual([BlogViewBuffer.record(post) for _ in range(4)], [1, 2, 0, 1])
+        post.refresh_from_db()
+        self.assertEqual((post.views, post.views_count), (3, 3))
+        self.assertEqual(self.stats()['total_views'], 3)
+
+    def test_flush_command_writes_remaining_views(self):
+        posts = [
+            BlogPost.objects.create(author=self.author, title=title, content='-', category='general', language='ru')
+            for title in ('Сон', 'Прикорм')
+        ]
+        BlogViewBuffer.record(posts[0])
+        BlogViewBuffer.record(posts[0])
+        BlogViewBuffer.record(posts[1])
+
+        call_command('flush_blog_views', stdout=mock.Mock())
+        self.assertEqual(list(BlogPost.objects.order_by('pk').values_list('views_count', flat=True)), [2, 1])
+        self.assertEqual(self.stats()['total_views'], 3)
+        self.assertEqual(BlogViewBuffer.flush_all(), 0)
@@ -8,5 +8,6 @@ urlpatterns = [
     path('<int:pk>/', views.BlogDetailView.as_view(), name='post_detail'),
     path('<int:pk>/like/', views.like_post, name='like_post'),
     path('<int:pk>/dislike/', views.dislike_post, name='dislike_post'),
+    path('<int:pk>/beacon/', views.read_beacon, name='read_beacon'),
     path('comments/<int:pk>/delete/', views.delete_comment, name='delete_comment'),
 ]
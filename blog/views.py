@@ -1,15 +1,28 @@
+import re
+import uuid
+
 from django.shortcuts import render, get_object_or_404, redirect
 from django.views.generic import ListView, DetailView
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from django.utils.translation import gettext_lazy as _
 from django.db.models import Count
+from baybyway.db.routing import ReplicaReadsMixin, replica_neutral
 from .models import BlogPost, BlogComment, BlogLike, BlogDislike
 from .forms import BlogCommentForm
+from .services import BlogViewBuffer, ReadProgressBuffer
+
+
+# Cookie анонимного читателя для аналитики чтения
+READER_COOKIE = 'blog_reader'
+READER_COOKIE_MAX_AGE = 365 * 24 * 60 * 60
+READER_ID_RE = re.compile(r'^[0-9a-f]{32}$')
 
 
-class BlogListView(ListView):
+class BlogListView(ReplicaReadsMixin, ListView):
     model = BlogPost
     template_name = 'blog/blog_list.html'
     context_object_name = 'posts'
@@ -39,7 +52,7 @@ class BlogListView(ListView):
         return context
 
 
-class BlogDetailView(DetailView):
+class BlogDetailView(ReplicaReadsMixin, DetailView):
     model = BlogPost
     template_name = 'blog/blog_detail.html'
     context_object_name = 'post'
@@ -47,13 +60,20 @@ class BlogDetailView(DetailView):
     def get_queryset(self):
         return BlogPost.objects.filter(is_published=True)
     
+    def get(self, request, *args, **kwargs):
+        response = super().get(request, *args, **kwargs)
+        if not request.user.is_authenticated and READER_COOKIE not in request.COOKIES:
+            response.set_cookie(
+                READER_COOKIE, uuid.uuid4().hex, max_age=READER_COOKIE_MAX_AGE, httponly=True, samesite='Lax'
+            )
+        return response
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         post = self.get_object()
         
-        # Увеличиваем счетчик просмотров
-        post.views += 1
-        post.save(update_fields=['views'])
+        # Учитываем просмотр в буфере; в базу он попадет пачкой
+        post.views += BlogViewBuffer.record(post)
         
         # Получаем комментарии
         context['comments'] = post.comments.filter(is_approved=True).order_by('-created_at')
@@ -160,3 +180,46 @@ def delete_comment(request, pk):
     
     comment.delete()
     return JsonResponse({'success': True})
+
+
+def _device_type(request):
+    user_agent = request.META.get('HTTP_USER_AGENT', '')
+    if 'iPad' in user_agent or 'Tablet' in user_agent:
+        return 'tablet'
+    if 'Mobi' in user_agent or 'Android' in user_agent:
+        return 'mobile'
+    return 'desktop'
+
+
+@csrf_exempt
+@replica_neutral
+@require_POST
+def read_beacon(request, pk):
+    """
+    Прием событий чтения статьи (совместим с navigator.sendBeacon).
+
+    Событие только добавляется в буфер ReadProgressBuffer, в базу оно
+    попадает пачкой фоновым потоком.
+    """
+    anonymous_id = request.COOKIES.get(READER_COOKIE, '')
+    reader_key = ReadProgressBuffer.reader_key(
+        request.user, anonymous_id if READER_ID_RE.match(anonymous_id) else None
+    )
+    if reader_key is None:
+        return HttpResponse(status=204)
+    
+    try:
+        progress = int(request.POST.get('progress', 0))
+        duration = int(request.POST.get('duration', 0))
+    except ValueError:
+        return HttpResponse(status=400)
+    
+    ReadProgressBuffer.record(
+        pk,
+        reader_key,
+        user_id=request.user.pk if request.user.is_authenticated else None,
+        progress=progress,
+        duration=duration,
+        device_type=_device_type(request),
+    )
+    return HttpResponse(status=204)
@@ -1,4 +1,5 @@
 from django.db import models
+from django.urls import reverse
 from django.contrib.auth.models import User
 from django.utils.translation import gettext_lazy as _
 from accounts.models import Family
@@ -106,6 +107,10 @@ class Consultation(models.Model):
     
     def __str__(self):
         return f"Консультация: {self.title} - {self.parent.username}"
+    
+    def get_attachment_url(self):
+        """Ссылка на документы консультации через проверку прав"""
+        return reverse('consultant:consultation_attachment', args=[self.pk])
 
 
 class ConsultationMessage(models.Model):
@@ -141,6 +146,10 @@ class ConsultationMessage(models.Model):
     
     def __str__(self):
         return f"Сообщение от {self.sender.username} в консультации {self.consultation.id}"
+    
+    def get_attachment_url(self):
+        """Ссылка на вложение через проверку прав"""
+        return reverse('consultant:message_attachment', args=[self.pk])
 
 
 class ConsultationReview(models.Model):
@@ -0,0 +1,100 @@
+"""
+Доставка событий чата консультаций в реальном времени.
+
+Синхронный код публикует события (новое сообщение, набор текста, прочтение)
+в канал консультации, а SSE-поток каждого подписчика читает их из своей
+asyncio-очереди. Реализация брокера задается настройкой
+CONSULTATION_CHAT_BACKEND: InProcessBroker доставляет события только внутри
+одного процесса, для нескольких воркеров нужен брокер поверх общей шины
+с тем же интерфейсом (publish/subscribe/unsubscribe).
+
+SSE-поток включается настройкой CONSULTATION_CHAT_SSE (по умолчанию
+выключен): при WSGI-деплое страница опрашивает новые сообщения.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class Subscription:
+    """Подписка одного SSE-потока на канал"""
+
+    def __init__(self, broker, channel, loop, maxsize):
+        self.broker = broker
+        self.channel = channel
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize)
+        # Очередь переполнена - часть событий потеряна, поток нужно переоткрыть
+        self.overflowed = False
+
+    def push(self, event):
+        # publish вызывается из потоков синхронных представлений
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # Цикл событий уже закрыт
+            self.broker.unsubscribe(self)
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout):
+        """Следующее событие или None, если за timeout секунд ничего не пришло"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class InProcessBroker:
+    """Брокер событий в памяти процесса"""
+
+    def __init__(self, queue_size=None):
+        self.queue_size = queue_size or settings.CONSULTATION_CHAT_QUEUE_SIZE
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def publish(self, channel, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.push(event)
+
+    def subscribe(self, channel):
+        """Вызывается из цикла событий, в котором будет читаться подписка"""
+        subscription = Subscription(self, channel, asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.channel)
+            if subscriptions is None:
+                return
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.channel]
+
+    def subscription_count(self):
+        with self._lock:
+            return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    """Брокер, заданный в CONSULTATION_CHAT_BACKEND (один на процесс)"""
+    return import_string(settings.CONSULTATION_CHAT_BACKEND)()
+
+
+def subscription_count():
+    """Число открытых SSE-подписок процесса (0, если брокер их не считает)"""
+    broker = get_broker()
+    return broker.subscription_count() if hasattr(broker, 'subscription_count') else 0
@@ -0,0 +1,83 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Consultation, ConsultationMessage
+from .realtime import get_broker
+
+
+class ConsultationChatService:
+    """Переписка в консультации и события чата в реальном времени"""
+
+    @staticmethod
+    def channel(consultation_id):
+        return f'consultation:{consultation_id}'
+
+    @staticmethod
+    def for_participant(user):
+        """Консультации, в переписке которых участвует пользователь"""
+        return Consultation.objects.filter(
+            Q(parent=user) | Q(consultant__user=user) | Q(doctor__user=user)
+        )
+
+    @staticmethod
+    def serialize(message):
+        sender = message.sender
+        return {
+            'id': message.pk,
+            'sender_id': message.sender_id,
+            'sender_name': sender.get_full_name() or sender.username,
+            'message_type': message.message_type,
+            'content': message.content,
+            'attachment_url': message.get_attachment_url() if message.attachments else None,
+            'attachment_name': message.attachments.name if message.attachments else None,
+            'is_read': message.is_read,
+            'created_at': message.created_at.isoformat(),
+        }
+
+    @staticmethod
+    def get_messages_after(consultation_id, after_id=0, limit=None):
+        """Сообщения с pk больше after_id, по возрастанию"""
+        limit = limit or settings.CONSULTATION_CHAT_BACKLOG_SIZE
+        return ConsultationMessage.objects.filter(
+            consultation_id=consultation_id, pk__gt=after_id
+        ).select_related('sender').order_by('pk')[:limit]
+
+    @classmethod
+    def publish(cls, consultation_id, event_type, data):
+        """Публикует событие после фиксации текущей транзакции"""
+        event = {'type': event_type, 'data': data}
+        transaction.on_commit(lambda: get_broker().publish(cls.channel(consultation_id), event))
+
+    @classmethod
+    def post_message(cls, consultation, sender, message):
+        """Сохраняет сообщение из формы и рассылает его участникам"""
+        message.consultation = consultation
+        message.sender = sender
+        if sender.pk != consultation.parent_id:
+            message.message_type = 'answer'
+
+        with transaction.atomic():
+            message.save()
+            if consultation.status == 'pending':
+                Consultation.objects.filter(pk=consultation.pk, status='pending').update(status='in_progress')
+                consultation.status = 'in_progress'
+            cls.publish(consultation.pk, 'message', cls.serialize(message))
+        return message
+
+    @classmethod
+    def mark_read(cls, consultation_id, reader, up_to_id):
+        """Отмечает прочитанными чужие сообщения до up_to_id одним UPDATE"""
+        updated = ConsultationMessage.objects.filter(
+            consultation_id=consultation_id, pk__lte=up_to_id, is_read=False
+        ).exclude(sender=reader).update(is_read=True)
+        if updated:
+            cls.publish(consultation_id, 'read', {'reader_id': reader.pk, 'up_to': up_to_id})
+        return updated
+
+    @classmethod
+    def typing(cls, consultation_id, user):
+        cls.publish(consultation_id, 'typing', {
+            'user_id': user.pk,
+            'name': user.get_full_name() or user.username,
+        })
@@ -1,3 +1,159 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from baybyway.protected_media import parse_range
+
+from .models import ConsultantProfile, Consultation, ConsultationMessage
+from .realtime import get_broker
+from .services import ConsultationChatService
+
+
+class ConsultationChatTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.parent = User.objects.create_user('parent', password='x')
+        cls.specialist = User.objects.create_user('specialist', password='x')
+        cls.stranger = User.objects.create_user('stranger', password='x')
+        profile = ConsultantProfile.objects.create(user=cls.specialist, specialization='sleep')
+        cls.consultation = Consultation.objects.create(
+            parent=cls.parent, consultant=profile, title='Сон', description='Просыпается ночью',
+        )
+        cls.question = ConsultationMessage.objects.create(
+            consultation=cls.consultation, sender=cls.parent, content='Что делать?',
+        )
+        cls.answer = ConsultationMessage.objects.create(
+            consultation=cls.consultation, sender=cls.specialist, content='Режим', message_type='answer',
+        )
+
+    def url(self, name, **kwargs):
+        return reverse(f'consultant:{name}', kwargs={'consultation_id': self.consultation.pk, **kwargs})
+
+
+class ConsultationChatPollingTest(ConsultationChatTestCase):
+    def test_messages_after_id(self):
+        self.client.login(username='parent', password='x')
+        response = self.client.get(self.url('consultation_messages'), {'after': self.question.pk})
+        self.assertEqual([message['id'] for message in response.json()['messages']], [self.answer.pk])
+
+    def test_non_participant_gets_404(self):
+        self.client.login(username='stranger', password='x')
+        self.assertEqual(self.client.get(self.url('consultation_messages')).status_code, 404)
+
+    def test_stream_is_disabled_by_default(self):
+        # Под WSGI поток занял бы воркер: без CONSULTATION_CHAT_SSE страница опрашивает
+        self.client.login(username='parent', password='x')
+        self.assertEqual(self.client.get(self.url('consultation_stream')).status_code, 404)
+
+        response = self.client.get(reverse('consultant:consultation_detail', args=[self.consultation.pk]))
+        self.assertContains(response, 'const sseEnabled = false;')
+
+    def test_ajax_message_is_published_after_commit(self):
+        self.client.login(username='specialist', password='x')
+        with mock.patch.object(get_broker(), 'publish') as publish, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                self.url('send_message'), {'content': 'Уберите дневной сон'},
+                headers={'x-requested-with': 'XMLHttpRequest'},
+            )
+        message = response.json()['message']
+        self.assertEqual(message['message_type'], 'answer')
+        publish.assert_called_once_with(
+            ConsultationChatService.channel(self.consultation.pk), {'type': 'message', 'data': message}
+        )
+
+    def test_mark_read_skips_own_messages(self):
+        updated = ConsultationChatService.mark_read(self.consultation.pk, self.parent, self.answer.pk)
+        self.assertEqual(updated, 1)
+        self.assertEqual(
+            dict(ConsultationMessage.objects.values_list('pk', 'is_read')),
+            {self.question.pk: False, self.answer.pk: True},
+        )
+
+
+@override_settings(CONSULTATION_CHAT_SSE=True, CONSULTATION_CHAT_KEEPALIVE=1)
+class ConsultationChatStreamTest(ConsultationChatTestCase):
+    async def test_stream_replays_backlog_then_live_events(self):
+        await self.async_client.aforce_login(self.parent)
+        response = await self.async_client.get(
+            self.url('consultation_stream'), headers={'last-event-id': str(self.question.pk)}
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        chunks = aiter(response.streaming_content)
+        self.assertEqual(await anext(chunks), b'retry: 3000\n\n')
+        backlog = (await anext(chunks)).decode()
+        self.assertTrue(backlog.startswith(f'event: message\nid: {self.answer.pk}\n'))
+
+        get_broker().publish(
+            ConsultationChatService.channel(self.consultation.pk),
+            {'type': 'typing', 'data': {'user_id': self.specialist.pk, 'name': 'specialist'}},
+        )
+        self.assertEqual(
+            (await anext(chunks)).decode(),
+            'event: typing\ndata: {"user_id": %d, "name": "specialist"}\n\n' % self.specialist.pk,
+        )
+        self.assertEqual(await anext(chunks), b': keepalive\n\n')
+        await chunks.aclose()
+
+
+@override_settings(PROTECTED_MEDIA_ACCEL_PREFIX='')
+class MessageAttachmentTest(ConsultationChatTestCase):
+    content = bytes(range(256)) * 4
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.answer.attachments.save('scan.pdf', ContentFile(self.content))
+        self.client.login(username='parent', password='x')
+        self.attachment_url = reverse('consultant:message_attachment', args=[self.answer.pk])
+
+    def test_parse_range(self):
+        self.assertEqual(parse_range('bytes=0-99', 1024), (0, 99))
+        self.assertEqual(parse_range('bytes=1000-', 1024), (1000, 1023))
+        self.assertEqual(parse_range('bytes=-24', 1024), (1000, 1023))
+        self.assertEqual(parse_range('bytes=0-5000', 1024), (0, 1023))
+        self.assertIs(parse_range('bytes=2000-', 1024), False)
+        self.assertIsNone(parse_range('bytes=0-1,5-6', 1024))
+        self.assertIsNone(parse_range('bytes=9-1', 1024))
+
+    def test_full_download(self):
+        response = self.client.get(self.attachment_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_range_request(self):
+        response = self.client.get(self.attachment_url, headers={'range': 'bytes=10-19'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.content)}')
+        self.assertEqual(b''.join(response.streaming_content), self.content[10:20])
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.attachment_url, headers={'range': f'bytes={len(self.content)}-'})
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+
+    def test_stale_if_range_returns_whole_file(self):
+        response = self.client.get(self.attachment_url, headers={'range': 'bytes=0-9', 'if-range': '"other"'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_conditional_request(self):
+        etag = self.client.get(self.attachment_url)['ETag']
+        self.assertEqual(self.client.get(self.attachment_url, headers={'if-none-match': etag}).status_code, 304)
+
+    def test_non_participant_gets_404(self):
+        self.client.login(username='stranger', password='x')
+        self.assertEqual(self.client.get(self.attachment_url).status_code, 404)
+
+    @override_settings(PROTECTED_MEDIA_ACCEL_PREFIX='/protected-media/')
+    def test_nginx_serves_bytes(self):
+        response = self.client.get(self.attachment_url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + self.answer.attachments.name)
+        self.assertEqual(response.content, b'')
@@ -15,6 +15,12 @@ urlpatterns = [
     path('consultations/create/', views.ConsultationCreateView.as_view(), name='consultation_create'),
     path('consultations/<int:pk>/', views.ConsultationDetailView.as_view(), name='consultation_detail'),
     path('consultations/<int:consultation_id>/message/', views.send_message, name='send_message'),
+    path('consultations/<int:consultation_id>/stream/', views.consultation_stream, name='consultation_stream'),
+    path('consultations/<int:consultation_id>/messages/', views.consultation_messages, name='consultation_messages'),
+    path('consultations/<int:consultation_id>/typing/', views.consultation_typing, name='consultation_typing'),
+    path('consultations/<int:consultation_id>/read/', views.consultation_read, name='consultation_read'),
+    path('consultations/<int:consultation_id>/attachment/', views.consultation_attachment, name='consultation_attachment'),
+    path('messages/<int:message_id>/attachment/', views.message_attachment, name='message_attachment'),
     path('consultations/<int:consultation_id>/review/', views.add_review, name='add_review'),
     path('consultations/<int:consultation_id>/complete/', views.mark_consultation_completed, name='mark_completed'),
 ]
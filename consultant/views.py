@@ -1,3 +1,7 @@
+import asyncio
+import json
+
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
@@ -7,14 +11,18 @@ from django.db.models import Q, Avg
 from django.views.generic import ListView, DetailView, CreateView, UpdateView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.urls import reverse_lazy
-from django.http import JsonResponse
+from django.http import JsonResponse, Http404, StreamingHttpResponse
+from django.views.decorators.http import require_POST
+from django.utils.formats import date_format
 from .models import ConsultantProfile, Consultation, ConsultationMessage, ConsultationReview
 from .forms import (
     ConsultantProfileForm, ConsultationForm, ConsultationMessageForm, 
     ConsultationReviewForm, ConsultationSearchForm
 )
 from accounts.models import ParentProfile
+from accounts.roles import has_role, ROLE_CONSULTANT
 from healthcare.models import Doctor, HealthcareFacility
+from baybyway.timeseries import TimeSeriesService
 
 
 class ConsultantListView(ListView):
@@ -102,11 +110,10 @@ class ConsultantDetailView(DetailView):
 @login_required
 def consultant_profile_edit(request):
     """Редактирование профиля консультанта"""
-    try:
-        consultant_profile = request.user.consultant_profile
-    except ConsultantProfile.DoesNotExist:
+    if not has_role(request.user, ROLE_CONSULTANT):
         messages.error(request, _('У вас нет профиля консультанта'))
         return redirect('consultant:consultant_list')
+    consultant_profile = request.user.consultant_profile
     
     if request.method == 'POST':
         form = ConsultantProfileForm(request.POST, instance=consultant_profile)
@@ -149,15 +156,23 @@ class ConsultationDetailView(LoginRequiredMixin, DetailView):
         ).select_related('doctor__facility', 'consultant__user')
     
     def get_context_data(self, **kwargs):
+        from .services import ConsultationChatService
+        
         context = super().get_context_data(**kwargs)
-        consultation = self.get_object()
+        consultation = self.object
         
-        # Получаем сообщения консультации
-        messages_list = ConsultationMessage.objects.filter(
+        # Получаем сообщения консультации; дальше клиент догружает только новые
+        messages_list = list(ConsultationMessage.objects.filter(
             consultation=consultation
-        ).select_related('sender').order_by('created_at')
+        ).select_related('sender').order_by('pk'))
+        last_message_id = messages_list[-1].pk if messages_list else 0
+        if last_message_id:
+            ConsultationChatService.mark_read(consultation.pk, self.request.user, last_message_id)
         
         context['messages'] = messages_list
+        context['last_message_id'] = last_message_id
+        context['chat_sse_enabled'] = settings.CONSULTATION_CHAT_SSE
+        context['chat_poll_interval'] = settings.CONSULTATION_CHAT_POLL_INTERVAL
         context['message_form'] = ConsultationMessageForm()
         
         # Проверяем, есть ли уже отзыв
@@ -225,23 +240,24 @@ class ConsultationCreateView(LoginRequiredMixin, CreateView):
 @login_required
 def send_message(request, consultation_id):
     """Отправка сообщения в консультации"""
-    consultation = get_object_or_404(Consultation, id=consultation_id, parent=request.user)
+    from .services import ConsultationChatService
+    
+    consultation = get_object_or_404(ConsultationChatService.for_participant(request.user), id=consultation_id)
+    is_ajax = request.headers.get('x-requested-with') == 'XMLHttpRequest'
     
     if request.method == 'POST':
         form = ConsultationMessageForm(request.POST, request.FILES)
         if form.is_valid():
-            message = form.save(commit=False)
-            message.consultation = consultation
-            message.sender = request.user
-            message.save()
-            
-            # Обновляем статус консультации
-            if consultation.status == 'pending':
-                consultation.status = 'in_progress'
-                consultation.save()
+            message = ConsultationChatService.post_message(
+                consultation, request.user, form.save(commit=False)
+            )
             
+            if is_ajax:
+                return JsonResponse({'message': ConsultationChatService.serialize(message)})
             messages.success(request, _('Сообщение отправлено!'))
             return redirect('consultant:consultation_detail', pk=consultation.id)
+        if is_ajax:
+            return JsonResponse({'errors': form.errors}, status=400)
     else:
         form = ConsultationMessageForm()
     
@@ -311,11 +327,10 @@ def mark_consultation_completed(request, consultation_id):
 @login_required
 def consultant_dashboard(request):
     """Дашборд консультанта"""
-    try:
-        consultant_profile = request.user.consultant_profile
-    except ConsultantProfile.DoesNotExist:
+    if not has_role(request.user, ROLE_CONSULTANT):
         messages.error(request, _('У вас нет профиля консультанта'))
         return redirect('consultant:consultant_list')
+    consultant_profile = request.user.consultant_profile
     
     # Получаем статистику
     consultations = Consultation.objects.filter(consultant=consultant_profile)
@@ -331,10 +346,155 @@ def consultant_dashboard(request):
     # Последние консультации
     recent_consultations = consultations.order_by('-created_at')[:5]
     
+    # Статистика по календарным месяцам, от текущего к прошлым
+    series = TimeSeriesService.get_series(consultations, f'consultant_consultations:{consultant_profile.pk}')
+    monthly_stats = [
+        {'month': date_format(point['period'], 'F'), 'consultations': point['value']}
+        for point in reversed(series)
+    ]
+    
     context = {
         'consultant_profile': consultant_profile,
         'stats': stats,
         'recent_consultations': recent_consultations,
+        'monthly_stats': monthly_stats,
     }
     
-    return render(request, 'consultant/consultant_dashboard.html', context)
\ No newline at end of file
+    return render(request, 'consultant/consultant_dashboard.html', context)
+
+
+def _parse_message_id(value):
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _sse(event_type, data, event_id=None):
+    lines = [f'event: {event_type}']
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append('data: ' + json.dumps(data, ensure_ascii=False))
+    return '\n'.join(lines) + '\n\n'
+
+
+async def _chat_events(consultation_id, after_id):
+    """SSE-события консультации: сначала пропущенные сообщения, затем живой поток"""
+    from .realtime import get_broker
+    from .services import ConsultationChatService
+    
+    broker = get_broker()
+    loop = asyncio.get_running_loop()
+    # Подписка оформляется до выборки пропущенного, поэтому между ними ничего не теряется
+    subscription = broker.subscribe(ConsultationChatService.channel(consultation_id))
+    try:
+        yield 'retry: 3000\n\n'
+        
+        while True:
+            backlog = [
+                message async for message in
+                ConsultationChatService.get_messages_after(consultation_id, after_id)
+            ]
+            for message in backlog:
+                after_id = message.pk
+                yield _sse('message', ConsultationChatService.serialize(message), message.pk)
+            if len(backlog) < settings.CONSULTATION_CHAT_BACKLOG_SIZE:
+                break
+        
+        # Поток периодически закрывается, EventSource переподключится с Last-Event-ID
+        deadline = loop.time() + settings.CONSULTATION_CHAT_STREAM_TIMEOUT
+        while not subscription.overflowed and loop.time() < deadline:
+            event = await subscription.get(settings.CONSULTATION_CHAT_KEEPALIVE)
+            if event is None:
+                yield ': keepalive\n\n'
+            elif event['type'] != 'message':
+                yield _sse(event['type'], event['data'])
+            elif event['data']['id'] > after_id:
+                after_id = event['data']['id']
+                yield _sse('message', event['data'], after_id)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+@login_required
+async def consultation_stream(request, consultation_id):
+    """Поток событий чата консультации (Server-Sent Events, требует ASGI)"""
+    from .services import ConsultationChatService
+    
+    # Под WSGI поток занял бы синхронный воркер целиком (см. CONSULTATION_CHAT_SSE)
+    if not settings.CONSULTATION_CHAT_SSE:
+        raise Http404
+    
+    user = await request.auser()
+    if not await ConsultationChatService.for_participant(user).filter(pk=consultation_id).aexists():
+        raise Http404
+    
+    after_id = _parse_message_id(request.headers.get('Last-Event-ID') or request.GET.get('after'))
+    return StreamingHttpResponse(
+        _chat_events(consultation_id, after_id),
+        content_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+@login_required
+def consultation_messages(request, consultation_id):
+    """Сообщения консультации после ?after=<id> (опрос, когда SSE выключен)"""
+    from .services import ConsultationChatService
+    
+    consultation = get_object_or_404(ConsultationChatService.for_participant(request.user), id=consultation_id)
+    after_id = _parse_message_id(request.GET.get('after'))
+    return JsonResponse({
+        'messages': [
+            ConsultationChatService.serialize(message)
+            for message in ConsultationChatService.get_messages_after(consultation.pk, after_id)
+        ]
+    })
+
+
+@login_required
+@require_POST
+def consultation_typing(request, consultation_id):
+    """Индикатор набора текста"""
+    from .services import ConsultationChatService
+    
+    consultation = get_object_or_404(ConsultationChatService.for_participant(request.user), id=consultation_id)
+    ConsultationChatService.typing(consultation.pk, request.user)
+    return JsonResponse({'status': 'ok'})
+
+
+@login_required
+@require_POST
+def consultation_read(request, consultation_id):
+    """Отметка о прочтении сообщений до up_to включительно"""
+    from .services import ConsultationChatService
+    
+    consultation = get_object_or_404(ConsultationChatService.for_participant(request.user), id=consultation_id)
+    up_to = _parse_message_id(request.POST.get('up_to'))
+    updated = ConsultationChatService.mark_read(consultation.pk, request.user, up_to) if up_to else 0
+    return JsonResponse({'status': 'ok', 'updated': updated})
+
+
+@login_required
+def consultation_attachment(request, consultation_id):
+    """Документы консультации (только для участников)"""
+    from baybyway.protected_media import serve_protected
+    from .services import ConsultationChatService
+    
+    consultation = get_object_or_404(ConsultationChatService.for_participant(request.user), id=consultation_id)
+    return serve_protected(request, consultation.attachments)
+
+
+@login_required
+def message_attachment(request, message_id):
+    """Вложение сообщения консультации (только для участников)"""
+    from baybyway.protected_media import serve_protected
+    from .services import ConsultationChatService
+    
+    message = get_object_or_404(
+        ConsultationMessage.objects.filter(
+            consultation__in=ConsultationChatService.for_participant(request.user)
+        ),
+        pk=message_id
+    )
+    return serve_protected(request, message.attachments)
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import ForumCategory, Topic, Post, TopicLike, PostLike, ForumNotification, TopicSubscription, CategorySubscription
+from .models import ForumCategory, ForumTag, Topic, Post, TopicLike, PostLike, ForumNotification, TopicSubscription, CategorySubscription
 
 
 @admin.register(ForumCategory)
@@ -60,7 +60,7 @@ class TopicAdmin(admin.ModelAdmin):
     
     fieldsets = (
         ('Основная информация', {
-            'fields': ('title', 'content', 'category', 'author', 'family')
+            'fields': ('title', 'content', 'category', 'author', 'family', 'tags')
         }),
         ('Статус и настройки', {
             'fields': ('status', 'is_pinned', 'is_active')
@@ -86,6 +86,14 @@ class TopicAdmin(admin.ModelAdmin):
     get_posts_count.short_description = 'Количество сообщений'
 
 
+@admin.register(ForumTag)
+class ForumTagAdmin(admin.ModelAdmin):
+    list_display = ['name', 'slug', 'topics_count', 'created_at']
+    search_fields = ['name', 'slug']
+    ordering = ['-topics_count', 'name']
+    readonly_fields = ['topics_count', 'created_at']
+
+
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
     list_display = ['content_preview', 'topic', 'author', 'is_solution', 'likes_count', 'created_at']
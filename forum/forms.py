@@ -55,6 +55,10 @@ class TopicForm(forms.ModelForm):
             raise forms.ValidationError(_('Содержание должно содержать минимум 10 символов.'))
         return content.strip()
 
+    def clean_tags(self):
+        from .services import TopicTagService
+        return ', '.join(TopicTagService.normalize(self.cleaned_data.get('tags')).values())
+
 
 class PostForm(forms.ModelForm):
     """Форма создания/редактирования сообщения"""
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from forum.services import ReputationService
+
+
+class Command(BaseCommand):
+    help = 'Учитывает накопленные действия репутации форума и обновляет рейтинги'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Сколько действий учитывать за одну транзакцию')
+        parser.add_argument('--rebuild', action='store_true', help='Пересчитать места в рейтингах полностью')
+
+    def handle(self, *args, **options):
+        applied = 0
+        while True:
+            batch = ReputationService.apply_pending(options['batch_size'])
+            if not batch:
+                break
+            applied += batch
+
+        if options['rebuild']:
+            ReputationService.rebuild_ranks()
+
+        self.stdout.write(self.style.SUCCESS(f'Учтено действий репутации: {applied}'))
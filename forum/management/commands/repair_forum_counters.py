@@ -0,0 +1,70 @@
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from forum.models import ForumCategory, ForumPoll, ForumTag, PollOption, Topic
+from forum.services import PollService, TopicRollupService, TopicTagService
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики тем, категорий, тегов и опросов форума и сообщает о расхождениях'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Сколько тем пересчитывать за один UPDATE')
+        parser.add_argument('--dry-run', action='store_true', help='Только показать расхождения, ничего не менять')
+
+    @staticmethod
+    def _snapshot(queryset, fields):
+        return {row[0]: row[1:] for row in queryset.values_list('pk', *fields)}
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        topic_fields = ('posts_count', 'last_post_id')
+        category_fields = ('topics_count', 'posts_count')
+
+        # Пробный прогон выполняется в одной транзакции и откатывается целиком
+        with transaction.atomic() if dry_run else nullcontext():
+            categories_before = self._snapshot(ForumCategory.objects.all(), category_fields)
+
+            topic_ids = list(Topic.objects.order_by('pk').values_list('pk', flat=True))
+            drifted_topics = 0
+            for start in range(0, len(topic_ids), batch_size):
+                batch = topic_ids[start:start + batch_size]
+                with transaction.atomic():
+                    before = self._snapshot(Topic.objects.filter(pk__in=batch), topic_fields)
+                    TopicRollupService.refresh(batch)
+                    after = self._snapshot(Topic.objects.filter(pk__in=batch), topic_fields)
+                drifted_topics += sum(1 for pk, values in after.items() if before.get(pk) != values)
+
+            # Категории без тем refresh не затрагивает
+            TopicRollupService.refresh_categories(ForumCategory.objects.values('pk'))
+            categories_after = self._snapshot(ForumCategory.objects.all(), category_fields)
+            drifted_categories = sum(
+                1 for pk, values in categories_after.items() if categories_before.get(pk) != values
+            )
+
+            tags_before = self._snapshot(ForumTag.objects.all(), ('topics_count',))
+            TopicTagService.refresh_counts()
+            tags_after = self._snapshot(ForumTag.objects.all(), ('topics_count',))
+            drifted_tags = sum(1 for pk, values in tags_after.items() if tags_before.get(pk) != values)
+
+            polls_before = self._snapshot(ForumPoll.objects.all(), ('voters_count',))
+            options_before = self._snapshot(PollOption.objects.all(), ('poll_id', 'votes_count'))
+            PollService.refresh_tallies()
+            polls_after = self._snapshot(ForumPoll.objects.all(), ('voters_count',))
+            options_after = self._snapshot(PollOption.objects.all(), ('poll_id', 'votes_count'))
+            drifted_polls = len(
+                {pk for pk, values in polls_after.items() if polls_before.get(pk) != values}
+                | {values[0] for pk, values in options_after.items() if options_before.get(pk) != values}
+            )
+
+            if dry_run:
+                transaction.set_rollback(True)
+
+        action = 'Найдено расхождений' if dry_run else 'Исправлено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action}: тем - {drifted_topics}, категорий - {drifted_categories}, тегов - {drifted_tags}, '
+            f'опросов - {drifted_polls}'
+        ))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-19 11:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum', '0005_topic_is_announcement_topic_is_locked_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='is_approved',
+            field=models.BooleanField(default=False, verbose_name='Одобрено модератором'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='is_hidden',
+            field=models.BooleanField(default=False, verbose_name='Скрыто модератором'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['created_at', 'id'], name='forum_post_created_b6789b_idx'),
+        ),
+    ]
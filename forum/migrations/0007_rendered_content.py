@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum', '0006_post_moderation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='content_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='Содержание (HTML)'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='content_html_version',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Версия рендера'),
+        ),
+        migrations.AddField(
+            model_name='topic',
+            name='content_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='Содержание (HTML)'),
+        ),
+        migrations.AddField(
+            model_name='topic',
+            name='content_html_version',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Версия рендера'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+SEGMENT_LENGTH = 10
+MAX_THREAD_DEPTH = 255 // SEGMENT_LENGTH - 1
+
+
+def fill_paths(apps, schema_editor):
+    """Заполняет path и depth существующих сообщений (родитель всегда старше ответа)"""
+    Post = apps.get_model('forum', 'Post')
+    paths = {}
+    batch = []
+    for post in Post.objects.order_by('id').only('id', 'parent_post_id').iterator(chunk_size=2000):
+        prefix, depth = '', 0
+        parent = paths.get(post.parent_post_id)
+        if parent is not None:
+            prefix, depth = parent[0], parent[1] + 1
+            if depth > MAX_THREAD_DEPTH:
+                prefix, depth = parent[0][:-SEGMENT_LENGTH], parent[1]
+        post.path = prefix + str(post.id).zfill(SEGMENT_LENGTH)
+        post.depth = depth
+        paths[post.id] = (post.path, post.depth)
+        batch.append(post)
+        if len(batch) >= 1000:
+            Post.objects.bulk_update(batch, ['path', 'depth'])
+            batch = []
+    if batch:
+        Post.objects.bulk_update(batch, ['path', 'depth'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum', '0007_rendered_content'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Глубина ответа'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='path',
+            field=models.CharField(blank=True, editable=False, max_length=255, verbose_name='Путь в ветке'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['topic', 'path'], name='forum_post_topic_i_578928_idx'),
+        ),
+        migrations.RunPython(fill_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:09
+
+from django.db import migrations, models
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    """Пересчитывает счетчики тем (удаление сообщений их раньше не обновляло) и категорий"""
+    Topic = apps.get_model('forum', 'Topic')
+    Post = apps.get_model('forum', 'Post')
+    ForumCategory = apps.get_model('forum', 'ForumCategory')
+
+    visible_posts = Post.objects.filter(topic=OuterRef('pk'), is_hidden=False)
+    last_visible = visible_posts.order_by('-created_at', '-id')
+    Topic.objects.update(
+        posts_count=Coalesce(
+            Subquery(visible_posts.order_by().values('topic').annotate(total=Count('pk')).values('total')), 0
+        ),
+        last_post=Subquery(last_visible.values('pk')[:1]),
+        last_activity=Coalesce(Subquery(last_visible.values('created_at')[:1]), F('created_at')),
+    )
+
+    active_topics = Topic.objects.filter(category=OuterRef('pk'), is_active=True).order_by().values('category')
+    ForumCategory.objects.update(
+        topics_count=Coalesce(Subquery(active_topics.annotate(total=Count('pk')).values('total')), 0),
+        posts_count=Coalesce(Subquery(active_topics.annotate(total=Sum('posts_count')).values('total')), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum', '0008_post_materialized_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='forumcategory',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Сообщения'),
+        ),
+        migrations.AddField(
+            model_name='forumcategory',
+            name='topics_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Темы'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils.text import slugify
+
+MAX_TAGS = 10
+MAX_TAG_LENGTH = 50
+
+
+def normalize(text):
+    tags = {}
+    for raw in (text or '').split(','):
+        name = ' '.join(raw.split()).lower()[:MAX_TAG_LENGTH]
+        slug = slugify(name, allow_unicode=True)[:60]
+        if slug and slug not in tags:
+            tags[slug] = name
+        if len(tags) >= MAX_TAGS:
+            break
+    return tags
+
+
+def fill_tags(apps, schema_editor):
+    """Переносит строки тегов активных тем в таблицы тегов пачками"""
+    Topic = apps.get_model('forum', 'Topic')
+    ForumTag = apps.get_model('forum', 'ForumTag')
+    TopicTag = apps.get_model('forum', 'TopicTag')
+
+    topic_tags = {}
+    names = {}
+    for topic_id, tags in Topic.objects.filter(is_active=True).exclude(tags='').values_list('id', 'tags').iterator():
+        normalized = normalize(tags)
+        if normalized:
+            topic_tags[topic_id] = list(normalized)
+            for slug, name in normalized.items():
+                names.setdefault(slug, name)
+    if not names:
+        return
+
+    ForumTag.objects.bulk_create(
+        [ForumTag(slug=slug, name=name) for slug, name in names.items()], batch_size=1000, ignore_conflicts=True
+    )
+    tag_ids = dict(ForumTag.objects.values_list('slug', 'id'))
+    TopicTag.objects.bulk_create(
+        [TopicTag(topic_id=topic_id, tag_id=tag_ids[slug]) for topic_id, slugs in topic_tags.items() for slug in slugs],
+        batch_size=1000, ignore_conflicts=True
+    )
+
+    links = TopicTag.objects.filter(tag=OuterRef('pk')).order_by().values('tag')
+    ForumTag.objects.update(topics_count=Coalesce(Subquery(links.annotate(total=Count('pk')).values('total')), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum', '0009_category_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForumTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, verbose_name='Название')),
+                ('slug', models.SlugField(allow_unicode=True, max_length=60, unique=True, verbose_name='Слаг')),
+                ('topics_count', models.PositiveIntegerField(default=0, editable=False, verbose_name='Темы')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Тег форума',
+                'verbose_name_plural': 'Теги форума',
+                'ordering': ['name'],
+                'indexes': [models.Index(fields=['-topics_count', 'name'], name='forum_forum_topics__9307f6_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TopicTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='topic_links', to='forum.forumtag', verbose_name='Тег')),
+                ('topic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_links', to='forum.topic', verbose_name='Тема')),
+            ],
+            options={
+                'verbose_name': 'Тег темы',
+                'verbose_name_plural': 'Теги тем',
+                'unique_together': {('tag', 'topic')},
+            },
+        ),
+        migrations.RunPython(fill_tags, migrations.RunPython.noop),
+    ]
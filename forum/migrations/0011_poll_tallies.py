@@ -0,0 +1,55 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:13
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_tallies(apps, schema_editor):
+    """Счетчики голосов раньше не обновлялись - считаем их по таблице голосов"""
+    ForumPoll = apps.get_model('forum', 'ForumPoll')
+    PollOption = apps.get_model('forum', 'PollOption')
+    PollVote = apps.get_model('forum', 'PollVote')
+
+    option_votes = PollVote.objects.filter(option=OuterRef('pk')).order_by().values('option')
+    PollOption.objects.update(
+        votes_count=Coalesce(Subquery(option_votes.annotate(total=Count('pk')).values('total')), 0)
+    )
+    poll_voters = PollVote.objects.filter(poll=OuterRef('pk')).order_by().values('poll')
+    ForumPoll.objects.update(
+        voters_count=Coalesce(
+            Subquery(poll_voters.annotate(total=Count('user', distinct=True)).values('total')), 0
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum', '0010_topic_tags'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='forumpoll',
+            name='voters_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Проголосовало'),
+        ),
+        migrations.AlterField(
+            model_name='polloption',
+            name='votes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество голосов'),
+        ),
+        # Индекс (poll, user) создается раньше, чем удаляется старое ограничение уникальности
+        migrations.AddIndex(
+            model_name='pollvote',
+            index=models.Index(fields=['poll', 'user'], name='forum_pollv_poll_id_60830e_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='pollvote',
+            unique_together={('option', 'user')},
+        ),
+        migrations.RunPython(fill_tallies, migrations.RunPython.noop),
+    ]
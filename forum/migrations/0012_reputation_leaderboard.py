@@ -0,0 +1,102 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_categories_and_ranks(apps, schema_editor):
+    """Категории существующих действий и начальные места в общем рейтинге"""
+    ReputationAction = apps.get_model('forum', 'ReputationAction')
+    Topic = apps.get_model('forum', 'Topic')
+    Post = apps.get_model('forum', 'Post')
+    UserReputation = apps.get_model('forum', 'UserReputation')
+
+    ReputationAction.objects.update(category=Coalesce(
+        Subquery(Topic.objects.filter(pk=OuterRef('topic_id')).values('category_id')[:1]),
+        Subquery(Post.objects.filter(pk=OuterRef('post_id')).values('topic__category_id')[:1]),
+    ))
+
+    rows = list(UserReputation.objects.order_by('-points', 'pk').only('pk', 'points'))
+    previous_points, rank = None, 0
+    for position, row in enumerate(rows, start=1):
+        if row.points != previous_points:
+            previous_points, rank = row.points, position
+        row.rank = rank
+    UserReputation.objects.bulk_update(rows, ['rank'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum', '0011_poll_tallies'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryReputation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('points', models.IntegerField(default=0, verbose_name='Очки репутации')),
+                ('rank', models.PositiveIntegerField(default=0, editable=False, verbose_name='Место в рейтинге')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Репутация в категории',
+                'verbose_name_plural': 'Репутация в категориях',
+            },
+        ),
+        migrations.AddField(
+            model_name='reputationaction',
+            name='category',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='forum.forumcategory', verbose_name='Категория'),
+        ),
+        migrations.AddField(
+            model_name='reputationaction',
+            name='is_applied',
+            field=models.BooleanField(default=False, verbose_name='Учтено'),
+        ),
+        migrations.AddField(
+            model_name='userreputation',
+            name='rank',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Место в рейтинге'),
+        ),
+        migrations.AddIndex(
+            model_name='reputationaction',
+            index=models.Index(fields=['is_applied', 'id'], name='forum_reput_is_appl_1dfd9c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userreputation',
+            index=models.Index(fields=['rank'], name='forum_userr_rank_e4127b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userreputation',
+            index=models.Index(fields=['points'], name='forum_userr_points_90f1ae_idx'),
+        ),
+        migrations.AddField(
+            model_name='categoryreputation',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reputation', to='forum.forumcategory', verbose_name='Категория'),
+        ),
+        migrations.AddField(
+            model_name='categoryreputation',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='forum_category_reputation', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AddIndex(
+            model_name='categoryreputation',
+            index=models.Index(fields=['category', 'rank'], name='forum_categ_categor_b7ced7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='categoryreputation',
+            index=models.Index(fields=['category', 'points'], name='forum_categ_categor_3f056d_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='categoryreputation',
+            unique_together={('category', 'user')},
+        ),
+        migrations.RunPython(fill_categories_and_ranks, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,38 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils.translation import gettext_lazy as _
 from django.urls import reverse
+from django.utils.safestring import mark_safe
 from accounts.models import Family
+from .rendering import RENDERER_VERSION, render_content
+
+
+class RenderedContentMixin:
+    """Хранение отрендеренного содержимого (content_html) рядом с исходным"""
+
+    RENDERED_FIELDS = ['content_html', 'content_html_version']
+
+    def render_content(self):
+        self.content_html = render_content(self.content)
+        self.content_html_version = RENDERER_VERSION
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'content' in update_fields:
+            self.render_content()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | set(self.RENDERED_FIELDS)
+        super().save(*args, **kwargs)
+
+    def get_content_html(self):
+        """HTML содержимого; устаревший рендер обновляется при первом чтении"""
+        if self.content_html_version != RENDERER_VERSION:
+            self.render_content()
+            type(self).objects.filter(pk=self.pk).update(
+                content_html=self.content_html,
+                content_html_version=self.content_html_version,
+            )
+        return mark_safe(self.content_html)
 
 
 class ForumCategory(models.Model):
@@ -13,6 +43,9 @@ class ForumCategory(models.Model):
     color = models.CharField(max_length=7, default='#007bff', verbose_name=_('Цвет'))
     order = models.PositiveIntegerField(default=0, verbose_name=_('Порядок'))
     is_active = models.BooleanField(default=True, verbose_name=_('Активна'))
+    # Счетчики по активным темам, обновляются ForumCounterService
+    topics_count = models.PositiveIntegerField(default=0, editable=False, verbose_name=_('Темы'))
+    posts_count = models.PositiveIntegerField(default=0, editable=False, verbose_name=_('Сообщения'))
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -28,13 +61,13 @@ class ForumCategory(models.Model):
         return reverse('forum:category_detail', kwargs={'pk': self.pk})
 
     def get_topics_count(self):
-        return self.topics.filter(is_active=True).count()
+        return self.topics_count
 
     def get_posts_count(self):
-        return sum(topic.posts.count() for topic in self.topics.filter(is_active=True))
+        return self.posts_count
 
 
-class Topic(models.Model):
+class Topic(RenderedContentMixin, models.Model):
     """Тема обсуждения"""
     STATUS_CHOICES = [
         ('open', _('Открыта')),
@@ -44,6 +77,8 @@ class Topic(models.Model):
 
     title = models.CharField(max_length=200, verbose_name=_('Заголовок'))
     content = models.TextField(verbose_name=_('Содержание'))
+    content_html = models.TextField(blank=True, editable=False, verbose_name=_('Содержание (HTML)'))
+    content_html_version = models.PositiveSmallIntegerField(default=0, editable=False, verbose_name=_('Версия рендера'))
     category = models.ForeignKey(ForumCategory, on_delete=models.CASCADE, related_name='topics', verbose_name=_('Категория'))
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='forum_topics', verbose_name=_('Автор'))
     family = models.ForeignKey(Family, on_delete=models.SET_NULL, null=True, blank=True, related_name='forum_topics', verbose_name=_('Семья'))
@@ -66,14 +101,36 @@ class Topic(models.Model):
         verbose_name_plural = _('Темы')
         ordering = ['-is_pinned', '-last_activity']
 
+    # Поля, влияющие на счетчики категории и индекс тегов
+    ROLLUP_FIELDS = ('category_id', 'is_active', 'tags')
+    # Обновляются атомарно (ForumCounterService), полное сохранение темы их не перезаписывает
+    COUNTER_FIELDS = ('posts_count', 'last_post', 'last_activity')
+
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем состояние для инкрементального обновления счетчиков категории
+        instance._rollup_state = {
+            field: instance.__dict__[field] for field in cls.ROLLUP_FIELDS if field in instance.__dict__
+        }
+        return instance
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
     def get_absolute_url(self):
         return reverse('forum:topic_detail', kwargs={'pk': self.pk})
 
     def get_posts_count(self):
-        return self.posts.count()
+        return self.posts_count
 
     def get_last_post(self):
         return self.posts.order_by('-created_at').first()
@@ -91,23 +148,23 @@ class Topic(models.Model):
         return self.dislikes.filter(user=user).exists()
     
     def get_tags_list(self):
-        """Возвращает список тегов"""
+        """Возвращает список тегов (исходная строка; для ссылок используйте tag_links)"""
         if self.tags:
             return [tag.strip() for tag in self.tags.split(',') if tag.strip()]
         return []
     
     def set_tags(self, tags_list):
-        """Устанавливает теги из списка"""
+        """Устанавливает теги из списка; индекс тегов обновляется при сохранении"""
         self.tags = ', '.join(tags_list)
     
     def update_posts_count(self):
-        """Обновляет счетчик сообщений"""
-        self.posts_count = self.posts.count()
+        """Пересчитывает счетчик сообщений (восстановление, обычно не нужен)"""
+        self.posts_count = self.posts.filter(is_hidden=False).count()
         self.save(update_fields=['posts_count'])
     
     def update_last_post(self):
-        """Обновляет последнее сообщение"""
-        last_post = self.posts.order_by('-created_at').first()
+        """Пересчитывает последнее сообщение (восстановление, обычно не нужен)"""
+        last_post = self.posts.filter(is_hidden=False).order_by('-created_at').first()
         self.last_post = last_post
         self.last_activity = last_post.created_at if last_post else self.created_at
         self.save(update_fields=['last_post', 'last_activity'])
@@ -123,13 +180,20 @@ class Topic(models.Model):
         return True
 
 
-class Post(models.Model):
+class Post(RenderedContentMixin, models.Model):
     """Сообщение в теме"""
     topic = models.ForeignKey(Topic, on_delete=models.CASCADE, related_name='posts', verbose_name=_('Тема'))
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='forum_posts', verbose_name=_('Автор'))
     content = models.TextField(verbose_name=_('Содержание'))
+    content_html = models.TextField(blank=True, editable=False, verbose_name=_('Содержание (HTML)'))
+    content_html_version = models.PositiveSmallIntegerField(default=0, editable=False, verbose_name=_('Версия рендера'))
     parent_post = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies', verbose_name=_('Ответ на сообщение'))
+    # Материализованный путь: id предков и самого сообщения по PATH_SEGMENT_LENGTH цифр
+    path = models.CharField(max_length=255, blank=True, editable=False, verbose_name=_('Путь в ветке'))
+    depth = models.PositiveSmallIntegerField(default=0, editable=False, verbose_name=_('Глубина ответа'))
     is_solution = models.BooleanField(default=False, verbose_name=_('Решение'))
+    is_approved = models.BooleanField(default=False, verbose_name=_('Одобрено модератором'))
+    is_hidden = models.BooleanField(default=False, verbose_name=_('Скрыто модератором'))
     likes_count = models.PositiveIntegerField(default=0, verbose_name=_('Лайки'))
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -138,10 +202,50 @@ class Post(models.Model):
         verbose_name = _('Сообщение')
         verbose_name_plural = _('Сообщения')
         ordering = ['created_at']
+        indexes = [
+            # Очередь модерации с keyset-пагинацией
+            models.Index(fields=['created_at', 'id']),
+            # Выборка ветки обсуждения по диапазону путей
+            models.Index(fields=['topic', 'path']),
+        ]
+
+    # Поля, влияющие на счетчики темы
+    ROLLUP_FIELDS = ('topic_id', 'is_hidden')
+
+    PATH_SEGMENT_LENGTH = 10
+    # Больше уровней не помещается в path; более глубокие ответы становятся соседями родителя
+    MAX_THREAD_DEPTH = 255 // PATH_SEGMENT_LENGTH - 1
 
     def __str__(self):
         return f"Сообщение в теме '{self.topic.title}' от {self.author.username}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._rollup_state = {
+            field: instance.__dict__[field] for field in cls.ROLLUP_FIELDS if field in instance.__dict__
+        }
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Вставка, путь и счетчики темы (сигналы) - в одной транзакции
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if not self.path:
+                self.assign_path()
+
+    def assign_path(self):
+        """Вычисляет путь и глубину по родителю (id известен только после вставки)"""
+        prefix, depth = '', 0
+        parent = self.parent_post
+        if parent is not None:
+            prefix, depth = parent.path, parent.depth + 1
+            if depth > self.MAX_THREAD_DEPTH:
+                prefix, depth = parent.path[:-self.PATH_SEGMENT_LENGTH], parent.depth
+        self.path = prefix + str(self.pk).zfill(self.PATH_SEGMENT_LENGTH)
+        self.depth = depth
+        Post.objects.filter(pk=self.pk).update(path=self.path, depth=self.depth)
+
     def get_absolute_url(self):
         return reverse('forum:topic_detail', kwargs={'pk': self.topic.pk}) + f'#post-{self.pk}'
     
@@ -160,6 +264,45 @@ class Post(models.Model):
         return self.parent_post is not None
 
 
+class ForumTag(models.Model):
+    """Тег тем форума"""
+    name = models.CharField(max_length=50, verbose_name=_('Название'))
+    slug = models.SlugField(max_length=60, unique=True, allow_unicode=True, verbose_name=_('Слаг'))
+    # Число активных тем с тегом, обновляется TopicTagService
+    topics_count = models.PositiveIntegerField(default=0, editable=False, verbose_name=_('Темы'))
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('Тег форума')
+        verbose_name_plural = _('Теги форума')
+        ordering = ['name']
+        indexes = [
+            # Облако тегов: самые популярные теги
+            models.Index(fields=['-topics_count', 'name']),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    def get_absolute_url(self):
+        return reverse('forum:tag_detail', kwargs={'slug': self.slug})
+
+
+class TopicTag(models.Model):
+    """Связь темы с тегом (только для активных тем)"""
+    topic = models.ForeignKey(Topic, on_delete=models.CASCADE, related_name='tag_links', verbose_name=_('Тема'))
+    tag = models.ForeignKey(ForumTag, on_delete=models.CASCADE, related_name='topic_links', verbose_name=_('Тег'))
+
+    class Meta:
+        verbose_name = _('Тег темы')
+        verbose_name_plural = _('Теги тем')
+        # (tag, topic) - выборка тем тега по убыванию id без сортировки
+        unique_together = ['tag', 'topic']
+
+    def __str__(self):
+        return f'{self.topic} - {self.tag}'
+
+
 class TopicLike(models.Model):
     """Лайк темы"""
     topic = models.ForeignKey(Topic, on_delete=models.CASCADE, related_name='likes', verbose_name=_('Тема'))
@@ -284,29 +427,59 @@ class UserReputation(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='forum_reputation', verbose_name=_('Пользователь'))
     points = models.IntegerField(default=0, verbose_name=_('Очки репутации'))
     level = models.PositiveIntegerField(default=1, verbose_name=_('Уровень'))
+    # Место в общем рейтинге (1 + число пользователей с большим числом очков), ведет ReputationService
+    rank = models.PositiveIntegerField(default=0, editable=False, verbose_name=_('Место в рейтинге'))
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # (минимум очков, уровень) по убыванию
+    LEVEL_THRESHOLDS = ((1000, 5), (500, 4), (200, 3), (50, 2))
+
     class Meta:
         verbose_name = _('Репутация пользователя')
         verbose_name_plural = _('Репутация пользователей')
+        indexes = [
+            models.Index(fields=['rank']),
+            models.Index(fields=['points']),
+        ]
 
     def __str__(self):
         return f"Репутация {self.user.username}: {self.points} очков"
 
+    @classmethod
+    def level_for_points(cls, points):
+        for threshold, level in cls.LEVEL_THRESHOLDS:
+            if points >= threshold:
+                return level
+        return 1
+
     def update_level(self):
-        """Обновляет уровень пользователя на основе очков"""
-        if self.points >= 1000:
-            self.level = 5
-        elif self.points >= 500:
-            self.level = 4
-        elif self.points >= 200:
-            self.level = 3
-        elif self.points >= 50:
-            self.level = 2
-        else:
-            self.level = 1
-        self.save(update_fields=['level'])
+        """Обновляет уровень пользователя на основе очков (сохраняет, только если он изменился)"""
+        level = self.level_for_points(self.points)
+        if level != self.level:
+            self.level = level
+            self.save(update_fields=['level'])
+
+
+class CategoryReputation(models.Model):
+    """Репутация пользователя в категории форума (рейтинг категории)"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='forum_category_reputation', verbose_name=_('Пользователь'))
+    category = models.ForeignKey(ForumCategory, on_delete=models.CASCADE, related_name='reputation', verbose_name=_('Категория'))
+    points = models.IntegerField(default=0, verbose_name=_('Очки репутации'))
+    rank = models.PositiveIntegerField(default=0, editable=False, verbose_name=_('Место в рейтинге'))
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _('Репутация в категории')
+        verbose_name_plural = _('Репутация в категориях')
+        unique_together = ['category', 'user']
+        indexes = [
+            models.Index(fields=['category', 'rank']),
+            models.Index(fields=['category', 'points']),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} в {self.category.name}: {self.points} очков"
 
 
 class ReputationAction(models.Model):
@@ -325,12 +498,20 @@ class ReputationAction(models.Model):
     points = models.IntegerField(verbose_name=_('Очки'))
     topic = models.ForeignKey(Topic, on_delete=models.CASCADE, null=True, blank=True, verbose_name=_('Тема'))
     post = models.ForeignKey(Post, on_delete=models.CASCADE, null=True, blank=True, verbose_name=_('Сообщение'))
+    # Категория темы на момент действия - для рейтинга категории без JOIN
+    category = models.ForeignKey(ForumCategory, on_delete=models.SET_NULL, null=True, blank=True, verbose_name=_('Категория'))
+    # Учтено ли действие в очках и рейтингах (ReputationService.apply_pending)
+    is_applied = models.BooleanField(default=False, verbose_name=_('Учтено'))
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         verbose_name = _('Действие репутации')
         verbose_name_plural = _('Действия репутации')
         ordering = ['-created_at']
+        indexes = [
+            # Очередь неучтенных действий
+            models.Index(fields=['is_applied', 'id']),
+        ]
 
     def __str__(self):
         return f"{self.user.username}: {self.get_action_type_display()} ({self.points:+d})"
@@ -375,6 +556,8 @@ class ForumPoll(models.Model):
     is_multiple_choice = models.BooleanField(default=False, verbose_name=_('Множественный выбор'))
     is_anonymous = models.BooleanField(default=False, verbose_name=_('Анонимный'))
     expires_at = models.DateTimeField(null=True, blank=True, verbose_name=_('Истекает'))
+    # Число проголосовавших, обновляется PollService в транзакции голосования
+    voters_count = models.PositiveIntegerField(default=0, editable=False, verbose_name=_('Проголосовало'))
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -395,7 +578,7 @@ class PollOption(models.Model):
     """Варианты ответов в опросе"""
     poll = models.ForeignKey(ForumPoll, on_delete=models.CASCADE, related_name='options', verbose_name=_('Опрос'))
     text = models.CharField(max_length=100, verbose_name=_('Текст варианта'))
-    votes_count = models.PositiveIntegerField(default=0, verbose_name=_('Количество голосов'))
+    votes_count = models.PositiveIntegerField(default=0, editable=False, verbose_name=_('Количество голосов'))
 
     class Meta:
         verbose_name = _('Вариант ответа')
@@ -416,7 +599,11 @@ class PollVote(models.Model):
     class Meta:
         verbose_name = _('Голос')
         verbose_name_plural = _('Голоса')
-        unique_together = ['poll', 'user']
+        # При множественном выборе у пользователя несколько голосов в опросе
+        unique_together = ['option', 'user']
+        indexes = [
+            models.Index(fields=['poll', 'user']),
+        ]
 
     def __str__(self):
         return f"{self.user.username} голосовал за '{self.option.text}'"
\ No newline at end of file
@@ -0,0 +1,53 @@
+"""
+Рендеринг содержимого сообщений форума (BBCode-цитаты, @упоминания).
+
+Текст рендерится один раз при сохранении и хранится в content_html.
+Исходный текст экранируется до разбора разметки, поэтому в результат
+попадает только HTML, который генерирует сам рендерер.
+"""
+import re
+
+from django.utils.encoding import force_str
+from django.utils.html import escape
+
+# Увеличивается при изменении разметки - сохраненный HTML перерендерится при чтении
+RENDERER_VERSION = 1
+
+# Максимальная глубина вложенных цитат
+MAX_QUOTE_DEPTH = 5
+
+# Самая внутренняя цитата: содержимое не включает другой открывающий тег
+QUOTE_RE = re.compile(
+    r'\[quote(?:=([^\]\n]{0,150}))?\]((?:(?!\[quote[=\]]).)*?)\[/quote\]',
+    re.DOTALL | re.IGNORECASE
+)
+MENTION_RE = re.compile(r'(?<![\w@])@(\w{1,150})')
+NEWLINE_RE = re.compile(r'\r\n|\r|\n')
+
+
+def _render_quote(match):
+    username = match.group(1).strip() if match.group(1) else 'Anonymous'
+    return (
+        '<div class="quote-block">'
+        f'<div class="quote-author">@{username}</div>'
+        f'<div class="quote-content">{match.group(2).strip()}</div>'
+        '</div>'
+    )
+
+
+def _render_mention(match):
+    return f'<span class="mention-link">@{match.group(1)}</span>'
+
+
+def render_content(text):
+    """Возвращает HTML для исходного текста сообщения"""
+    if not text:
+        return ''
+
+    # Ленивые строки перевода (gettext_lazy) приводятся к str до разбора
+    html = MENTION_RE.sub(_render_mention, escape(force_str(text)))
+    for depth in range(MAX_QUOTE_DEPTH):
+        html, replaced = QUOTE_RE.subn(_render_quote, html)
+        if not replaced:
+            break
+    return NEWLINE_RE.sub('<br>', html)
@@ -0,0 +1,863 @@
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import (
+    Case, Count, Exists, F, Func, IntegerField, OuterRef, Q, Subquery, Sum, Value, When, Window
+)
+from django.db.models.functions import Coalesce, Rank, Substr
+from django.utils.dateparse import parse_datetime
+from django.utils.text import slugify
+from django.utils.translation import gettext as _
+
+from .models import (
+    CategoryReputation, ForumCategory, ForumPoll, ForumTag, PollOption, PollVote, Post, ReputationAction,
+    Topic, TopicTag, UserReputation,
+)
+
+
+def _decrement(field, amount=1):
+    """Уменьшение счетчика без ухода в минус (беззнаковые столбцы не допускают отрицательных значений)"""
+    return Case(When(**{f'{field}__gte': amount}, then=F(field) - amount), default=Value(0))
+
+
+# Внутри ForumCounterService.deferred() обработчики сигналов не трогают счетчики
+_counters_deferred = ContextVar('forum_counters_deferred', default=False)
+
+
+class TopicRollupService:
+    """
+    Полный пересчет агрегатов тем (счетчик сообщений, последнее сообщение)
+    и счетчиков их категорий.
+
+    Используется для массовых операций и восстановления; единичные
+    изменения учитываются инкрементально в ForumCounterService.
+    """
+
+    @staticmethod
+    def _last_visible_posts():
+        return Post.objects.filter(topic=OuterRef('pk'), is_hidden=False).order_by('-created_at', '-id')
+
+    @classmethod
+    def refresh(cls, topic_ids):
+        """Пересчитывает агрегаты перечисленных тем одним UPDATE и их категории еще одним"""
+        topic_ids = list(set(topic_ids))
+        if not topic_ids:
+            return 0
+
+        visible_posts = Post.objects.filter(topic=OuterRef('pk'), is_hidden=False)
+        last_visible = cls._last_visible_posts()
+        updated = Topic.objects.filter(pk__in=topic_ids).update(
+            posts_count=Coalesce(
+                Subquery(visible_posts.order_by().values('topic').annotate(total=Count('pk')).values('total')),
+                0
+            ),
+            last_post=Subquery(last_visible.values('pk')[:1]),
+            last_activity=Coalesce(Subquery(last_visible.values('created_at')[:1]), F('created_at')),
+        )
+        cls.refresh_categories(Topic.objects.filter(pk__in=topic_ids).values('category_id'))
+        return updated
+
+    @staticmethod
+    def refresh_categories(category_ids):
+        """Пересчитывает счетчики категорий по сохраненным счетчикам их активных тем"""
+        active_topics = Topic.objects.filter(category=OuterRef('pk'), is_active=True).order_by().values('category')
+        return ForumCategory.objects.filter(pk__in=category_ids).update(
+            topics_count=Coalesce(Subquery(active_topics.annotate(total=Count('pk')).values('total')), 0),
+            posts_count=Coalesce(Subquery(active_topics.annotate(total=Sum('posts_count')).values('total')), 0),
+        )
+
+
+class ForumCounterService:
+    """
+    Инкрементальные счетчики форума.
+
+    Каждое видимое сообщение меняет счетчик темы и категории атомарным
+    UPDATE с F() в транзакции вставки/удаления, без COUNT по всем сообщениям.
+    Расхождения исправляет команда repair_forum_counters.
+    """
+
+    @staticmethod
+    @contextmanager
+    def deferred():
+        """
+        Отключает пообъектные обновления счетчиков из сигналов внутри блока.
+        Код массовой операции сам пересчитывает агрегаты (TopicRollupService.refresh).
+        """
+        token = _counters_deferred.set(True)
+        try:
+            yield
+        finally:
+            _counters_deferred.reset(token)
+
+    @staticmethod
+    def is_deferred():
+        return _counters_deferred.get()
+
+    @classmethod
+    def post_added(cls, post):
+        """Новое видимое сообщение становится последним в теме"""
+        Topic.objects.filter(pk=post.topic_id).update(
+            posts_count=F('posts_count') + 1,
+            last_post=post.pk,
+            last_activity=post.created_at,
+        )
+        ForumCategory.objects.filter(topics=post.topic_id, topics__is_active=True).update(
+            posts_count=F('posts_count') + 1
+        )
+
+    @classmethod
+    def post_removed(cls, post):
+        """Сообщение удалено или скрыто; последнее сообщение ищется, только если это было оно"""
+        Topic.objects.filter(pk=post.topic_id).update(posts_count=_decrement('posts_count'))
+        # При удалении ссылка уже обнулена (SET_NULL), при скрытии еще указывает на сообщение
+        last_visible = TopicRollupService._last_visible_posts()
+        Topic.objects.filter(
+            Q(last_post__isnull=True) | Q(last_post=post.pk), pk=post.topic_id
+        ).update(
+            last_post=Subquery(last_visible.values('pk')[:1]),
+            last_activity=Coalesce(Subquery(last_visible.values('created_at')[:1]), F('created_at')),
+        )
+        ForumCategory.objects.filter(topics=post.topic_id, topics__is_active=True).update(
+            posts_count=_decrement('posts_count')
+        )
+
+    @classmethod
+    def topic_added(cls, category_id, posts_count=0):
+        """Тема стала активной в категории (создана, восстановлена или перенесена)"""
+        ForumCategory.objects.filter(pk=category_id).update(
+            topics_count=F('topics_count') + 1,
+            posts_count=F('posts_count') + posts_count,
+        )
+
+    @classmethod
+    def topic_removed(cls, category_id, posts_count=0):
+        """Тема перестала учитываться в категории"""
+        ForumCategory.objects.filter(pk=category_id).update(
+            topics_count=_decrement('topics_count'),
+            posts_count=_decrement('posts_count', posts_count),
+        )
+
+
+class PostModerationQueue:
+    """
+    Очередь модерации сообщений форума с keyset-пагинацией.
+
+    Страница выбирается условием по (created_at, id) вместо OFFSET, поэтому
+    стоимость не растет с номером страницы.
+    """
+
+    STATUS_PENDING = 'pending'
+    STATUS_APPROVED = 'approved'
+    STATUS_HIDDEN = 'hidden'
+
+    def __init__(self, status=None, page_size=20):
+        self.status = status
+        self.page_size = page_size
+
+    @staticmethod
+    def encode_cursor(post):
+        return f'{post.created_at.isoformat()}_{post.pk}'
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """Возвращает (created_at, id) или None для некорректного курсора"""
+        if not cursor:
+            return None
+        created_at, sep, post_id = cursor.rpartition('_')
+        try:
+            created_at = parse_datetime(created_at)
+            post_id = int(post_id)
+        except ValueError:
+            return None
+        if not sep or created_at is None:
+            return None
+        return created_at, post_id
+
+    def get_queryset(self):
+        queryset = Post.objects.select_related('topic__category', 'author')
+        if self.status == self.STATUS_PENDING:
+            queryset = queryset.filter(is_approved=False, is_hidden=False)
+        elif self.status == self.STATUS_APPROVED:
+            queryset = queryset.filter(is_approved=True, is_hidden=False)
+        elif self.status == self.STATUS_HIDDEN:
+            queryset = queryset.filter(is_hidden=True)
+        return queryset.order_by('-created_at', '-id')
+
+    def get_page(self, cursor=None):
+        """Возвращает (сообщения, курсор следующей страницы или None)"""
+        queryset = self.get_queryset()
+        position = self.decode_cursor(cursor)
+        if position:
+            created_at, post_id = position
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=post_id)
+            )
+
+        posts = list(queryset[:self.page_size + 1])
+        next_cursor = None
+        if len(posts) > self.page_size:
+            posts = posts[:self.page_size]
+            next_cursor = self.encode_cursor(posts[-1])
+        return posts, next_cursor
+
+
+class PostModerationService:
+    """Массовые действия модерации сообщений форума"""
+
+    ACTION_APPROVE = 'approve'
+    ACTION_HIDE = 'hide'
+    ACTION_SHOW = 'show'
+    ACTION_DELETE = 'delete'
+
+    ACTIONS = (ACTION_APPROVE, ACTION_HIDE, ACTION_SHOW, ACTION_DELETE)
+
+    @classmethod
+    def apply(cls, action, post_ids):
+        """
+        Применяет действие к сообщениям одним UPDATE/DELETE и в той же
+        транзакции пересчитывает агрегаты затронутых тем.
+
+        Возвращает количество обработанных сообщений.
+        """
+        if action not in cls.ACTIONS:
+            raise ValueError(f'Unknown moderation action: {action}')
+
+        post_ids = list(set(post_ids))
+        if not post_ids:
+            return 0
+
+        with transaction.atomic():
+            posts = Post.objects.filter(id__in=post_ids)
+            topic_ids = list(posts.values_list('topic_id', flat=True).distinct())
+
+            if action == cls.ACTION_APPROVE:
+                affected = posts.update(is_approved=True, is_hidden=False)
+            elif action == cls.ACTION_HIDE:
+                affected = posts.update(is_hidden=True)
+            elif action == cls.ACTION_SHOW:
+                affected = posts.update(is_hidden=False)
+            else:
+                # Без пересчета на каждое удаленное сообщение: агрегаты тем
+                # и категорий пересчитываются ниже один раз
+                with ForumCounterService.deferred():
+                    deleted, per_model = posts.delete()
+                affected = per_model.get(Post._meta.label, 0)
+
+            TopicRollupService.refresh(topic_ids)
+
+        return affected
+
+
+class TopicTagService:
+    """
+    Нормализованный индекс тегов тем.
+
+    Topic.tags остается исходной строкой для редактирования, а связи
+    TopicTag и счетчики ForumTag.topics_count синхронизируются при сохранении
+    темы. Связи хранятся только для активных тем, поэтому страница тега и
+    облако не фильтруют темы и читают индекс (tag, topic) напрямую.
+    """
+
+    MAX_TAGS = 10
+    MAX_TAG_LENGTH = 50
+    CLOUD_CACHE_KEY = 'forum:tag_cloud'
+    CLOUD_WEIGHTS = 5
+
+    @classmethod
+    def normalize(cls, text):
+        """{slug: название} из строки тегов через запятую, без повторов"""
+        tags = {}
+        for raw in (text or '').split(','):
+            name = ' '.join(raw.split()).lower()[:cls.MAX_TAG_LENGTH]
+            slug = slugify(name, allow_unicode=True)[:60]
+            if slug and slug not in tags:
+                tags[slug] = name
+            if len(tags) >= cls.MAX_TAGS:
+                break
+        return tags
+
+    @staticmethod
+    def get_or_create_tags(tags):
+        """{slug: id} для тегов {slug: название}, недостающие создаются одним INSERT"""
+        ids = dict(ForumTag.objects.filter(slug__in=tags).values_list('slug', 'pk'))
+        missing = [slug for slug in tags if slug not in ids]
+        if missing:
+            ForumTag.objects.bulk_create(
+                [ForumTag(slug=slug, name=tags[slug]) for slug in missing], ignore_conflicts=True
+            )
+            ids.update(ForumTag.objects.filter(slug__in=missing).values_list('slug', 'pk'))
+        return ids
+
+    @classmethod
+    def sync(cls, topic):
+        """Приводит связи темы к ее строке тегов и обновляет счетчики тегов"""
+        wanted = cls.normalize(topic.tags) if topic.is_active else {}
+        current = dict(TopicTag.objects.filter(topic=topic).values_list('tag__slug', 'tag_id'))
+        added = {slug: name for slug, name in wanted.items() if slug not in current}
+        removed_ids = [tag_id for slug, tag_id in current.items() if slug not in wanted]
+        if not added and not removed_ids:
+            return
+
+        with transaction.atomic():
+            if added:
+                tag_ids = list(cls.get_or_create_tags(added).values())
+                TopicTag.objects.bulk_create(
+                    [TopicTag(topic=topic, tag_id=tag_id) for tag_id in tag_ids], ignore_conflicts=True
+                )
+                ForumTag.objects.filter(pk__in=tag_ids).update(topics_count=F('topics_count') + 1)
+            if removed_ids:
+                TopicTag.objects.filter(topic=topic, tag_id__in=removed_ids).delete()
+                ForumTag.objects.filter(pk__in=removed_ids).update(
+                    topics_count=_decrement('topics_count')
+                )
+
+    @staticmethod
+    def detach(topic):
+        """Вычитает тему из счетчиков ее тегов (перед удалением темы)"""
+        ForumTag.objects.filter(topic_links__topic=topic).update(
+            topics_count=_decrement('topics_count')
+        )
+
+    @staticmethod
+    def refresh_counts():
+        """Полный пересчет счетчиков тегов по связям"""
+        links = TopicTag.objects.filter(tag=OuterRef('pk')).order_by().values('tag')
+        return ForumTag.objects.update(
+            topics_count=Coalesce(Subquery(links.annotate(total=Count('pk')).values('total')), 0)
+        )
+
+    @staticmethod
+    def get_tag_page(tag, cursor=None, page_size=20):
+        """
+        Темы тега от новых к старым с keyset-пагинацией по id темы.
+
+        Возвращает (темы, курсор следующей страницы или None).
+        """
+        topics = Topic.objects.filter(tag_links__tag=tag).select_related('author', 'category')
+        if cursor and str(cursor).isdigit():
+            topics = topics.filter(pk__lt=int(cursor))
+
+        topics = list(topics.order_by('-pk')[:page_size + 1])
+        next_cursor = None
+        if len(topics) > page_size:
+            topics = topics[:page_size]
+            next_cursor = topics[-1].pk
+        return topics, next_cursor
+
+    @classmethod
+    def get_cloud(cls, limit=30):
+        """
+        Популярные теги [{'name', 'slug', 'count', 'weight'}] по алфавиту.
+
+        weight - от 1 до CLOUD_WEIGHTS по числу тем. Облако кешируется на
+        FORUM_TAG_CLOUD_CACHE_TIMEOUT и не сбрасывается при каждом изменении.
+        """
+        key = f'{cls.CLOUD_CACHE_KEY}:{limit}'
+        cloud = cache.get(key)
+        if cloud is None:
+            rows = list(
+                ForumTag.objects.filter(topics_count__gt=0).order_by('-topics_count', 'name')
+                .values('name', 'slug', 'topics_count')[:limit]
+            )
+            cloud = []
+            if rows:
+                low, high = rows[-1]['topics_count'], rows[0]['topics_count']
+                spread = max(high - low, 1)
+                for row in sorted(rows, key=lambda row: row['name']):
+                    cloud.append({
+                        'name': row['name'],
+                        'slug': row['slug'],
+                        'count': row['topics_count'],
+                        'weight': 1 + (row['topics_count'] - low) * (cls.CLOUD_WEIGHTS - 1) // spread,
+                    })
+            cache.set(key, cloud, getattr(settings, 'FORUM_TAG_CLOUD_CACHE_TIMEOUT', 600))
+        return cloud
+
+
+class ThreadAssembler:
+    """
+    Сборка древовидных обсуждений темы по материализованному пути.
+
+    Страница - это несколько корневых сообщений со всеми ответами до
+    collapse_depth: корни выбираются пагинатором, ответы - одним запросом по
+    диапазону путей. Ответы глубже collapse_depth не загружаются, для
+    последнего видимого уровня считается число свернутых ответов (одним
+    GROUP BY). Количество запросов не зависит от глубины веток.
+    """
+
+    # Любой символ больше цифр: верхняя граница диапазона путей поддерева
+    PATH_UPPER_BOUND = ':'
+
+    def __init__(self, topic, collapse_depth=None, roots_per_page=None):
+        self.topic = topic
+        if collapse_depth is None:
+            collapse_depth = getattr(settings, 'FORUM_THREAD_COLLAPSE_DEPTH', 5)
+        if roots_per_page is None:
+            roots_per_page = getattr(settings, 'FORUM_THREADS_PER_PAGE', 10)
+        self.collapse_depth = collapse_depth
+        self.roots_per_page = roots_per_page
+
+    def get_queryset(self):
+        return Post.objects.filter(topic=self.topic, is_hidden=False).select_related(
+            'author', 'parent_post__author'
+        )
+
+    def get_page(self, page_number=None):
+        """Возвращает (страница корневых сообщений, сообщения страницы в порядке обхода дерева)"""
+        roots = self.get_queryset().filter(depth=0).order_by('path')
+        page = Paginator(roots, self.roots_per_page).get_page(page_number)
+        page_roots = list(page.object_list)
+        if not page_roots:
+            return page, []
+        return page, self._assemble(page_roots[0].path, page_roots[-1].path, base_depth=0)
+
+    def get_subtree(self, post):
+        """Сообщение и ответы на него (до collapse_depth уровней ниже него)"""
+        return self._assemble(post.path, post.path, base_depth=post.depth)
+
+    def _assemble(self, first_path, last_path, base_depth):
+        max_depth = base_depth + self.collapse_depth
+        in_range = self.get_queryset().filter(
+            path__gte=first_path, path__lt=last_path + self.PATH_UPPER_BOUND
+        )
+        # В диапазон попадают и ответы скрытых сообщений (скрытые корни между
+        # видимыми, скрытые промежуточные ответы): оставляем только те, у
+        # которых родитель по пути уже попал в результат. Сортировка по пути
+        # гарантирует, что родитель идет раньше потомков
+        posts = []
+        kept_paths = set()
+        for post in in_range.filter(depth__lte=max_depth).order_by('path'):
+            if post.depth > base_depth and post.path[:-Post.PATH_SEGMENT_LENGTH] not in kept_paths:
+                continue
+            posts.append(post)
+            kept_paths.add(post.path)
+
+        collapsed = {}
+        if any(post.depth == max_depth for post in posts):
+            prefix_length = (max_depth + 1) * Post.PATH_SEGMENT_LENGTH
+            collapsed = dict(
+                in_range.filter(depth__gt=max_depth).annotate(
+                    branch=Substr('path', 1, prefix_length)
+                ).order_by().values('branch').annotate(total=Count('pk')).values_list('branch', 'total')
+            )
+
+        for post in posts:
+            post.thread_level = post.depth - base_depth
+            post.collapsed_replies = collapsed.get(post.path, 0)
+        return posts
+
+
+class UsernameCache:
+    """
+    Небольшой LRU-кеш username -> id пользователя внутри процесса.
+
+    Переименование и удаление пользователя сбрасывают его записи через
+    сигналы (discard_user), но только в текущем процессе; в остальных
+    воркерах запись устаревает не позже чем через FORUM_USERNAME_CACHE_TTL.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        # username -> (id, момент устаревания по time.monotonic)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, usernames):
+        found = {}
+        now = time.monotonic()
+        with self._lock:
+            for username in usernames:
+                entry = self._data.get(username)
+                if entry is None:
+                    continue
+                if entry[1] <= now:
+                    del self._data[username]
+                    continue
+                self._data.move_to_end(username)
+                found[username] = entry[0]
+        return found
+
+    def set_many(self, mapping):
+        expires_at = time.monotonic() + getattr(settings, 'FORUM_USERNAME_CACHE_TTL', 60)
+        with self._lock:
+            for username, user_id in mapping.items():
+                self._data[username] = (user_id, expires_at)
+                self._data.move_to_end(username)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard_user(self, user_id):
+        """Забывает все имена, закешированные для пользователя"""
+        with self._lock:
+            for username in [username for username, entry in self._data.items() if entry[0] == user_id]:
+                del self._data[username]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class MentionService:
+    """
+    Упоминания (@username) и цитаты ([quote=username]) в сообщениях форума.
+
+    Все имена разрешаются одним запросом username__in (с LRU-кешем),
+    уведомления отправляются массово. Число уведомлений на одно сообщение
+    ограничено FORUM_MAX_MENTION_NOTIFICATIONS и FORUM_MAX_QUOTE_NOTIFICATIONS.
+    """
+
+    # Сколько имен вообще рассматривается в одном сообщении
+    MAX_USERNAMES = 50
+
+    username_cache = UsernameCache()
+
+    @classmethod
+    def resolve_usernames(cls, usernames):
+        """Возвращает {username: id} для существующих пользователей"""
+        usernames = list(dict.fromkeys(usernames))[:cls.MAX_USERNAMES]
+        resolved = cls.username_cache.get_many(usernames)
+        missing = [username for username in usernames if username not in resolved]
+        if missing:
+            found = dict(User.objects.filter(username__in=missing).values_list('username', 'id'))
+            cls.username_cache.set_many(found)
+            resolved.update(found)
+        return resolved
+
+    @classmethod
+    def notify(cls, content, topic, sender, post=None):
+        """
+        Уведомляет процитированных и упомянутых пользователей.
+
+        Процитированный и одновременно упомянутый пользователь получает
+        только уведомление о цитате.
+        """
+        from notifications.services import NotificationService
+        from .utils import extract_mentioned_usernames, extract_quoted_usernames
+
+        quoted = extract_quoted_usernames(content)
+        mentioned = extract_mentioned_usernames(content)
+        if not quoted and not mentioned:
+            return
+
+        resolved = cls.resolve_usernames(quoted + mentioned)
+
+        def recipients(usernames, limit, exclude=()):
+            user_ids = []
+            for username in usernames:
+                user_id = resolved.get(username)
+                if user_id and user_id != sender.id and user_id not in user_ids and user_id not in exclude:
+                    user_ids.append(user_id)
+            return user_ids[:limit]
+
+        quoted_ids = recipients(quoted, getattr(settings, 'FORUM_MAX_QUOTE_NOTIFICATIONS', 5))
+        mentioned_ids = recipients(
+            mentioned, getattr(settings, 'FORUM_MAX_MENTION_NOTIFICATIONS', 10), exclude=quoted_ids
+        )
+
+        if quoted_ids:
+            NotificationService.send_forum_quote_notifications(quoted_ids, topic, post, sender)
+        if mentioned_ids:
+            NotificationService.send_forum_mention_notifications(mentioned_ids, topic, post, sender)
+
+
+class PollService:
+    """
+    Голосование в опросах форума.
+
+    Голос, счетчики вариантов и число проголосовавших меняются в одной
+    транзакции. Результаты читаются из счетчиков одним запросом вместе с
+    выбором пользователя; результаты завершенного опроса кешируются.
+    """
+
+    RESULTS_CACHE_PREFIX = 'forum:poll_results:'
+
+    @classmethod
+    def vote(cls, poll, user, option_ids):
+        """
+        Записывает голос пользователя. Некорректный голос - ValueError
+        с сообщением для пользователя.
+        """
+        if poll.is_expired():
+            raise ValueError(_('Опрос завершен.'))
+
+        option_ids = set(PollOption.objects.filter(
+            poll=poll, pk__in=[int(option_id) for option_id in option_ids if str(option_id).isdigit()]
+        ).values_list('pk', flat=True))
+        if not option_ids:
+            raise ValueError(_('Выберите вариант ответа.'))
+        if len(option_ids) > 1 and not poll.is_multiple_choice:
+            raise ValueError(_('В этом опросе можно выбрать только один вариант.'))
+
+        with transaction.atomic():
+            # UPDATE блокирует строку опроса: повторные голоса пользователя выполняются по очереди
+            ForumPoll.objects.filter(pk=poll.pk).update(voters_count=F('voters_count') + 1)
+            if PollVote.objects.filter(poll=poll, user=user).exists():
+                raise ValueError(_('Вы уже проголосовали в этом опросе.'))
+            PollVote.objects.bulk_create(
+                [PollVote(poll=poll, option_id=option_id, user=user) for option_id in option_ids]
+            )
+            PollOption.objects.filter(pk__in=option_ids).update(votes_count=F('votes_count') + 1)
+
+    @staticmethod
+    def refresh_tallies():
+        """Полный пересчет счетчиков голосов по таблице голосов"""
+        option_votes = PollVote.objects.filter(option=OuterRef('pk')).order_by().values('option')
+        PollOption.objects.update(
+            votes_count=Coalesce(Subquery(option_votes.annotate(total=Count('pk')).values('total')), 0)
+        )
+        poll_voters = PollVote.objects.filter(poll=OuterRef('pk')).order_by().values('poll')
+        return ForumPoll.objects.update(
+            voters_count=Coalesce(
+                Subquery(poll_voters.annotate(total=Count('user', distinct=True)).values('total')), 0
+            )
+        )
+
+    @staticmethod
+    def _build_results(poll, options):
+        voters = poll.voters_count
+        return {
+            'voters': voters,
+            'options': [
+                {
+                    'id': option['pk'],
+                    'text': option['text'],
+                    'votes': option['votes_count'],
+                    'percent': round(option['votes_count'] * 100 / voters) if voters else 0,
+                    'selected': option.get('selected', False),
+                }
+                for option in options
+            ],
+        }
+
+    @classmethod
+    def get_results(cls, poll, user=None):
+        """
+        {'voters', 'options': [{'id', 'text', 'votes', 'percent', 'selected'}],
+        'has_voted', 'is_expired'}.
+
+        Для активного опроса - один запрос; для завершенного - снимок из кеша
+        и (для авторизованного пользователя) запрос его выбора.
+        """
+        user_id = user.pk if user is not None and user.is_authenticated else None
+        is_expired = poll.is_expired()
+
+        if is_expired:
+            key = f'{cls.RESULTS_CACHE_PREFIX}{poll.pk}'
+            results = cache.get(key)
+            if results is None:
+                options = PollOption.objects.filter(poll=poll).order_by('id').values('pk', 'text', 'votes_count')
+                results = cls._build_results(poll, options)
+                cache.set(key, results, getattr(settings, 'FORUM_POLL_RESULTS_CACHE_TIMEOUT', 3600))
+            selected = set()
+            if user_id:
+                selected = set(PollVote.objects.filter(poll=poll, user_id=user_id).values_list('option_id', flat=True))
+            results = {
+                'voters': results['voters'],
+                'options': [dict(option, selected=option['id'] in selected) for option in results['options']],
+            }
+        else:
+            options = PollOption.objects.filter(poll=poll).order_by('id')
+            if user_id:
+                options = options.annotate(
+                    selected=Exists(PollVote.objects.filter(option=OuterRef('pk'), user_id=user_id))
+                )
+                options = options.values('pk', 'text', 'votes_count', 'selected')
+            else:
+                options = options.values('pk', 'text', 'votes_count')
+            results = cls._build_results(poll, options)
+
+        results['has_voted'] = any(option['selected'] for option in results['options'])
+        results['is_expired'] = is_expired
+        return results
+
+
+class ReputationService:
+    """
+    Репутация на форуме: журнал действий и рейтинги.
+
+    Действия пишутся в журнал ReputationAction и учитываются пачками
+    (apply_pending): очки и уровень меняются одним UPDATE, а места в общем
+    рейтинге и рейтингах категорий хранятся в строках и сдвигаются только у
+    тех, чьи очки лежат между старым и новым значением изменившихся
+    пользователей. Место пользователя читается по индексу, без сортировки.
+
+    Место - 1 + число пользователей с большим числом очков (одинаковые очки -
+    одинаковое место). rank = 0 у строки, еще не попавшей в рейтинг.
+
+    Журнал разбирает команда apply_reputation_actions по таймеру
+    (baybyway-reputation.timer). Если таймер не запущен или отстает, пачку
+    учитывает сам запрос, после которого неучтенных действий стало не меньше
+    FORUM_REPUTATION_APPLY_THRESHOLD.
+    """
+
+    ACTION_POINTS = {
+        'post_liked': 5,
+        'post_disliked': -2,
+        'topic_liked': 5,
+        'topic_disliked': -2,
+        'solution_marked': 15,
+        'helpful_post': 10,
+    }
+
+    # Сколько изменившихся пользователей обрабатывается одним UPDATE сдвига мест
+    RERANK_CHUNK = 50
+
+    @classmethod
+    def record(cls, user_id, action_type, topic, post=None, actor=None, reverse=False):
+        """Записывает действие в журнал; реакции на собственные сообщения не учитываются"""
+        if user_id is None or (actor is not None and actor.pk == user_id):
+            return None
+        points = cls.ACTION_POINTS[action_type]
+        action = ReputationAction.objects.create(
+            user_id=user_id,
+            action_type=action_type,
+            points=-points if reverse else points,
+            topic=topic,
+            post=post,
+            category_id=topic.category_id,
+        )
+        if getattr(settings, 'FORUM_REPUTATION_APPLY_THRESHOLD', 0):
+            transaction.on_commit(cls.apply_if_backlogged)
+        return action
+
+    @classmethod
+    def apply_if_backlogged(cls):
+        """Учитывает пачку, если неучтенных действий накопилось FORUM_REPUTATION_APPLY_THRESHOLD"""
+        threshold = getattr(settings, 'FORUM_REPUTATION_APPLY_THRESHOLD', 0)
+        if not threshold:
+            return 0
+        # Наличие threshold-й строки по индексу (is_applied, id), без полного COUNT
+        pending = ReputationAction.objects.filter(is_applied=False).order_by('id').values('pk')
+        if not pending[threshold - 1:threshold].exists():
+            return 0
+        return cls.apply_pending(threshold)
+
+    @classmethod
+    def apply_pending(cls, batch_size=500):
+        """Учитывает одну пачку неучтенных действий; возвращает их количество"""
+        with transaction.atomic():
+            actions = list(
+                ReputationAction.objects.filter(is_applied=False).order_by('id')
+                .select_for_update(skip_locked=True)
+                .values_list('pk', 'user_id', 'category_id', 'points')[:batch_size]
+            )
+            if not actions:
+                return 0
+
+            user_deltas = defaultdict(int)
+            category_deltas = defaultdict(lambda: defaultdict(int))
+            for action_id, user_id, category_id, points in actions:
+                user_deltas[user_id] += points
+                if category_id:
+                    category_deltas[category_id][user_id] += points
+
+            cls._apply_deltas(UserReputation.objects.all(), user_deltas, UserReputation)
+            for category_id, deltas in category_deltas.items():
+                cls._apply_deltas(
+                    CategoryReputation.objects.filter(category_id=category_id), deltas, CategoryReputation,
+                    category_id=category_id
+                )
+
+            ReputationAction.objects.filter(pk__in=[action[0] for action in actions]).update(is_applied=True)
+        return len(actions)
+
+    @classmethod
+    def _apply_deltas(cls, rows, deltas, model, **create_kwargs):
+        """Применяет {user_id: изменение очков} к области рейтинга rows"""
+        deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+        if not deltas:
+            return
+
+        missing = set(deltas) - set(rows.filter(user_id__in=deltas).values_list('user_id', flat=True))
+        if missing:
+            model.objects.bulk_create(
+                [model(user_id=user_id, **create_kwargs) for user_id in missing], ignore_conflicts=True
+            )
+
+        # {pk: (старые очки или None для строки вне рейтинга, новые очки)}
+        changes = {}
+        for pk, user_id, points, rank in rows.select_for_update().filter(user_id__in=deltas).values_list(
+            'pk', 'user_id', 'points', 'rank'
+        ):
+            changes[pk] = (points if rank else None, points + deltas[user_id])
+
+        fields = {'points': Case(
+            *[When(pk=pk, then=Value(new)) for pk, (old, new) in changes.items()], output_field=IntegerField()
+        )}
+        if model is UserReputation:
+            fields['level'] = Case(
+                *[When(pk=pk, then=Value(UserReputation.level_for_points(new))) for pk, (old, new) in changes.items()],
+                output_field=IntegerField()
+            )
+        rows.filter(pk__in=changes).update(**fields)
+        cls._rerank(rows, changes)
+
+    @classmethod
+    def _rerank(cls, rows, changes):
+        """
+        Сдвигает места после изменения очков.
+
+        Пользователь X, перешедший с a на b очков, меняет место только тем,
+        у кого a <= очки < b (место +1) или b <= очки < a (место -1); места
+        самих изменившихся считаются заново по индексу очков.
+        """
+        items = list(changes.items())
+        for start in range(0, len(items), cls.RERANK_CHUNK):
+            shift = Value(0)
+            band = Q()
+            for pk, (old, new) in items[start:start + cls.RERANK_CHUNK]:
+                if old is None:
+                    condition, step = Q(points__lt=new), 1
+                elif new > old:
+                    condition, step = Q(points__gte=old, points__lt=new), 1
+                else:
+                    condition, step = Q(points__gte=new, points__lt=old), -1
+                shift = shift + Case(When(condition, then=Value(step)), default=Value(0))
+                band |= condition
+            rows.filter(band).exclude(pk__in=changes).update(rank=F('rank') + shift)
+
+        higher = rows.filter(points__gt=OuterRef('points')).order_by().annotate(
+            total=Func(F('pk'), function='COUNT')
+        ).values('total')
+        ranked = rows.filter(pk__in=changes).annotate(higher=Subquery(higher)).values_list('pk', 'higher')
+        rows.model.objects.bulk_update(
+            [rows.model(pk=pk, rank=(higher or 0) + 1) for pk, higher in ranked], ['rank']
+        )
+
+    @staticmethod
+    def rebuild_ranks(batch_size=1000):
+        """Полный пересчет мест (после удаления пользователей или ручной правки очков)"""
+        for model, partition in ((UserReputation, None), (CategoryReputation, [F('category_id')])):
+            rows = list(model.objects.annotate(
+                new_rank=Window(Rank(), partition_by=partition, order_by=F('points').desc())
+            ).values_list('pk', 'rank', 'new_rank'))
+            model.objects.bulk_update(
+                [model(pk=pk, rank=new_rank) for pk, rank, new_rank in rows if rank != new_rank],
+                ['rank'], batch_size=batch_size
+            )
+
+    @staticmethod
+    def leaderboard(category=None, limit=10):
+        """Верх рейтинга (общего или категории) по сохраненным местам"""
+        if category is None:
+            rows = UserReputation.objects.all()
+        else:
+            rows = CategoryReputation.objects.filter(category=category)
+        return list(rows.filter(rank__gt=0).select_related('user').order_by('rank', 'pk')[:limit])
+
+    @staticmethod
+    def get_rank(user, category=None):
+        """Место пользователя в рейтинге или None"""
+        if category is None:
+            rows = UserReputation.objects.filter(user=user)
+        else:
+            rows = CategoryReputation.objects.filter(category=category, user=user)
+        return rows.filter(rank__gt=0).values_list('rank', flat=True).first()
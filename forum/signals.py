@@ -0,0 +1,86 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from .models import Post, Topic
+from .services import ForumCounterService, MentionService, TopicRollupService, TopicTagService
+
+
+def _remember_state(instance):
+    instance._rollup_state = {field: getattr(instance, field) for field in type(instance).ROLLUP_FIELDS}
+
+
+@receiver(post_save, sender=Post)
+def update_counters_on_post_save(sender, instance, created, **kwargs):
+    # Вызывается внутри транзакции Post.save
+    state = getattr(instance, '_rollup_state', None)
+    if ForumCounterService.is_deferred():
+        pass
+    elif created:
+        if not instance.is_hidden:
+            ForumCounterService.post_added(instance)
+    elif state is not None and state.get('is_hidden', instance.is_hidden) != instance.is_hidden:
+        if instance.is_hidden:
+            ForumCounterService.post_removed(instance)
+        else:
+            # Показанное сообщение не обязательно самое новое - ищем последнее заново
+            TopicRollupService.refresh([instance.topic_id])
+    _remember_state(instance)
+
+
+@receiver(post_delete, sender=Post)
+def update_counters_on_post_delete(sender, instance, **kwargs):
+    if not instance.is_hidden and not ForumCounterService.is_deferred():
+        ForumCounterService.post_removed(instance)
+
+
+@receiver(post_save, sender=Topic)
+def update_counters_on_topic_save(sender, instance, created, **kwargs):
+    state = getattr(instance, '_rollup_state', None)
+    if created:
+        if instance.is_active:
+            ForumCounterService.topic_added(instance.category_id)
+    elif state is not None:
+        old_category_id = state.get('category_id', instance.category_id)
+        was_active = state.get('is_active', instance.is_active)
+        if old_category_id != instance.category_id or was_active != instance.is_active:
+            # Счетчик в памяти может отставать от атомарных обновлений
+            posts_count = Topic.objects.filter(pk=instance.pk).values_list('posts_count', flat=True).first() or 0
+            with transaction.atomic():
+                if was_active:
+                    ForumCounterService.topic_removed(old_category_id, posts_count)
+                if instance.is_active:
+                    ForumCounterService.topic_added(instance.category_id, posts_count)
+
+    if created or state is None or any(
+        state.get(field, getattr(instance, field)) != getattr(instance, field) for field in ('tags', 'is_active')
+    ):
+        TopicTagService.sync(instance)
+    _remember_state(instance)
+
+
+@receiver(pre_delete, sender=Topic)
+def update_tag_counters_on_topic_delete(sender, instance, **kwargs):
+    # Связи с тегами удаляются каскадом без сигналов
+    TopicTagService.detach(instance)
+
+
+@receiver(post_delete, sender=Topic)
+def update_counters_on_topic_delete(sender, instance, **kwargs):
+    # Сообщения удаляются каскадом раньше темы и уже вычтены своим обработчиком
+    if instance.is_active:
+        ForumCounterService.topic_removed(instance.category_id)
+
+
+@receiver(post_save, sender=User)
+def forget_username_on_user_save(sender, instance, created, update_fields=None, **kwargs):
+    # Вход пользователя сохраняет только last_login - имя не меняется
+    if created or (update_fields is not None and 'username' not in update_fields):
+        return
+    MentionService.username_cache.discard_user(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def forget_username_on_user_delete(sender, instance, **kwargs):
+    MentionService.username_cache.discard_user(instance.pk)
@@ -1,3 +1,401 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+
+from .models import (
+    ForumCategory, ForumPoll, ForumTag, PollOption, PollVote, Post, ReputationAction, Topic, UserReputation,
+)
+from .services import (
+    MentionService, PollService, PostModerationService, ReputationService, ThreadAssembler, TopicRollupService,
+    TopicTagService,
+)
+from .utils import extract_mentioned_usernames
+
+
+class ForumTestCase(TestCase):
+    """Категория, автор и тема с сообщениями"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author', password='x')
+        cls.category = ForumCategory.objects.create(name='Сон')
+        cls.topic = Topic.objects.create(title='Режим сна', content='Как уложить?', category=cls.category, author=cls.author)
+
+    @classmethod
+    def add_post(cls, content='Ответ', **kwargs):
+        kwargs.setdefault('topic', cls.topic)
+        kwargs.setdefault('author', cls.author)
+        return Post.objects.create(content=content, **kwargs)
+
+    def refresh(self, *objects):
+        for obj in objects:
+            obj.refresh_from_db()
+
+
+class PostModerationServiceTest(ForumTestCase):
+    def test_bulk_delete_recomputes_counters_once(self):
+        posts = [self.add_post(f'Ответ {number}') for number in range(6)]
+        doomed = [post.pk for post in posts[3:]]
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(PostModerationService.apply(PostModerationService.ACTION_DELETE, doomed), 3)
+
+        topic_updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "forum_topic"')]
+        # SET_NULL для last_post и один пересчет агрегатов, независимо от числа сообщений
+        self.assertLessEqual(len(topic_updates), 2)
+        self.refresh(self.topic, self.category)
+        self.assertEqual(self.topic.posts_count, 3)
+        self.assertEqual(self.topic.last_post_id, posts[2].pk)
+        self.assertEqual(self.category.posts_count, 3)
+        self.assertEqual(self.category.topics_count, 1)
+
+
+class RenderedContentTest(ForumTestCase):
+    def test_save_renders_lazy_translation_content(self):
+        topic = Topic.objects.create(
+            title=gettext_lazy('Прикорм'), content=gettext_lazy('Вопрос к @author'),
+            category=self.category, author=self.author,
+        )
+        self.assertEqual(topic.content_html, 'Вопрос к <span class="mention-link">@author</span>')
+        self.assertEqual(extract_mentioned_usernames(gettext_lazy('@author')), ['author'])
+
+    def test_content_is_escaped_before_markup(self):
+        post = self.add_post('[quote=author]<b>да</b>[/quote]')
+        self.assertIn('&lt;b&gt;да&lt;/b&gt;', post.content_html)
+        self.assertIn('<div class="quote-author">@author</div>', post.content_html)
+
+
+class UsernameCacheTest(TestCase):
+    def setUp(self):
+        MentionService.username_cache.clear()
+        self.anna = User.objects.create_user('anna')
+
+    def test_rename_drops_cached_username(self):
+        self.assertEqual(MentionService.resolve_usernames(['anna']), {'anna': self.anna.pk})
+        self.anna.username = 'anya'
+        self.anna.save()
+        newcomer = User.objects.create_user('anna')
+        self.assertEqual(MentionService.resolve_usernames(['anna', 'anya']), {'anna': newcomer.pk, 'anya': self.anna.pk})
+
+    def test_delete_drops_cached_username(self):
+        MentionService.resolve_usernames(['anna'])
+        self.anna.delete()
+        self.assertEqual(MentionService.resolve_usernames(['anna']), {})
+
+    def test_login_keeps_cache(self):
+        MentionService.resolve_usernames(['anna'])
+        self.anna.save(update_fields=['last_login'])
+        self.assertEqual(MentionService.username_cache.get_many(['anna']), {'anna': self.anna.pk})
+
+    @override_settings(FORUM_USERNAME_CACHE_TTL=0)
+    def test_entries_expire(self):
+        MentionService.resolve_usernames(['anna'])
+        self.assertEqual(MentionService.username_cache.get_many(['anna']), {})
+
+
+class ThreadAssemblerTest(ForumTestCase):
+    def test_replies_of_hidden_posts_are_not_attached_to_other_threads(self):
+        first = self.add_post('Первый')
+        hidden_root = self.add_post('Скрытый', is_hidden=True)
+        last = self.add_post('Последний')
+        first_reply = self.add_post('Ответ первому', parent_post=first)
+        self.add_post('Ответ скрытому', parent_post=hidden_root)
+        hidden_reply = self.add_post('Скрытый ответ', parent_post=last, is_hidden=True)
+        self.add_post('Ответ на скрытый ответ', parent_post=hidden_reply)
+
+        page, posts = ThreadAssembler(self.topic, collapse_depth=5, roots_per_page=10).get_page()
+
+        self.assertEqual([post.content for post in posts], ['Первый', 'Ответ первому', 'Последний'])
+        self.assertEqual([post.thread_level for post in posts], [0, 1, 0])
+        self.assertEqual(ThreadAssembler(self.topic).get_subtree(first), [first, first_reply])
+
+
+class ForumCounterSignalsTest(ForumTestCase):
+    def assertCounters(self, topic_posts, category_topics, category_posts, last_post=None):
+        self.refresh(self.topic, self.category)
+        self.assertEqual(self.topic.posts_count, topic_posts)
+        self.assertEqual(self.category.topics_count, category_topics)
+        self.assertEqual(self.category.posts_count, category_posts)
+        self.assertEqual(self.topic.last_post_id, last_post.pk if last_post else None)
+
+    def test_new_topic_counts_in_category(self):
+        self.assertCounters(0, 1, 0)
+
+    def test_post_added_and_deleted(self):
+        first = self.add_post()
+        second = self.add_post()
+        self.assertCounters(2, 1, 2, last_post=second)
+        second.delete()
+        self.assertCounters(1, 1, 1, last_post=first)
+
+    def test_hide_and_show_post(self):
+        first = self.add_post()
+        second = self.add_post()
+        second.is_hidden = True
+        second.save()
+        self.assertCounters(1, 1, 1, last_post=first)
+        second.is_hidden = False
+        second.save()
+        self.assertCounters(2, 1, 2, last_post=second)
+
+    def test_hidden_post_is_not_counted(self):
+        self.add_post(is_hidden=True)
+        self.assertCounters(0, 1, 0)
+
+    def test_topic_deactivated_and_moved(self):
+        self.add_post()
+        self.add_post()
+        other = ForumCategory.objects.create(name='Питание')
+
+        self.topic.is_active = False
+        self.topic.save()
+        self.assertCounters(2, 0, 0, last_post=self.topic.posts.last())
+
+        self.topic.is_active = True
+        self.topic.category = other
+        self.topic.save()
+        other.refresh_from_db()
+        self.assertEqual((other.topics_count, other.posts_count), (1, 2))
+        self.category.refresh_from_db()
+        self.assertEqual((self.category.topics_count, self.category.posts_count), (0, 0))
+
+    def test_topic_deleted(self):
+        self.add_post()
+        self.topic.delete()
+        self.category.refresh_from_db()
+        self.assertEqual((self.category.topics_count, self.category.posts_count), (0, 0))
+
+    def test_incremental_counters_match_full_refresh(self):
+        posts = [self.add_post() for _ in range(4)]
+        posts[1].is_hidden = True
+        posts[1].save()
+        posts[3].delete()
+        self.refresh(self.topic, self.category)
+        incremental = (self.topic.posts_count, self.topic.last_post_id, self.category.posts_count)
+
+        TopicRollupService.refresh([self.topic.pk])
+        self.refresh(self.topic, self.category)
+        self.assertEqual(incremental, (self.topic.posts_count, self.topic.last_post_id, self.category.posts_count))
+
+
+class PollServiceTest(ForumTestCase):
+    def setUp(self):
+        cache.clear()
+        self.voter = User.objects.create_user('voter', password='x')
+        self.poll = ForumPoll.objects.create(topic=self.topic, question='Во сколько укладываете?')
+        self.early, self.late = (
+            PollOption.objects.create(poll=self.poll, text=text) for text in ('До девяти', 'После девяти')
+        )
+
+    def test_vote_updates_tallies(self):
+        PollService.vote(self.poll, self.voter, [str(self.early.pk)])
+        results = PollService.get_results(self.poll_from_db(), self.voter)
+        self.assertEqual(results['voters'], 1)
+        self.assertTrue(results['has_voted'])
+        self.assertEqual(
+            [(option['votes'], option['percent'], option['selected']) for option in results['options']],
+            [(1, 100, True), (0, 0, False)],
+        )
+
+    def test_repeated_vote_is_rejected_without_changing_tallies(self):
+        PollService.vote(self.poll, self.voter, [self.early.pk])
+        with self.assertRaises(ValueError):
+            PollService.vote(self.poll, self.voter, [self.late.pk])
+        self.assertEqual(self.poll_from_db().voters_count, 1)
+        self.late.refresh_from_db()
+        self.assertEqual(self.late.votes_count, 0)
+
+    def test_single_choice_rejects_several_options(self):
+        with self.assertRaises(ValueError):
+            PollService.vote(self.poll, self.voter, [self.early.pk, self.late.pk])
+        self.assertFalse(PollVote.objects.exists())
+
+    def test_foreign_and_malformed_options_are_ignored(self):
+        other_topic = Topic.objects.create(title='Другой', content='-', category=self.category, author=self.author)
+        foreign = PollOption.objects.create(poll=ForumPoll.objects.create(topic=other_topic, question='?'), text='x')
+        with self.assertRaises(ValueError):
+            PollService.vote(self.poll, self.voter, [foreign.pk, 'abc'])
+
+    def test_expired_poll_rejects_votes_and_caches_results(self):
+        PollService.vote(self.poll, self.voter, [self.late.pk])
+        ForumPoll.objects.filter(pk=self.poll.pk).update(expires_at=timezone.now() - timedelta(minutes=1))
+        poll = self.poll_from_db()
+        with self.assertRaises(ValueError):
+            PollService.vote(poll, self.author, [self.early.pk])
+
+        self.assertEqual(PollService.get_results(poll)['voters'], 1)
+        with self.assertNumQueries(1):
+            results = PollService.get_results(poll, self.voter)
+        self.assertEqual([option['selected'] for option in results['options']], [False, True])
+
+    def test_refresh_tallies_matches_incremental(self):
+        PollService.vote(self.poll, self.voter, [self.early.pk])
+        PollService.vote(self.poll, self.author, [self.late.pk])
+        PollOption.objects.update(votes_count=7)
+        PollService.refresh_tallies()
+        self.assertEqual(
+            list(PollOption.objects.filter(poll=self.poll).order_by('id').values_list('votes_count', flat=True)), [1, 1]
+        )
+        self.assertEqual(self.poll_from_db().voters_count, 2)
+
+    def test_vote_view(self):
+        self.client.login(username='voter', password='x')
+        response = self.client.post(reverse('forum:vote_poll', args=[self.poll.pk]), {'option': [self.late.pk]})
+        self.assertRedirects(response, reverse('forum:topic_detail', args=[self.topic.pk]), fetch_redirect_response=False)
+        self.assertTrue(PollVote.objects.filter(user=self.voter, option=self.late).exists())
+
+    def poll_from_db(self):
+        return ForumPoll.objects.get(pk=self.poll.pk)
+
+
+@override_settings(FORUM_REPUTATION_APPLY_THRESHOLD=0)
+class ReputationServiceTest(ForumTestCase):
+    def setUp(self):
+        self.users = [User.objects.create_user(f'member{number}') for number in range(4)]
+
+    def like(self, user, times=1, action='post_liked', topic=None):
+        for _ in range(times):
+            ReputationService.record(user.pk, action, topic or self.topic, actor=self.author)
+
+    def ranks(self, category=None):
+        return [ReputationService.get_rank(user, category) for user in self.users]
+
+    def test_actions_are_applied_in_batches(self):
+        self.like(self.users[0], 3)
+        self.like(self.users[1])
+        self.assertEqual(self.ranks(), [None] * 4)
+
+        self.assertEqual(ReputationService.apply_pending(batch_size=2), 2)
+        self.assertEqual(ReputationService.apply_pending(batch_size=10), 2)
+        self.assertEqual(ReputationService.apply_pending(), 0)
+
+        self.assertEqual(UserReputation.objects.get(user=self.users[0]).points, 15)
+        self.assertEqual(self.ranks(), [1, 2, None, None])
+        self.assertEqual(self.ranks(self.category), [1, 2, None, None])
+
+    def test_stored_ranks_follow_point_changes(self):
+        self.like(self.users[0], 2)
+        self.like(self.users[1], 2)
+        self.like(self.users[2], 1)
+        ReputationService.apply_pending()
+        self.assertEqual(self.ranks(), [1, 1, 3, None])
+
+        # Пользователь обгоняет всех, затем теряет очки ниже остальных
+        self.like(self.users[2], 3, action='solution_marked')
+        ReputationService.apply_pending()
+        self.assertEqual(self.ranks(), [2, 2, 1, None])
+        self.like(self.users[2], 25, action='post_disliked')
+        ReputationService.apply_pending()
+        self.assertEqual(self.ranks(), [1, 1, 3, None])
+
+        incremental = list(UserReputation.objects.order_by('pk').values_list('pk', 'rank'))
+        UserReputation.objects.update(rank=0)
+        ReputationService.rebuild_ranks()
+        self.assertEqual(list(UserReputation.objects.order_by('pk').values_list('pk', 'rank')), incremental)
+
+    def test_category_leaderboard_is_separate(self):
+        other = ForumCategory.objects.create(name='Питание')
+        other_topic = Topic.objects.create(title='Каша', content='-', category=other, author=self.author)
+        self.like(self.users[0], 1)
+        self.like(self.users[1], 2, topic=other_topic)
+        ReputationService.apply_pending()
+
+        self.assertEqual([row.user for row in ReputationService.leaderboard()], [self.users[1], self.users[0]])
+        self.assertEqual([row.user for row in ReputationService.leaderboard(self.category)], [self.users[0]])
+        self.assertEqual(ReputationService.get_rank(self.users[1], other), 1)
+
+    def test_own_reactions_are_ignored(self):
+        self.assertIsNone(ReputationService.record(self.author.pk, 'post_liked', self.topic, actor=self.author))
+        self.assertFalse(ReputationAction.objects.exists())
+
+    @override_settings(FORUM_REPUTATION_APPLY_THRESHOLD=3)
+    def test_backlog_is_applied_after_commit_at_threshold(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.like(self.users[0], 2)
+        self.assertEqual(ReputationAction.objects.filter(is_applied=False).count(), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.like(self.users[0])
+        self.assertFalse(ReputationAction.objects.filter(is_applied=False).exists())
+        self.assertEqual(ReputationService.get_rank(self.users[0]), 1)
+
+    def test_command_drains_ledger(self):
+        self.like(self.users[0], 5)
+        out = StringIO()
+        call_command('apply_reputation_actions', '--batch-size', '2', stdout=out)
+        self.assertIn('5', out.getvalue())
+        self.assertFalse(ReputationAction.objects.filter(is_applied=False).exists())
+
+
+class TopicTagServiceTest(ForumTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def add_topic(self, tags, **kwargs):
+        return Topic.objects.create(
+            title='Тема', content='-', category=self.category, author=self.author, tags=tags, **kwargs
+        )
+
+    def counts(self):
+        return dict(ForumTag.objects.values_list('slug', 'topics_count'))
+
+    def test_sync_follows_tag_string(self):
+        topic = self.add_topic('Сон, сон,  Режим дня')
+        self.assertEqual(set(topic.tag_links.values_list('tag__slug', flat=True)), {'сон', 'режим-дня'})
+        self.assertEqual(self.counts(), {'сон': 1, 'режим-дня': 1})
+
+        topic.tags = 'режим дня, прикорм'
+        topic.save()
+        self.assertEqual(self.counts(), {'сон': 0, 'режим-дня': 1, 'прикорм': 1})
+
+        topic.is_active = False
+        topic.save()
+        self.assertFalse(topic.tag_links.exists())
+        self.assertEqual(self.counts(), {'сон': 0, 'режим-дня': 0, 'прикорм': 0})
+
+        topic.is_active = True
+        topic.save()
+        topic.delete()
+        self.assertEqual(self.counts(), {'сон': 0, 'режим-дня': 0, 'прикорм': 0})
+
+    def test_tag_page_uses_cursor(self):
+        topics = [self.add_topic('сон') for _ in range(5)]
+        self.add_topic('прикорм')
+        tag = ForumTag.objects.get(slug='сон')
+
+        page, cursor = TopicTagService.get_tag_page(tag, page_size=2)
+        self.assertEqual(page, [topics[4], topics[3]])
+        self.assertEqual(cursor, topics[3].pk)
+        page, cursor = TopicTagService.get_tag_page(tag, str(cursor), page_size=2)
+        self.assertEqual(page, [topics[2], topics[1]])
+        page, cursor = TopicTagService.get_tag_page(tag, cursor, page_size=2)
+        self.assertEqual((page, cursor), ([topics[0]], None))
+        # Некорректный курсор - первая страница
+        self.assertEqual(TopicTagService.get_tag_page(tag, 'x', page_size=2)[0], [topics[4], topics[3]])
+
+    def test_cloud_is_cached_until_timeout(self):
+        for tags in ('сон', 'сон', 'сон, прикорм'):
+            self.add_topic(tags)
+        self.assertEqual(
+            [(tag['name'], tag['count'], tag['weight']) for tag in TopicTagService.get_cloud()],
+            [('прикорм', 1, 1), ('сон', 3, TopicTagService.CLOUD_WEIGHTS)],
+        )
+
+        self.add_topic('режим')
+        self.assertEqual(len(TopicTagService.get_cloud()), 2)
+        cache.delete(f'{TopicTagService.CLOUD_CACHE_KEY}:30')
+        self.assertEqual(len(TopicTagService.get_cloud()), 3)
 
-# Create your tests here.
+        cache.clear()
+        with override_settings(FORUM_TAG_CLOUD_CACHE_TIMEOUT=0):
+            TopicTagService.get_cloud()
+            self.add_topic('зубы')
+            self.assertEqual(len(TopicTagService.get_cloud()), 4)
@@ -26,6 +26,7 @@ urlpatterns = [
     path('post/<int:pk>/like/', views.like_post, name='like_post'),
     path('post/<int:pk>/dislike/', views.dislike_post, name='dislike_post'),
     path('post/<int:pk>/solution/', views.mark_solution, name='mark_solution'),
+    path('poll/<int:pk>/vote/', views.vote_poll, name='vote_poll'),
     
     # Подписки
     path('topic/<int:pk>/subscribe/', views.subscribe_to_topic, name='subscribe_topic'),
@@ -36,4 +37,7 @@ urlpatterns = [
     
     # Поиск
     path('search/', views.search_topics, name='search'),
+    
+    # Теги
+    path('tag/<str:slug>/', views.tag_detail, name='tag_detail'),
 ]
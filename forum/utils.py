@@ -1,63 +1,46 @@
 import re
 from django.contrib.auth.models import User
+from django.utils.encoding import force_str
 
+from .rendering import MENTION_RE
 
-def extract_quoted_users_from_content(content: str) -> list:
+
+# Открывающий тег цитаты [quote=username]
+QUOTE_AUTHOR_RE = re.compile(r'\[quote=([^\]\n]{1,150})\]', re.IGNORECASE)
+
+
+def extract_quoted_usernames(content: str) -> list:
     """
-    Извлекает список пользователей, которые были процитированы в сообщении.
+    Извлекает имена процитированных пользователей в порядке появления.
     Ищет BBCode цитаты вида [quote=username]content[/quote]
     """
     if not content:
         return []
-    
-    # Паттерн для поиска BBCode цитат [quote=username]content[/quote]
-    quote_pattern = r'\[quote=([^\]]+)\].*?\[/quote\]'
-    
-    # Находим все цитаты
-    quotes = re.findall(quote_pattern, content, re.DOTALL | re.IGNORECASE)
-    
-    # Получаем уникальных пользователей
-    quoted_usernames = list(set(quotes))
-    
-    # Проверяем, что пользователи существуют
-    quoted_users = []
-    for username in quoted_usernames:
-        try:
-            user = User.objects.get(username=username.strip())
-            quoted_users.append(user)
-        except User.DoesNotExist:
-            # Пользователь не найден, пропускаем
-            continue
-    
-    return quoted_users
+    usernames = (username.strip() for username in QUOTE_AUTHOR_RE.findall(force_str(content)))
+    return list(dict.fromkeys(username for username in usernames if username))
 
 
-def extract_mentioned_users_from_content(content: str) -> list:
+def extract_mentioned_usernames(content: str) -> list:
     """
-    Извлекает список пользователей, которые были упомянуты в сообщении.
+    Извлекает имена упомянутых пользователей в порядке появления.
     Ищет упоминания вида @username
     """
     if not content:
         return []
-    
-    # Паттерн для поиска упоминаний @username
-    mention_pattern = r'@(\w+)'
-    
-    # Находим все упоминания
-    mentions = re.findall(mention_pattern, content)
-    
-    # Получаем уникальных пользователей
-    mentioned_usernames = list(set(mentions))
-    
-    # Проверяем, что пользователи существуют
-    mentioned_users = []
-    for username in mentioned_usernames:
-        try:
-            user = User.objects.get(username=username.strip())
-            mentioned_users.append(user)
-        except User.DoesNotExist:
-            # Пользователь не найден, пропускаем
-            continue
-    
-    return mentioned_users
+    return list(dict.fromkeys(MENTION_RE.findall(force_str(content))))
+
+
+def extract_quoted_users_from_content(content: str) -> list:
+    """Процитированные пользователи (одним запросом)"""
+    usernames = extract_quoted_usernames(content)
+    if not usernames:
+        return []
+    return list(User.objects.filter(username__in=usernames))
 
+
+def extract_mentioned_users_from_content(content: str) -> list:
+    """Упомянутые пользователи (одним запросом)"""
+    usernames = extract_mentioned_usernames(content)
+    if not usernames:
+        return []
+    return list(User.objects.filter(username__in=usernames))
@@ -3,19 +3,21 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils.translation import gettext_lazy as _
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
+from django.views.decorators.http import require_POST
 from django.urls import reverse_lazy, reverse
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.db.models import Q, Count, F
+from django.db.models import Q, F
 from django.core.paginator import Paginator
 from django.http import JsonResponse
 from django.utils import timezone
+from baybyway.db.routing import ReplicaReadsMixin, replica_reads
 
-from .models import ForumCategory, Topic, Post, TopicLike, PostLike, TopicDislike, PostDislike, ForumNotification, TopicSubscription, CategorySubscription
+from .models import ForumCategory, ForumPoll, ForumTag, Topic, Post, TopicLike, PostLike, TopicDislike, PostDislike, ForumNotification, TopicSubscription, CategorySubscription
 from .forms import TopicForm, PostForm, TopicSearchForm
 from accounts.models import ParentProfile
 
 
-class ForumIndexView(ListView):
+class ForumIndexView(ReplicaReadsMixin, ListView):
     """Главная страница форума - список категорий"""
     model = ForumCategory
     template_name = 'forum/index.html'
@@ -23,10 +25,8 @@ class ForumIndexView(ListView):
     paginate_by = 12
 
     def get_queryset(self):
-        return ForumCategory.objects.filter(is_active=True).annotate(
-            topics_count=Count('topics', filter=Q(topics__is_active=True)),
-            posts_count=Count('topics__posts', filter=Q(topics__is_active=True))
-        )
+        # topics_count и posts_count хранятся в категории
+        return ForumCategory.objects.filter(is_active=True)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -34,10 +34,13 @@ class ForumIndexView(ListView):
         context['total_topics'] = Topic.objects.filter(is_active=True).count()
         context['total_posts'] = Post.objects.count()
         context['recent_topics'] = Topic.objects.filter(is_active=True).order_by('-created_at')[:5]
+        from .services import ReputationService, TopicTagService
+        context['tag_cloud'] = TopicTagService.get_cloud()
+        context['top_contributors'] = ReputationService.leaderboard(limit=5)
         return context
 
 
-class CategoryDetailView(ListView):
+class CategoryDetailView(ReplicaReadsMixin, ListView):
     """Детальная страница категории - список тем"""
     model = Topic
     template_name = 'forum/category_detail.html'
@@ -49,7 +52,7 @@ class CategoryDetailView(ListView):
         queryset = Topic.objects.filter(
             category=self.category,
             is_active=True
-        ).select_related('author', 'category').prefetch_related('posts').order_by('-is_pinned', '-last_activity')
+        ).select_related('author', 'category').order_by('-is_pinned', '-last_activity')
 
         # Поиск
         search_query = self.request.GET.get('search')
@@ -72,35 +75,44 @@ class CategoryDetailView(ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['category'] = self.category
+        from .services import ReputationService
+        context['top_contributors'] = ReputationService.leaderboard(self.category, limit=5)
         context['search_form'] = TopicSearchForm(self.request.GET)
         context['current_status'] = self.request.GET.get('status', '')
         context['search_query'] = self.request.GET.get('search', '')
         return context
 
 
-class TopicDetailView(DetailView):
+class TopicDetailView(ReplicaReadsMixin, DetailView):
     """Детальная страница темы"""
     model = Topic
     template_name = 'forum/topic_detail.html'
     context_object_name = 'topic'
 
     def get_queryset(self):
-        return Topic.objects.filter(is_active=True).select_related(
-            'author', 'category'
-        ).prefetch_related('posts__author')
+        # Сообщения не предзагружаются: ветки собирает ThreadAssembler
+        return Topic.objects.filter(is_active=True).select_related('author', 'category', 'poll')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        topic = self.get_object()
+        topic = self.object
         
         # Увеличиваем счетчик просмотров
         topic.increment_views()
         
-        # Получаем сообщения с пагинацией
-        posts = topic.posts.all().order_by('created_at')
-        paginator = Paginator(posts, 10)
-        page_number = self.request.GET.get('page')
-        context['posts'] = paginator.get_page(page_number)
+        # Ветки обсуждения: страница корневых сообщений с ответами или одна ветка (?thread=<id>)
+        from .services import ThreadAssembler
+        assembler = ThreadAssembler(topic)
+        thread_root = None
+        thread_id = self.request.GET.get('thread')
+        if thread_id and thread_id.isdigit():
+            thread_root = assembler.get_queryset().filter(pk=thread_id).first()
+        if thread_root:
+            context['posts'] = None
+            context['thread_posts'] = assembler.get_subtree(thread_root)
+        else:
+            context['posts'], context['thread_posts'] = assembler.get_page(self.request.GET.get('page'))
+        context['thread_root'] = thread_root
         
         # Форма для нового сообщения (только для авторизованных)
         if self.request.user.is_authenticated:
@@ -117,16 +129,15 @@ class TopicDetailView(DetailView):
         # Проверяем, может ли пользователь создавать сообщения
         context['can_post'] = topic.can_user_post(self.request.user)
         
-        # Информация о тегах
-        context['topic_tags'] = topic.get_tags_list()
+        # Теги из индекса (со ссылками на страницы тегов)
+        context['topic_tags'] = ForumTag.objects.filter(topic_links__topic=topic).order_by('name')
         
-        # Информация об опросе
+        # Информация об опросе: варианты, счетчики и выбор пользователя одним запросом
         if hasattr(topic, 'poll'):
+            from .services import PollService
             context['poll'] = topic.poll
-            if self.request.user.is_authenticated:
-                context['user_voted'] = topic.poll.votes.filter(user=self.request.user).exists()
-            else:
-                context['user_voted'] = False
+            context['poll_results'] = PollService.get_results(topic.poll, self.request.user)
+            context['user_voted'] = context['poll_results']['has_voted']
         
         # Информация о репутации автора
         if self.request.user.is_authenticated:
@@ -153,26 +164,16 @@ class TopicDetailView(DetailView):
                 messages.error(request, _('Нельзя отвечать на сообщение из другой темы.'))
                 return redirect('forum:topic_detail', pk=topic.pk)
             
+            # Счетчики темы и категории обновляются в транзакции сохранения
             post.save()
             
-            # Обновляем счетчики темы
-            topic.update_posts_count()
-            topic.update_last_post()
-            
             # Отправляем уведомления подписчикам темы
             from notifications.services import NotificationService
             NotificationService.send_forum_topic_reply_notification(topic, post, request.user)
             
-            # Отправляем уведомления о цитировании
-            from .utils import extract_quoted_users_from_content
-            quoted_users = extract_quoted_users_from_content(post.content)
-            for quoted_user in quoted_users:
-                NotificationService.send_forum_post_quoted_notification(
-                    quoted_user=quoted_user,
-                    topic=topic,
-                    post=post,
-                    sender=request.user
-                )
+            # Отправляем уведомления о цитировании и упоминаниях
+            from .services import MentionService
+            MentionService.notify(post.content, topic, request.user, post=post)
             
             messages.success(request, _('Сообщение успешно добавлено!'))
             return redirect('forum:topic_detail', pk=topic.pk)
@@ -200,20 +201,14 @@ class TopicCreateView(LoginRequiredMixin, CreateView):
         
         topic.save()
         
-        # Инициализируем счетчики
-        topic.update_posts_count()
-        topic.update_last_post()
-        
-        # Обрабатываем теги
-        tags_text = form.cleaned_data.get('tags', '')
-        if tags_text:
-            tags_list = [tag.strip() for tag in tags_text.split(',') if tag.strip()]
-            topic.set_tags(tags_list)
-        
         # Отправляем уведомления подписчикам категории
         from notifications.services import NotificationService
         NotificationService.send_forum_topic_created_notification(topic, self.request.user)
         
+        # Уведомляем упомянутых в теме пользователей
+        from .services import MentionService
+        MentionService.notify(topic.content, topic, self.request.user)
+        
         messages.success(self.request, _('Тема успешно создана!'))
         return redirect('forum:topic_detail', pk=topic.pk)
 
@@ -297,10 +292,12 @@ class PostDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
 @login_required
 def like_topic(request, pk):
     """Лайк/анлайк темы"""
+    from .services import ReputationService
     topic = get_object_or_404(Topic, pk=pk, is_active=True)
     
     # Удаляем дизлайк, если он есть
-    TopicDislike.objects.filter(topic=topic, user=request.user).delete()
+    if TopicDislike.objects.filter(topic=topic, user=request.user).delete()[0]:
+        ReputationService.record(topic.author_id, 'topic_disliked', topic, actor=request.user, reverse=True)
     
     like, created = TopicLike.objects.get_or_create(
         topic=topic,
@@ -310,6 +307,7 @@ def like_topic(request, pk):
     if created:
         topic.likes_count += 1
         topic.save(update_fields=['likes_count'])
+        ReputationService.record(topic.author_id, 'topic_liked', topic, actor=request.user)
         return JsonResponse({
             'status': 'liked', 
             'likes_count': topic.likes.count(),
@@ -319,6 +317,7 @@ def like_topic(request, pk):
         like.delete()
         topic.likes_count -= 1
         topic.save(update_fields=['likes_count'])
+        ReputationService.record(topic.author_id, 'topic_liked', topic, actor=request.user, reverse=True)
         return JsonResponse({
             'status': 'unliked', 
             'likes_count': topic.likes.count(),
@@ -329,10 +328,12 @@ def like_topic(request, pk):
 @login_required
 def like_post(request, pk):
     """Лайк/анлайк сообщения"""
-    post = get_object_or_404(Post, pk=pk)
+    from .services import ReputationService
+    post = get_object_or_404(Post.objects.select_related('topic'), pk=pk)
     
     # Удаляем дизлайк, если он есть
-    PostDislike.objects.filter(post=post, user=request.user).delete()
+    if PostDislike.objects.filter(post=post, user=request.user).delete()[0]:
+        ReputationService.record(post.author_id, 'post_disliked', post.topic, post, actor=request.user, reverse=True)
     
     like, created = PostLike.objects.get_or_create(
         post=post,
@@ -342,6 +343,7 @@ def like_post(request, pk):
     if created:
         post.likes_count += 1
         post.save(update_fields=['likes_count'])
+        ReputationService.record(post.author_id, 'post_liked', post.topic, post, actor=request.user)
         return JsonResponse({
             'status': 'liked', 
             'likes_count': post.likes.count(),
@@ -351,6 +353,7 @@ def like_post(request, pk):
         like.delete()
         post.likes_count -= 1
         post.save(update_fields=['likes_count'])
+        ReputationService.record(post.author_id, 'post_liked', post.topic, post, actor=request.user, reverse=True)
         return JsonResponse({
             'status': 'unliked', 
             'likes_count': post.likes.count(),
@@ -361,10 +364,12 @@ def like_post(request, pk):
 @login_required
 def dislike_topic(request, pk):
     """Дизлайк/андизлайк темы"""
+    from .services import ReputationService
     topic = get_object_or_404(Topic, pk=pk, is_active=True)
     
     # Удаляем лайк, если он есть
-    TopicLike.objects.filter(topic=topic, user=request.user).delete()
+    if TopicLike.objects.filter(topic=topic, user=request.user).delete()[0]:
+        ReputationService.record(topic.author_id, 'topic_liked', topic, actor=request.user, reverse=True)
     
     dislike, created = TopicDislike.objects.get_or_create(
         topic=topic,
@@ -372,6 +377,7 @@ def dislike_topic(request, pk):
     )
     
     if created:
+        ReputationService.record(topic.author_id, 'topic_disliked', topic, actor=request.user)
         return JsonResponse({
             'status': 'disliked', 
             'likes_count': topic.likes.count(),
@@ -379,6 +385,7 @@ def dislike_topic(request, pk):
         })
     else:
         dislike.delete()
+        ReputationService.record(topic.author_id, 'topic_disliked', topic, actor=request.user, reverse=True)
         return JsonResponse({
             'status': 'undisliked', 
             'likes_count': topic.likes.count(),
@@ -389,10 +396,12 @@ def dislike_topic(request, pk):
 @login_required
 def dislike_post(request, pk):
     """Дизлайк/андизлайк сообщения"""
-    post = get_object_or_404(Post, pk=pk)
+    from .services import ReputationService
+    post = get_object_or_404(Post.objects.select_related('topic'), pk=pk)
     
     # Удаляем лайк, если он есть
-    PostLike.objects.filter(post=post, user=request.user).delete()
+    if PostLike.objects.filter(post=post, user=request.user).delete()[0]:
+        ReputationService.record(post.author_id, 'post_liked', post.topic, post, actor=request.user, reverse=True)
     
     dislike, created = PostDislike.objects.get_or_create(
         post=post,
@@ -400,6 +409,7 @@ def dislike_post(request, pk):
     )
     
     if created:
+        ReputationService.record(post.author_id, 'post_disliked', post.topic, post, actor=request.user)
         return JsonResponse({
             'status': 'disliked', 
             'likes_count': post.likes.count(),
@@ -407,6 +417,7 @@ def dislike_post(request, pk):
         })
     else:
         dislike.delete()
+        ReputationService.record(post.author_id, 'post_disliked', post.topic, post, actor=request.user, reverse=True)
         return JsonResponse({
             'status': 'undisliked', 
             'likes_count': post.likes.count(),
@@ -424,16 +435,25 @@ def mark_solution(request, pk):
     if request.user != topic.author:
         return JsonResponse({'status': 'error', 'message': 'Нет прав для выполнения действия'})
     
+    if post.is_solution:
+        return JsonResponse({'status': 'success', 'message': 'Сообщение отмечено как решение'})
+    
+    from .services import ReputationService
+    
     # Снимаем решение с других сообщений в теме
+    for previous in topic.posts.filter(is_solution=True).only('pk', 'author'):
+        ReputationService.record(previous.author_id, 'solution_marked', topic, previous, actor=request.user, reverse=True)
     topic.posts.update(is_solution=False)
     
     # Отмечаем текущее сообщение как решение
     post.is_solution = True
     post.save(update_fields=['is_solution'])
+    ReputationService.record(post.author_id, 'solution_marked', topic, post, actor=request.user)
     
     return JsonResponse({'status': 'success', 'message': 'Сообщение отмечено как решение'})
 
 
+@replica_reads
 def search_topics(request):
     """Поиск тем"""
     form = TopicSearchForm(request.GET)
@@ -476,6 +496,39 @@ def search_topics(request):
     return render(request, 'forum/search_results.html', context)
 
 
+@login_required
+@require_POST
+def vote_poll(request, pk):
+    """Голосование в опросе темы"""
+    from .services import PollService
+    poll = get_object_or_404(ForumPoll.objects.select_related('topic'), pk=pk, topic__is_active=True)
+    
+    try:
+        PollService.vote(poll, request.user, request.POST.getlist('option'))
+    except ValueError as e:
+        messages.error(request, str(e))
+    else:
+        messages.success(request, _('Ваш голос учтен!'))
+    
+    return redirect('forum:topic_detail', pk=poll.topic.pk)
+
+
+@replica_reads
+def tag_detail(request, slug):
+    """Темы с тегом"""
+    from .services import TopicTagService
+    tag = get_object_or_404(ForumTag, slug=slug)
+    topics, next_cursor = TopicTagService.get_tag_page(tag, request.GET.get('after'))
+    
+    return render(request, 'forum/tag_detail.html', {
+        'tag': tag,
+        'topics': topics,
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('after'),
+        'tag_cloud': TopicTagService.get_cloud(),
+    })
+
+
 @login_required
 def subscribe_to_topic(request, pk):
     """Подписаться на тему"""
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-19 11:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('healthcare', '0004_doctor_awards_doctor_consultation_duration_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='doctorreview',
+            index=models.Index(fields=['created_at'], name='healthcare__created_73b9c9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doctorreview',
+            index=models.Index(fields=['is_verified', 'created_at'], name='healthcare__is_veri_6fec93_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='facilityreview',
+            index=models.Index(fields=['created_at'], name='healthcare__created_100738_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='facilityreview',
+            index=models.Index(fields=['is_verified', 'created_at'], name='healthcare__is_veri_187c41_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('healthcare', '0005_review_moderation_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctor',
+            name='photo_hash',
+            field=models.CharField(blank=True, editable=False, max_length=32, verbose_name='Хеш миниатюр'),
+        ),
+    ]
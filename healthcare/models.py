@@ -3,6 +3,8 @@ from django.contrib.auth.models import User
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from baybyway.images import StoredImageNamesMixin
+
 
 class HealthcareCategory(models.Model):
     """Категория медицинского учреждения"""
@@ -57,7 +59,7 @@ class HealthcareFacility(models.Model):
         self.save(update_fields=['rating', 'reviews_count'])
 
 
-class Doctor(models.Model):
+class Doctor(StoredImageNamesMixin, models.Model):
     """Врач в медицинском учреждении"""
     facility = models.ForeignKey(HealthcareFacility, on_delete=models.CASCADE, related_name='doctors', verbose_name=_('Медицинское учреждение'))
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='doctor_profile', verbose_name=_('Пользователь'), null=True, blank=True)
@@ -73,6 +75,7 @@ class Doctor(models.Model):
     email = models.EmailField(blank=True, verbose_name=_('Email'))
     password = models.CharField(max_length=128, blank=True, verbose_name=_('Пароль'))
     photo = models.ImageField(upload_to='doctors/', blank=True, verbose_name=_('Фото'))
+    photo_hash = models.CharField(max_length=32, blank=True, editable=False, verbose_name=_('Хеш миниатюр'))
     bio = models.TextField(blank=True, verbose_name=_('Биография'))
     rating = models.DecimalField(max_digits=3, decimal_places=2, default=0, verbose_name=_('Рейтинг'))
     reviews_count = models.PositiveIntegerField(default=0, verbose_name=_('Количество отзывов'))
@@ -151,6 +154,11 @@ class DoctorReview(models.Model):
         verbose_name_plural = _('Отзывы о врачах')
         ordering = ['-created_at']
         unique_together = ['doctor', 'user']
+        indexes = [
+            # Очередь модерации: сортировка по дате, фильтр непроверенных
+            models.Index(fields=['created_at']),
+            models.Index(fields=['is_verified', 'created_at']),
+        ]
     
     def __str__(self):
         return f"Отзыв о {self.doctor.short_name} от {self.user.username}"
@@ -177,6 +185,11 @@ class FacilityReview(models.Model):
         verbose_name_plural = _('Отзывы о медицинских учреждениях')
         ordering = ['-created_at']
         unique_together = ['facility', 'user']
+        indexes = [
+            # Очередь модерации: сортировка по дате, фильтр непроверенных
+            models.Index(fields=['created_at']),
+            models.Index(fields=['is_verified', 'created_at']),
+        ]
     
     def __str__(self):
         return f"Отзыв о {self.facility.name} от {self.user.username}"
\ No newline at end of file
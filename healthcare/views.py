@@ -7,11 +7,15 @@ from django.views.generic import ListView, DetailView, CreateView, UpdateView, D
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.urls import reverse_lazy
 from django.db.models import Avg, Count
+from django.utils.formats import date_format
+from baybyway.db.routing import ReplicaReadsMixin, replica_reads
+from baybyway.timeseries import TimeSeriesService
 from .models import HealthcareCategory, HealthcareFacility, Doctor, DoctorReview, FacilityReview
+from accounts.roles import has_role, ROLE_DOCTOR
 from .forms import HealthcareFacilityForm, DoctorForm, DoctorReviewForm, FacilityReviewForm, DoctorLoginForm, DoctorProfileForm, DoctorPasswordForm
 
 
-class HealthcareIndexView(ListView):
+class HealthcareIndexView(ReplicaReadsMixin, ListView):
     """Главная страница медицинских учреждений"""
     model = HealthcareFacility
     template_name = 'healthcare/index.html'
@@ -27,7 +31,7 @@ class HealthcareIndexView(ListView):
         return context
 
 
-class HealthcareCategoryView(ListView):
+class HealthcareCategoryView(ReplicaReadsMixin, ListView):
     """Список учреждений по категории"""
     model = HealthcareFacility
     template_name = 'healthcare/category.html'
@@ -48,7 +52,7 @@ class HealthcareCategoryView(ListView):
         return context
 
 
-class HealthcareFacilityDetailView(DetailView):
+class HealthcareFacilityDetailView(ReplicaReadsMixin, DetailView):
     """Детальная страница медицинского учреждения"""
     model = HealthcareFacility
     template_name = 'healthcare/facility_detail.html'
@@ -78,7 +82,7 @@ class HealthcareFacilityDetailView(DetailView):
         return context
 
 
-class DoctorDetailView(DetailView):
+class DoctorDetailView(ReplicaReadsMixin, DetailView):
     """Детальная страница врача"""
     model = Doctor
     template_name = 'healthcare/doctor_detail.html'
@@ -171,7 +175,7 @@ def add_facility_review(request, facility_id):
     return render(request, 'healthcare/add_facility_review.html', context)
 
 
-class DoctorListView(ListView):
+class DoctorListView(ReplicaReadsMixin, ListView):
     """Список всех врачей"""
     model = Doctor
     template_name = 'healthcare/doctor_list.html'
@@ -213,7 +217,7 @@ class DoctorCreateView(LoginRequiredMixin, CreateView):
 def doctor_login(request):
     """Вход для врачей"""
     # Если врач уже авторизован, перенаправляем на дашборд
-    if request.user.is_authenticated and hasattr(request.user, 'doctor_profile'):
+    if has_role(request.user, ROLE_DOCTOR):
         return redirect('healthcare:doctor_dashboard')
     
     if request.method == 'POST':
@@ -270,10 +274,11 @@ def doctor_login(request):
 
 
 @login_required
+@replica_reads
 def doctor_dashboard(request):
     """Дашборд врача"""
     # Проверяем, что пользователь является врачом
-    if not hasattr(request.user, 'doctor_profile'):
+    if not has_role(request.user, ROLE_DOCTOR):
         messages.error(request, _('Доступ запрещен. Только для врачей.'))
         return redirect('healthcare:doctor_login')
     
@@ -292,16 +297,12 @@ def doctor_dashboard(request):
     recent_consultations = consultations.filter(created_at__gte=thirty_days_ago)
     recent_reviews = reviews.filter(created_at__gte=thirty_days_ago)
     
-    # Статистика по месяцам
-    monthly_stats = []
-    for i in range(6):
-        month_start = timezone.now() - timedelta(days=30*i)
-        month_end = month_start + timedelta(days=30)
-        month_consultations = consultations.filter(created_at__gte=month_start, created_at__lt=month_end).count()
-        monthly_stats.append({
-            'month': month_start.strftime('%B'),
-            'consultations': month_consultations
-        })
+    # Статистика по календарным месяцам, от текущего к прошлым
+    series = TimeSeriesService.get_series(consultations, f'doctor_consultations:{doctor.pk}')
+    monthly_stats = [
+        {'month': date_format(point['period'], 'F'), 'consultations': point['value']}
+        for point in reversed(series)
+    ]
     
     context = {
         'doctor': doctor,
@@ -320,7 +321,7 @@ def doctor_dashboard(request):
 @login_required
 def doctor_consultations(request):
     """Консультации врача"""
-    if not hasattr(request.user, 'doctor_profile'):
+    if not has_role(request.user, ROLE_DOCTOR):
         messages.error(request, _('Доступ запрещен. Только для врачей.'))
         return redirect('healthcare:doctor_login')
     
@@ -353,7 +354,7 @@ def doctor_consultations(request):
 @login_required
 def doctor_consultation_detail(request, consultation_id):
     """Детали консультации"""
-    if not hasattr(request.user, 'doctor_profile'):
+    if not has_role(request.user, ROLE_DOCTOR):
         messages.error(request, _('Доступ запрещен. Только для врачей.'))
         return redirect('healthcare:doctor_login')
     
@@ -383,7 +384,7 @@ def doctor_consultation_detail(request, consultation_id):
 @login_required
 def doctor_profile_edit(request):
     """Редактирование профиля врача"""
-    if not hasattr(request.user, 'doctor_profile'):
+    if not has_role(request.user, ROLE_DOCTOR):
         messages.error(request, _('Доступ запрещен. Только для врачей.'))
         return redirect('healthcare:doctor_login')
     
@@ -410,7 +411,7 @@ def doctor_profile_edit(request):
 @login_required
 def doctor_password_change(request):
     """Смена пароля врача"""
-    if not hasattr(request.user, 'doctor_profile'):
+    if not has_role(request.user, ROLE_DOCTOR):
         messages.error(request, _('Доступ запрещен. Только для врачей.'))
         return redirect('healthcare:doctor_login')
     
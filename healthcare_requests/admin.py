@@ -17,13 +17,14 @@ class HealthcareFacilityRequestAdmin(admin.ModelAdmin):
         'facility_name', 'contact_person', 'email', 'username'
     ]
     readonly_fields = [
-        'created_at', 'updated_at', 'processed_at'
+        'created_at', 'updated_at', 'processed_at', 'license_document_link', 'additional_documents_link'
     ]
+    raw_id_fields = ['facility']
     
     fieldsets = (
         ('Основная информация', {
             'fields': (
-                'facility_name', 'facility_type', 'description',
+                'facility_name', 'facility_type', 'facility', 'description',
                 'contact_person', 'email', 'phone'
             )
         }),
@@ -35,7 +36,10 @@ class HealthcareFacilityRequestAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
         ('Документы', {
-            'fields': ('license_document', 'additional_documents'),
+            'fields': (
+                'license_document', 'license_document_link',
+                'additional_documents', 'additional_documents_link'
+            ),
             'classes': ('collapse',)
         }),
         ('Обработка', {
@@ -48,7 +52,20 @@ class HealthcareFacilityRequestAdmin(admin.ModelAdmin):
     )
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('facility_type', 'processed_by')
+        return super().get_queryset(request).select_related('facility_type', 'facility', 'processed_by')
+    
+    def _document_link(self, obj, field):
+        if not obj.pk or not getattr(obj, field):
+            return '-'
+        return format_html('<a href="{}" target="_blank">{}</a>', obj.get_document_url(field), _('Открыть'))
+    
+    def license_document_link(self, obj):
+        return self._document_link(obj, 'license_document')
+    license_document_link.short_description = _('Просмотр лицензии')
+    
+    def additional_documents_link(self, obj):
+        return self._document_link(obj, 'additional_documents')
+    additional_documents_link.short_description = _('Просмотр документов')
     
     def save_model(self, request, obj, form, change):
         if not change:  # Если это новая заявка
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.6 on 2026-10-19 11:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def link_requests_to_facilities(apps, schema_editor):
+    """Связывает заявки с учреждениями каталога по совпадению названия"""
+    HealthcareFacility = apps.get_model('healthcare', 'HealthcareFacility')
+    HealthcareFacilityRequest = apps.get_model('healthcare_requests', 'HealthcareFacilityRequest')
+
+    facility_ids = {}
+    for facility_id, name in HealthcareFacility.objects.order_by('-id').values_list('id', 'name'):
+        # При одинаковых названиях побеждает самое раннее учреждение
+        facility_ids[name] = facility_id
+
+    requests = list(HealthcareFacilityRequest.objects.filter(facility__isnull=True))
+    for facility_request in requests:
+        facility_request.facility_id = facility_ids.get(facility_request.facility_name)
+    HealthcareFacilityRequest.objects.bulk_update(
+        [facility_request for facility_request in requests if facility_request.facility_id],
+        ['facility'],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('healthcare', '0005_review_moderation_indexes'),
+        ('healthcare_requests', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='healthcarefacilityrequest',
+            name='facility',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='facility_requests', to='healthcare.healthcarefacility', verbose_name='Учреждение в каталоге'),
+        ),
+        migrations.RunPython(link_requests_to_facilities, migrations.RunPython.noop),
+    ]
@@ -1,12 +1,20 @@
+from datetime import timedelta
+
 from django.db import models
 from django.contrib.auth.models import User
+from django.conf import settings
+from django.utils import timezone
+from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
-from healthcare.models import HealthcareCategory
+from healthcare.models import HealthcareCategory, HealthcareFacility, Doctor, DoctorReview
 
 
 class HealthcareFacilityRequest(models.Model):
     """Заявка медицинского учреждения на добавление в каталог"""
     
+    # Закрытые файлы, которые отдаются только через request_document
+    DOCUMENT_FIELDS = ('license_document', 'additional_documents')
+    
     STATUS_CHOICES = [
         ('pending', _('Ожидает рассмотрения')),
         ('approved', _('Одобрена')),
@@ -22,6 +30,14 @@ class HealthcareFacilityRequest(models.Model):
         verbose_name=_('Тип учреждения')
     )
     description = models.TextField(verbose_name=_('Описание учреждения'))
+    facility = models.ForeignKey(
+        HealthcareFacility,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='facility_requests',
+        verbose_name=_('Учреждение в каталоге')
+    )
     
     # Контактная информация
     contact_person = models.CharField(max_length=100, verbose_name=_('Контактное лицо'))
@@ -86,6 +102,38 @@ class HealthcareFacilityRequest(models.Model):
     def __str__(self):
         return f"{self.facility_name} - {self.get_status_display()}"
     
+    def get_document_url(self, field):
+        """Ссылка на документ заявки через проверку прав"""
+        return reverse('healthcare_requests:request_document', args=[self.pk, field])
+    
+    def save(self, *args, **kwargs):
+        # Одобренная заявка связывается с учреждением каталога по названию
+        if self.status == 'approved' and self.facility_id is None:
+            self.facility = HealthcareFacility.objects.filter(name=self.facility_name).order_by('id').first()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and self.facility_id is not None:
+                kwargs['update_fields'] = set(update_fields) | {'facility'}
+        super().save(*args, **kwargs)
+    
+    def get_doctors(self):
+        """Врачи учреждения (пусто, пока заявка не связана с каталогом)"""
+        if self.facility_id is None:
+            return Doctor.objects.none()
+        return Doctor.objects.filter(facility_id=self.facility_id)
+    
+    def get_consultations(self):
+        """Консультации врачей учреждения"""
+        from consultant.models import Consultation
+        if self.facility_id is None:
+            return Consultation.objects.none()
+        return Consultation.objects.filter(doctor__facility_id=self.facility_id)
+    
+    def get_doctor_reviews(self):
+        """Отзывы о врачах учреждения"""
+        if self.facility_id is None:
+            return DoctorReview.objects.none()
+        return DoctorReview.objects.filter(doctor__facility_id=self.facility_id)
+    
     @property
     def is_pending(self):
         return self.status == 'pending'
@@ -137,33 +185,32 @@ class FacilityDashboard(models.Model):
     
     def update_statistics(self):
         """Обновляет статистику учреждения"""
-        from healthcare.models import Doctor, DoctorReview
+        facility_request = self.facility_request
         
-        # Подсчитываем врачей
-        self.total_doctors = Doctor.objects.filter(
-            facility__name=self.facility_request.facility_name
-        ).count()
+        self.total_doctors = facility_request.get_doctors().count()
+        self.total_consultations = facility_request.get_consultations().count()
         
-        # Подсчитываем консультации
-        from consultant.models import Consultation
-        self.total_consultations = Consultation.objects.filter(
-            doctor__facility__name=self.facility_request.facility_name
-        ).count()
-        
-        # Подсчитываем отзывы и рейтинг
-        reviews = DoctorReview.objects.filter(
-            doctor__facility__name=self.facility_request.facility_name
+        # Количество отзывов и рейтинг одним запросом
+        reviews = facility_request.get_doctor_reviews().aggregate(
+            total=models.Count('id'),
+            avg_rating=models.Avg('rating')
         )
-        self.total_reviews = reviews.count()
-        
-        if reviews.exists():
-            self.average_rating = reviews.aggregate(
-                avg_rating=models.Avg('rating')
-            )['avg_rating'] or 0
-        else:
-            self.average_rating = 0
+        self.total_reviews = reviews['total'] or 0
+        self.average_rating = reviews['avg_rating'] or 0
         
-        self.save()
+        self.save(update_fields=[
+            'total_doctors', 'total_consultations', 'total_reviews', 'average_rating',
+            'last_activity', 'updated_at'
+        ])
+    
+    def refresh_statistics(self, force=False):
+        """
+        Пересчитывает статистику, только если снимок устарел
+        (старше FACILITY_DASHBOARD_CACHE_TIMEOUT секунд).
+        """
+        timeout = getattr(settings, 'FACILITY_DASHBOARD_CACHE_TIMEOUT', 300)
+        if force or self.updated_at is None or self.updated_at < timezone.now() - timedelta(seconds=timeout):
+            self.update_statistics()
 
 
 class FacilityNotification(models.Model):
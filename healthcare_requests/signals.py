@@ -0,0 +1,25 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from healthcare.models import HealthcareFacility
+
+from .models import FacilityDashboard, HealthcareFacilityRequest
+
+
+@receiver(post_save, sender=HealthcareFacility)
+def link_approved_requests(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Связывает одобренные заявки без учреждения с учреждением, которое
+    создали или переименовали после одобрения заявки.
+    """
+    if raw or (update_fields is not None and 'name' not in update_fields):
+        return
+    request_ids = list(HealthcareFacilityRequest.objects.filter(
+        status='approved', facility__isnull=True, facility_name=instance.name,
+    ).values_list('pk', flat=True))
+    if not request_ids:
+        return
+    HealthcareFacilityRequest.objects.filter(pk__in=request_ids).update(facility=instance)
+    # Снимок статистики был посчитан без врачей учреждения
+    for dashboard in FacilityDashboard.objects.filter(facility_request_id__in=request_ids):
+        dashboard.update_statistics()
@@ -1,3 +1,161 @@
-from django.test import TestCase
+import importlib
+import shutil
+import tempfile
+from datetime import date, timedelta
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from consultant.models import Consultation
+from healthcare.models import Doctor, DoctorReview, HealthcareCategory, HealthcareFacility
+from support.models import SupportProfile
+
+from .models import FacilityDashboard, HealthcareFacilityRequest
+
+link_requests_to_facilities = importlib.import_module(
+    'healthcare_requests.migrations.0002_healthcarefacilityrequest_facility'
+).link_requests_to_facilities
+
+
+class FacilityRequestTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = HealthcareCategory.objects.create(name='Клиники', slug='clinics', icon='bi-hospital', color='primary')
+
+    @classmethod
+    def create_request(cls, facility_name='Клиника Здоровье', username='clinic', **kwargs):
+        return HealthcareFacilityRequest.objects.create(
+            facility_name=facility_name, facility_type=cls.category, description='-', contact_person='Айгуль',
+            email='clinic@example.com', phone='1', address='Бишкек', city='Бишкек', username=username,
+            password='-', **kwargs,
+        )
+
+    @classmethod
+    def create_facility(cls, name='Клиника Здоровье'):
+        return HealthcareFacility.objects.create(category=cls.category, name=name, address='Бишкек', phone='1')
+
+
+class FacilityLinkTest(FacilityRequestTestCase):
+    def test_backfill_links_by_name_to_earliest_facility(self):
+        first = self.create_facility()
+        self.create_facility()
+        matching = self.create_request()
+        unknown = self.create_request(facility_name='Нет в каталоге', username='other')
+
+        link_requests_to_facilities(apps, None)
+        matching.refresh_from_db()
+        unknown.refresh_from_db()
+        self.assertEqual(matching.facility, first)
+        self.assertIsNone(unknown.facility)
+
+    def test_approval_links_existing_facility(self):
+        facility = self.create_facility()
+        facility_request = self.create_request()
+        self.assertIsNone(facility_request.facility)
+        facility_request.status = 'approved'
+        facility_request.save(update_fields=['status'])
+        facility_request.refresh_from_db()
+        self.assertEqual(facility_request.facility, facility)
+
+    def test_facility_created_after_approval_is_linked(self):
+        facility_request = self.create_request(status='approved')
+        pending = self.create_request(username='pending')
+        self.assertIsNone(facility_request.facility)
+
+        facility = self.create_facility()
+        facility_request.refresh_from_db()
+        pending.refresh_from_db()
+        self.assertEqual(facility_request.facility, facility)
+        self.assertIsNone(pending.facility)
+
+    def test_renamed_facility_is_linked(self):
+        facility = self.create_facility(name='Старое название')
+        Doctor.objects.create(facility=facility, first_name='Айгуль', last_name='Асанова', specialization='-',
+                              experience_years=1)
+        facility_request = self.create_request(status='approved')
+        dashboard = FacilityDashboard.objects.create(facility_request=facility_request)
+
+        facility.name = 'Клиника Здоровье'
+        facility.save(update_fields=['name'])
+        facility_request.refresh_from_db()
+        self.assertEqual(facility_request.facility, facility)
+        self.assertEqual(list(facility_request.get_doctors()), list(facility.doctors.all()))
+        dashboard.refresh_from_db()
+        self.assertEqual(dashboard.total_doctors, 1)
+
+    def test_saves_without_name_skip_lookup(self):
+        facility = self.create_facility()
+        with self.assertNumQueries(1):
+            facility.save(update_fields=['rating'])
+
+
+class FacilityAnalyticsTest(FacilityRequestTestCase):
+    def test_doctor_counts_are_annotated(self):
+        facility = self.create_facility()
+        self.create_request(status='approved')
+        User.objects.create_user('clinic', password='x')
+        busy = Doctor.objects.create(facility=facility, first_name='Айгуль', last_name='Асанова',
+                                     specialization='-', experience_years=1)
+        idle = Doctor.objects.create(facility=facility, first_name='Бакыт', last_name='Бекова',
+                                     specialization='-', experience_years=1)
+        other = Doctor.objects.create(facility=self.create_facility('Другая'), first_name='Вера', last_name='Волкова',
+                                      specialization='-', experience_years=1)
+        parent = User.objects.create_user('parent')
+        for doctor in (busy, busy, other):
+            Consultation.objects.create(parent=parent, doctor=doctor, title='-', description='-')
+        old = Consultation.objects.create(parent=parent, doctor=busy, title='-', description='-')
+        Consultation.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=31))
+        for index, doctor in enumerate((busy, busy, busy, other)):
+            DoctorReview.objects.create(doctor=doctor, user=User.objects.create_user(f'reviewer{index}'), rating=5,
+                                        title='-', comment='-', visit_date=date(2025, 3, 10))
+
+        self.client.login(username='clinic', password='x')
+        response = self.client.get(reverse('healthcare_requests:facility_analytics'))
+        self.assertEqual(
+            [(stat['doctor'], stat['consultations_count'], stat['reviews_count'])
+             for stat in response.context['doctor_stats']],
+            [(busy, 2, 3), (idle, 0, 0)],
+        )
+
+
+@override_settings(PROTECTED_MEDIA_ACCEL_PREFIX='')
+class RequestDocumentTest(FacilityRequestTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.agent = User.objects.create_user('agent', password='x')
+        SupportProfile.objects.create(user=cls.agent, employee_id='S1', department='Поддержка', phone='1')
+        cls.clinic = User.objects.create_user('clinic', password='x')
+        User.objects.create_user('stranger', password='x')
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.facility_request = self.create_request()
+        self.facility_request.license_document.save('license.pdf', ContentFile(b'%PDF-1.4'))
+        self.url = self.facility_request.get_document_url('license_document')
+
+    def test_support_agent_opens_document_from_review_page(self):
+        self.client.login(username='agent', password='x')
+        response = self.client.get(reverse('support:facility_request_detail', args=[self.facility_request.pk]))
+        self.assertContains(response, f'href="{self.url}"')
+        self.assertNotContains(response, '/media/facility_requests/')
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF-1.4')
+
+    def test_facility_account_opens_own_document(self):
+        self.client.login(username='clinic', password='x')
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_other_users_get_404(self):
+        self.client.login(username='stranger', password='x')
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.client.login(username='agent', password='x')
+        self.assertEqual(self.client.get(self.url.replace('license_document', 'password')).status_code, 404)
@@ -22,4 +22,7 @@ urlpatterns = [
     # Админские страницы
     path('admin/requests/', views.admin_request_list, name='admin_request_list'),
     path('admin/requests/<int:request_id>/', views.admin_request_detail, name='admin_request_detail'),
+    
+    # Закрытые документы заявок
+    path('requests/<int:request_id>/documents/<str:field>/', views.request_document, name='request_document'),
 ]
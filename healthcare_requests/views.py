@@ -5,16 +5,22 @@ from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.models import User
 from django.contrib import messages
 from django.core.paginator import Paginator
-from django.db.models import Q
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.utils.translation import gettext_lazy as _
-from django.http import JsonResponse
+from django.http import JsonResponse, Http404
 from django.core.mail import send_mail
 from django.conf import settings
 from django.utils import timezone
+from datetime import timedelta
+from django.utils.formats import date_format
 from .models import HealthcareFacilityRequest, FacilityDashboard, FacilityNotification
 from .forms import HealthcareFacilityRequestForm, FacilityRequestReviewForm, FacilityLoginForm
-from healthcare.models import HealthcareFacility, Doctor
+from healthcare.models import HealthcareFacility, DoctorReview
 from consultant.models import Consultation
+from accounts.roles import has_role, ROLE_FACILITY, ROLE_SUPPORT
+from baybyway.db.routing import replica_reads
+from baybyway.timeseries import TimeSeriesService
 
 
 def facility_request_create(request):
@@ -61,15 +67,8 @@ def facility_login(request):
         return redirect('healthcare_requests:facility_login')
     
     # Если пользователь уже авторизован, перенаправляем на дашборд
-    if request.user.is_authenticated:
-        try:
-            facility_request = HealthcareFacilityRequest.objects.get(
-                username=request.user.username,
-                status='approved'
-            )
-            return redirect('healthcare_requests:facility_dashboard')
-        except HealthcareFacilityRequest.DoesNotExist:
-            pass
+    if has_role(request.user, ROLE_FACILITY):
+        return redirect('healthcare_requests:facility_dashboard')
     
     if request.method == 'POST':
         form = FacilityLoginForm(request.POST)
@@ -143,8 +142,8 @@ def facility_dashboard(request):
         facility_request=facility_request
     )
     
-    # Обновляем статистику
-    dashboard.update_statistics()
+    # Обновляем снимок статистики, если он устарел
+    dashboard.refresh_statistics(force=created)
     
     # Получаем последние уведомления
     notifications = FacilityNotification.objects.filter(
@@ -154,27 +153,36 @@ def facility_dashboard(request):
     # Получаем последние консультации (если есть связанные объекты)
     recent_consultations = []
     try:
-        recent_consultations = Consultation.objects.filter(
-            doctor__facility__name=facility_request.facility_name
-        ).select_related('parent', 'doctor').order_by('-created_at')[:5]
+        recent_consultations = facility_request.get_consultations().select_related(
+            'parent', 'doctor'
+        ).order_by('-created_at')[:5]
     except Exception as e:
         print(f"Ошибка при получении консультаций: {e}")
     
     # Получаем врачей учреждения (если есть связанные объекты)
     doctors = []
     try:
-        doctors = Doctor.objects.filter(
-            facility__name=facility_request.facility_name
-        ).select_related('facility')[:10]
+        doctors = facility_request.get_doctors().select_related('facility')[:10]
     except Exception as e:
         print(f"Ошибка при получении врачей: {e}")
     
+    # Консультации врачей учреждения по календарным месяцам, от текущего к прошлым
+    series = TimeSeriesService.get_series(
+        facility_request.get_consultations(),
+        f'facility_consultations:{facility_request.pk}'
+    )
+    monthly_stats = [
+        {'month': date_format(point['period'], 'F'), 'consultations': point['value']}
+        for point in reversed(series)
+    ]
+    
     context = {
         'facility_request': facility_request,
         'dashboard': dashboard,
         'notifications': notifications,
         'recent_consultations': recent_consultations,
         'doctors': doctors,
+        'monthly_stats': monthly_stats,
         'title': _('Дашборд учреждения')
     }
     
@@ -293,9 +301,7 @@ def facility_doctors(request):
         return redirect('healthcare_requests:facility_login')
     
     # Получаем врачей учреждения
-    doctors = Doctor.objects.filter(
-        facility__name=facility_request.facility_name
-    ).select_related('facility').order_by('-created_at')
+    doctors = facility_request.get_doctors().select_related('facility').order_by('-created_at')
     
     # Пагинация
     paginator = Paginator(doctors, 10)
@@ -329,9 +335,9 @@ def facility_consultations(request):
         return redirect('healthcare_requests:facility_login')
     
     # Получаем консультации учреждения
-    consultations = Consultation.objects.filter(
-        doctor__facility__name=facility_request.facility_name
-    ).select_related('parent', 'doctor').order_by('-created_at')
+    consultations = facility_request.get_consultations().select_related(
+        'parent', 'doctor'
+    ).order_by('-created_at')
     
     # Фильтрация по статусу
     status_filter = request.GET.get('status', '')
@@ -354,6 +360,7 @@ def facility_consultations(request):
 
 
 @login_required
+@replica_reads
 def facility_analytics(request):
     """Аналитика учреждения"""
     # Проверяем, что пользователь авторизован и является медицинским учреждением
@@ -375,33 +382,36 @@ def facility_analytics(request):
         facility_request=facility_request
     )
     
-    # Обновляем статистику
-    dashboard.update_statistics()
-    
-    # Получаем врачей учреждения
-    doctors = Doctor.objects.filter(
-        facility__name=facility_request.facility_name
-    ).select_related('facility')
-    
-    # Получаем консультации за последние 30 дней
-    from datetime import datetime, timedelta
-    thirty_days_ago = datetime.now() - timedelta(days=30)
+    # Обновляем снимок статистики, если он устарел
+    dashboard.refresh_statistics(force=created)
     
-    recent_consultations = Consultation.objects.filter(
-        doctor__facility__name=facility_request.facility_name,
+    # Консультации за последние 30 дней
+    thirty_days_ago = timezone.now() - timedelta(days=30)
+    recent_consultations = facility_request.get_consultations().filter(
         created_at__gte=thirty_days_ago
-    ).select_related('parent', 'doctor')
+    ).select_related('parent', 'doctor').order_by('-created_at')
     
-    # Статистика по врачам
-    doctor_stats = []
-    for doctor in doctors:
-        doctor_consultations = recent_consultations.filter(doctor=doctor)
-        doctor_stats.append({
+    # Статистика по врачам одним запросом: счетчики считаются подзапросами
+    # по индексированным внешним ключам
+    doctors = facility_request.get_doctors().select_related('facility').annotate(
+        recent_consultations_count=Coalesce(Subquery(
+            Consultation.objects.filter(doctor=OuterRef('pk'), created_at__gte=thirty_days_ago)
+            .order_by().values('doctor').annotate(total=Count('pk')).values('total')
+        ), 0),
+        doctor_reviews_count=Coalesce(Subquery(
+            DoctorReview.objects.filter(doctor=OuterRef('pk'))
+            .order_by().values('doctor').annotate(total=Count('pk')).values('total')
+        ), 0),
+    ).order_by('last_name', 'first_name')
+    doctor_stats = [
+        {
             'doctor': doctor,
-            'consultations_count': doctor_consultations.count(),
+            'consultations_count': doctor.recent_consultations_count,
             'average_rating': doctor.rating,
-            'reviews_count': doctor.reviews.count() if hasattr(doctor, 'reviews') else 0
-        })
+            'reviews_count': doctor.doctor_reviews_count,
+        }
+        for doctor in doctors
+    ]
     
     context = {
         'facility_request': facility_request,
@@ -453,4 +463,22 @@ def facility_notifications(request):
         'title': _('Уведомления')
     }
     
-    return render(request, 'healthcare_requests/facility_notifications.html', context)
\ No newline at end of file
+    return render(request, 'healthcare_requests/facility_notifications.html', context)
+
+
+@login_required
+def request_document(request, request_id, field):
+    """Документы заявки: для администраторов, техподдержки и аккаунта самого учреждения"""
+    from baybyway.protected_media import serve_protected
+    
+    if field not in HealthcareFacilityRequest.DOCUMENT_FIELDS:
+        raise Http404
+    request_obj = get_object_or_404(HealthcareFacilityRequest, id=request_id)
+    allowed = (
+        request.user.is_staff
+        or has_role(request.user, ROLE_SUPPORT)
+        or request_obj.username == request.user.username
+    )
+    if not allowed:
+        raise Http404
+    return serve_protected(request, getattr(request_obj, field))
@@ -24,6 +24,7 @@ class NotificationType(models.TextChoices):
     FORUM_TOPIC_SOLUTION = 'forum_topic_solution', _('Тема отмечена как решение')
     FORUM_TOPIC_DELETED = 'forum_topic_deleted', _('Тема удалена')
     FORUM_POST_QUOTED = 'forum_post_quoted', _('Вас процитировали в форуме')
+    FORUM_USER_MENTIONED = 'forum_user_mentioned', _('Вас упомянули в форуме')
     
     # Уведомления об отзывах
     REVIEW_LEFT = 'review_left', _('Оставлен отзыв')
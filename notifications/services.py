@@ -1,7 +1,7 @@
 from django.contrib.auth.models import User
 from django.utils.translation import gettext_lazy as _
 from django.template import Template, Context
-from django.core.mail import send_mail
+from django.core.mail import send_mail, send_mass_mail
 from django.conf import settings
 from django.utils import timezone
 from typing import Optional, Dict, Any, List
@@ -53,6 +53,92 @@ class NotificationService:
         
         return notification
     
+    @staticmethod
+    def create_bulk_notifications(
+        recipient_ids: List[int],
+        notification_type: str,
+        title: str,
+        message: str,
+        sender: Optional[User] = None,
+        priority: str = NotificationPriority.NORMAL,
+        related_object_id: Optional[int] = None,
+        related_object_type: Optional[str] = None,
+        extra_data: Optional[Dict[str, Any]] = None
+    ) -> List[Notification]:
+        """
+        Создать одинаковые уведомления для многих получателей.
+
+        Настройки читаются одним запросом, уведомления создаются одним
+        bulk_create, письма отправляются через одно соединение.
+        """
+        recipient_ids = set(recipient_ids)
+        if not recipient_ids:
+            return []
+        
+        settings_by_user = {
+            settings_obj.user_id: settings_obj
+            for settings_obj in NotificationSettings.objects.filter(
+                user_id__in=recipient_ids
+            ).select_related('user')
+        }
+        missing_ids = recipient_ids - set(settings_by_user)
+        if missing_ids:
+            # Настройки по умолчанию только для существующих пользователей
+            NotificationSettings.objects.bulk_create(
+                [NotificationSettings(user=user) for user in User.objects.filter(id__in=missing_ids)],
+                ignore_conflicts=True
+            )
+            settings_by_user.update({
+                settings_obj.user_id: settings_obj
+                for settings_obj in NotificationSettings.objects.filter(
+                    user_id__in=missing_ids
+                ).select_related('user')
+            })
+        
+        recipients = [
+            settings_obj for settings_obj in settings_by_user.values()
+            if NotificationService._should_send_notification(notification_type, settings_obj)
+        ]
+        created_from = timezone.now()
+        notifications = Notification.objects.bulk_create([
+            Notification(
+                recipient_id=settings_obj.user_id,
+                sender=sender,
+                notification_type=notification_type,
+                priority=priority,
+                title=title,
+                message=message,
+                related_object_id=related_object_id,
+                related_object_type=related_object_type,
+                extra_data=extra_data or {}
+            )
+            for settings_obj in recipients
+        ])
+        
+        email_recipients = [
+            settings_obj.user for settings_obj in recipients
+            if settings_obj.user.email and NotificationService._should_send_email(notification_type, settings_obj)
+        ]
+        if email_recipients:
+            try:
+                send_mass_mail([
+                    (f"[BaybyWay] {title}", message, settings.DEFAULT_FROM_EMAIL, [user.email])
+                    for user in email_recipients
+                ], fail_silently=False)
+                # bulk_create не везде возвращает id (MySQL) - отмечаем по признакам
+                Notification.objects.filter(
+                    recipient_id__in=[user.id for user in email_recipients],
+                    notification_type=notification_type,
+                    related_object_id=related_object_id,
+                    related_object_type=related_object_type,
+                    created_at__gte=created_from,
+                    is_email_sent=False
+                ).update(is_email_sent=True)
+            except Exception as e:
+                print(f"Ошибка отправки email: {e}")
+        
+        return notifications
+    
     @staticmethod
     def _should_send_notification(notification_type: str, settings: NotificationSettings) -> bool:
         """Проверить, нужно ли отправлять уведомление"""
@@ -187,32 +273,26 @@ class NotificationService:
         from forum.models import TopicSubscription
         
         # Получаем всех подписчиков темы (кроме автора сообщения)
-        subscribers = TopicSubscription.objects.filter(
+        subscriber_ids = TopicSubscription.objects.filter(
             topic=topic,
             is_active=True
-        ).exclude(user=sender).select_related('user')
+        ).exclude(user=sender).values_list('user_id', flat=True)
         
-        notifications = []
-        for subscription in subscribers:
-            notification = NotificationService.create_notification(
-                recipient=subscription.user,
-                notification_type=NotificationType.FORUM_TOPIC_REPLY,
-                title=f"Новый ответ в теме '{topic.title}'",
-                message=f"Пользователь {sender.get_full_name() or sender.username} ответил в теме '{topic.title}'",
-                sender=sender,
-                related_object_id=topic.id,
-                related_object_type='forum_topic',
-                extra_data={
-                    'topic_id': topic.id,
-                    'post_id': post.id,
-                    'topic_title': topic.title,
-                    'category_name': topic.category.name
-                }
-            )
-            if notification:
-                notifications.append(notification)
-        
-        return notifications
+        return NotificationService.create_bulk_notifications(
+            recipient_ids=list(subscriber_ids),
+            notification_type=NotificationType.FORUM_TOPIC_REPLY,
+            title=f"Новый ответ в теме '{topic.title}'",
+            message=f"Пользователь {sender.get_full_name() or sender.username} ответил в теме '{topic.title}'",
+            sender=sender,
+            related_object_id=topic.id,
+            related_object_type='forum_topic',
+            extra_data={
+                'topic_id': topic.id,
+                'post_id': post.id,
+                'topic_title': topic.title,
+                'category_name': topic.category.name
+            }
+        )
     
     @staticmethod
     def send_forum_topic_created_notification(
@@ -223,31 +303,25 @@ class NotificationService:
         from forum.models import CategorySubscription
         
         # Получаем всех подписчиков категории (кроме автора темы)
-        subscribers = CategorySubscription.objects.filter(
+        subscriber_ids = CategorySubscription.objects.filter(
             category=topic.category,
             is_active=True
-        ).exclude(user=sender).select_related('user')
-        
-        notifications = []
-        for subscription in subscribers:
-            notification = NotificationService.create_notification(
-                recipient=subscription.user,
-                notification_type=NotificationType.FORUM_TOPIC_CREATED,
-                title=f"Новая тема в категории '{topic.category.name}'",
-                message=f"Пользователь {sender.get_full_name() or sender.username} создал новую тему '{topic.title}' в категории '{topic.category.name}'",
-                sender=sender,
-                related_object_id=topic.id,
-                related_object_type='forum_topic',
-                extra_data={
-                    'topic_id': topic.id,
-                    'topic_title': topic.title,
-                    'category_name': topic.category.name
-                }
-            )
-            if notification:
-                notifications.append(notification)
+        ).exclude(user=sender).values_list('user_id', flat=True)
         
-        return notifications
+        return NotificationService.create_bulk_notifications(
+            recipient_ids=list(subscriber_ids),
+            notification_type=NotificationType.FORUM_TOPIC_CREATED,
+            title=f"Новая тема в категории '{topic.category.name}'",
+            message=f"Пользователь {sender.get_full_name() or sender.username} создал новую тему '{topic.title}' в категории '{topic.category.name}'",
+            sender=sender,
+            related_object_id=topic.id,
+            related_object_type='forum_topic',
+            extra_data={
+                'topic_id': topic.id,
+                'topic_title': topic.title,
+                'category_name': topic.category.name
+            }
+        )
     
     @staticmethod
     def send_forum_post_quoted_notification(
@@ -278,6 +352,55 @@ class NotificationService:
             }
         )
     
+    @staticmethod
+    def send_forum_quote_notifications(
+        quoted_user_ids: List[int],
+        topic,
+        post,
+        sender: User
+    ):
+        """Массово уведомить процитированных пользователей"""
+        return NotificationService.create_bulk_notifications(
+            recipient_ids=[user_id for user_id in quoted_user_ids if user_id != sender.id],
+            notification_type=NotificationType.FORUM_POST_QUOTED,
+            title=f"Вас процитировали в теме '{topic.title}'",
+            message=f"Пользователь {sender.get_full_name() or sender.username} процитировал ваше сообщение в теме '{topic.title}'",
+            sender=sender,
+            related_object_id=topic.id,
+            related_object_type='forum_topic',
+            extra_data={
+                'topic_id': topic.id,
+                'post_id': post.id if post else None,
+                'topic_title': topic.title,
+                'category_name': topic.category.name,
+                'quoted_post_id': post.id if post else None
+            }
+        )
+    
+    @staticmethod
+    def send_forum_mention_notifications(
+        mentioned_user_ids: List[int],
+        topic,
+        post,
+        sender: User
+    ):
+        """Массово уведомить упомянутых пользователей"""
+        return NotificationService.create_bulk_notifications(
+            recipient_ids=[user_id for user_id in mentioned_user_ids if user_id != sender.id],
+            notification_type=NotificationType.FORUM_USER_MENTIONED,
+            title=f"Вас упомянули в теме '{topic.title}'",
+            message=f"Пользователь {sender.get_full_name() or sender.username} упомянул вас в теме '{topic.title}'",
+            sender=sender,
+            related_object_id=topic.id,
+            related_object_type='forum_topic',
+            extra_data={
+                'topic_id': topic.id,
+                'post_id': post.id if post else None,
+                'topic_title': topic.title,
+                'category_name': topic.category.name
+            }
+        )
+    
     @staticmethod
     def send_review_notification(
         recipient: User,
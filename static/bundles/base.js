@@ -0,0 +1,59 @@
+function handleNavbarScroll() {
+const navbar = document.getElementById('mainNavbar');
+if (navbar) {
+if (window.scrollY > 50) {
+navbar.classList.add('scrolled');
+} else {
+navbar.classList.remove('scrolled');
+}
+}
+}
+function initNavbarEffects() {
+window.addEventListener('scroll', handleNavbarScroll);
+handleNavbarScroll();
+document.querySelectorAll('a[href^="#"]').forEach(anchor => {
+anchor.addEventListener('click', function (e) {
+e.preventDefault();
+const target = document.querySelector(this.getAttribute('href'));
+if (target) {
+target.scrollIntoView({
+behavior: 'smooth',
+block: 'start'
+});
+}
+});
+});
+const navLinks = document.querySelectorAll('.nav-link');
+navLinks.forEach(link => {
+link.addEventListener('mouseenter', function() {
+this.style.transform = 'translateY(-2px)';
+});
+link.addEventListener('mouseleave', function() {
+this.style.transform = 'translateY(0)';
+});
+});
+}
+document.addEventListener('DOMContentLoaded', initNavbarEffects);
+function updateNotificationCount() {
+const countElement = document.getElementById('notification-count');
+if (!countElement) {
+return;
+}
+fetch('/notifications/api/count/')
+.then(response => response.json())
+.then(data => {
+countElement.textContent = data.count;
+if (data.count > 0) {
+countElement.style.display = 'inline';
+} else {
+countElement.style.display = 'none';
+}
+})
+.catch(error => console.error('Ошибка обновления счетчика уведомлений:', error));
+}
+document.addEventListener('DOMContentLoaded', function() {
+if (document.getElementById('notification-count')) {
+updateNotificationCount();
+setInterval(updateNotificationCount, 30000);
+}
+});
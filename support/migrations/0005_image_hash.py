@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 12:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('support', '0004_delete_reviewdeletionnotification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='supportprofile',
+            name='avatar_hash',
+            field=models.CharField(blank=True, editable=False, max_length=32, verbose_name='Хеш миниатюр'),
+        ),
+    ]
@@ -3,8 +3,10 @@ from django.contrib.auth.models import User
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from baybyway.images import StoredImageNamesMixin
 
-class SupportProfile(models.Model):
+
+class SupportProfile(StoredImageNamesMixin, models.Model):
     """Профиль сотрудника техподдержки"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, verbose_name=_('Пользователь'))
     employee_id = models.CharField(max_length=20, unique=True, verbose_name=_('ID сотрудника'))
@@ -14,6 +16,7 @@ class SupportProfile(models.Model):
     position = models.CharField(max_length=100, blank=True, verbose_name=_('Должность'))
     bio = models.TextField(blank=True, verbose_name=_('О себе'))
     avatar = models.ImageField(upload_to='support/avatars/', blank=True, null=True, verbose_name=_('Аватар'))
+    avatar_hash = models.CharField(max_length=32, blank=True, editable=False, verbose_name=_('Хеш миниатюр'))
     birth_date = models.DateField(blank=True, null=True, verbose_name=_('Дата рождения'))
     address = models.TextField(blank=True, verbose_name=_('Адрес'))
     emergency_contact = models.CharField(max_length=100, blank=True, verbose_name=_('Контакт для экстренных случаев'))
@@ -97,6 +100,34 @@ class SupportTicket(models.Model):
     def __str__(self):
         return f"#{self.id} - {self.title}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем состояние для инкрементального обновления статистики дашборда
+        instance._counted_state = (instance.__dict__.get('status'), instance.__dict__.get('priority'))
+        return instance
+
+    def _on_counted_state_change(self, old_state, new_state):
+        from django.db import transaction
+        from .services import DashboardMetricsService
+
+        if old_state != new_state:
+            transaction.on_commit(
+                lambda: DashboardMetricsService.apply_ticket_change(old_state, new_state)
+            )
+        self._counted_state = new_state
+
+    def save(self, *args, **kwargs):
+        old_state = getattr(self, '_counted_state', None)
+        super().save(*args, **kwargs)
+        self._on_counted_state_change(old_state, (self.status, self.priority))
+
+    def delete(self, *args, **kwargs):
+        old_state = getattr(self, '_counted_state', (self.status, self.priority))
+        result = super().delete(*args, **kwargs)
+        self._on_counted_state_change(old_state, None)
+        return result
+
 
 class TicketComment(models.Model):
     """Комментарии к тикетам"""
@@ -0,0 +1,223 @@
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import CharField, Count, Q, Value
+from django.utils import timezone
+
+
+class DashboardMetricsService:
+    """Статистика дашборда техподдержки"""
+
+    CACHE_PREFIX = 'support_dashboard:'
+
+    @staticmethod
+    def _counter_names():
+        from .models import SupportTicket
+
+        names = ['total_tickets', 'approved_writers_count', 'approved_facilities_count']
+        names += [f'status_{value}' for value, label in SupportTicket.STATUS_CHOICES]
+        names += [f'priority_{value}' for value, label in SupportTicket.PRIORITY_CHOICES]
+        return names
+
+    @classmethod
+    def _key(cls, name):
+        return f'{cls.CACHE_PREFIX}{name}'
+
+    @classmethod
+    def compute_counters(cls):
+        """Считает все счетчики - по одному агрегирующему запросу на таблицу"""
+        from .models import SupportTicket
+        from accounts.models import WriterProfile
+        from healthcare_requests.models import HealthcareFacilityRequest
+
+        ticket_aggregates = {'total_tickets': Count('id')}
+        for value, label in SupportTicket.STATUS_CHOICES:
+            ticket_aggregates[f'status_{value}'] = Count('id', filter=Q(status=value))
+        for value, label in SupportTicket.PRIORITY_CHOICES:
+            ticket_aggregates[f'priority_{value}'] = Count('id', filter=Q(priority=value))
+
+        counters = SupportTicket.objects.aggregate(**ticket_aggregates)
+        counters.update(WriterProfile.objects.aggregate(
+            approved_writers_count=Count('id', filter=Q(is_approved=True, is_active=True))
+        ))
+        counters.update(HealthcareFacilityRequest.objects.aggregate(
+            approved_facilities_count=Count('id', filter=Q(status='approved'))
+        ))
+        return counters
+
+    @classmethod
+    def get_counters(cls):
+        """Возвращает счетчики из кеша, пересчитывая их при отсутствии"""
+        names = cls._counter_names()
+        cached = cache.get_many([cls._key(name) for name in names])
+        if len(cached) == len(names):
+            return {name: cached[cls._key(name)] for name in names}
+
+        counters = cls.compute_counters()
+        cache.set_many(
+            {cls._key(name): value for name, value in counters.items()},
+            getattr(settings, 'SUPPORT_DASHBOARD_CACHE_TIMEOUT', 120)
+        )
+        return counters
+
+    @classmethod
+    def get_stats(cls):
+        """Статистика в формате, который ожидает шаблон дашборда"""
+        counters = cls.get_counters()
+        return {
+            'total_tickets': counters['total_tickets'],
+            'open_tickets': counters['status_open'],
+            'in_progress_tickets': counters['status_in_progress'],
+            'resolved_tickets': counters['status_resolved'],
+            'high_priority_tickets': counters['priority_high'],
+            'urgent_tickets': counters['priority_urgent'],
+            'approved_writers_count': counters['approved_writers_count'],
+            'approved_facilities_count': counters['approved_facilities_count'],
+        }
+
+    @classmethod
+    def apply_ticket_change(cls, old_state, new_state):
+        """
+        Инкрементально обновляет счетчики тикетов.
+
+        old_state и new_state - пары (status, priority) до и после изменения,
+        None для созданного или удаленного тикета.
+        """
+        deltas = Counter()
+        if old_state:
+            status, priority = old_state
+            deltas['total_tickets'] -= 1
+            deltas[f'status_{status}'] -= 1
+            deltas[f'priority_{priority}'] -= 1
+        if new_state:
+            status, priority = new_state
+            deltas['total_tickets'] += 1
+            deltas[f'status_{status}'] += 1
+            deltas[f'priority_{priority}'] += 1
+
+        for name, delta in deltas.items():
+            if not delta:
+                continue
+            try:
+                cache.incr(cls._key(name), delta)
+            except ValueError:
+                # Часть счетчиков уже вытеснена - пересчитаем при следующем чтении
+                cls.invalidate()
+                return
+
+    @classmethod
+    def invalidate(cls):
+        """Сбрасывает закешированную статистику"""
+        cache.delete_many([cls._key(name) for name in cls._counter_names()])
+
+
+def _start_of_day(day):
+    """Начало дня day в текущем часовом поясе"""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+class ReviewModerationQueue:
+    """
+    Общая очередь отзывов о врачах и учреждениях для модерации.
+
+    Объединение, сортировка и LIMIT выполняются в базе (UNION с
+    дискриминатором типа), а сами отзывы подгружаются пачкой только для
+    текущей страницы. Объект совместим с django.core.paginator.Paginator.
+    """
+
+    REVIEW_TYPE_DOCTOR = 'doctor'
+    REVIEW_TYPE_FACILITY = 'facility'
+
+    def __init__(self, review_type=None, unverified=False, date_from=None, date_to=None):
+        self.review_type = review_type
+        self.unverified = unverified
+        self.date_from = date_from
+        self.date_to = date_to
+        self._count = None
+
+    def _filter(self, queryset):
+        if self.unverified:
+            queryset = queryset.filter(is_verified=False)
+        # Границы - моменты времени, а не created_at__date: обертка DATE(CONVERT_TZ(...))
+        # не дала бы использовать индекс (is_verified, created_at)
+        if self.date_from:
+            queryset = queryset.filter(created_at__gte=_start_of_day(self.date_from))
+        if self.date_to:
+            queryset = queryset.filter(created_at__lt=_start_of_day(self.date_to + timedelta(days=1)))
+        return queryset
+
+    def _branches(self):
+        """Подзапросы (тип, queryset) с учетом фильтра по типу"""
+        from healthcare.models import DoctorReview, FacilityReview
+
+        branches = []
+        if self.review_type in (None, self.REVIEW_TYPE_DOCTOR):
+            branches.append((self.REVIEW_TYPE_DOCTOR, self._filter(DoctorReview.objects.all())))
+        if self.review_type in (None, self.REVIEW_TYPE_FACILITY):
+            branches.append((self.REVIEW_TYPE_FACILITY, self._filter(FacilityReview.objects.all())))
+        return branches
+
+    def count(self):
+        if self._count is None:
+            self._count = sum(queryset.count() for review_type, queryset in self._branches())
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def _page_keys(self, offset, limit):
+        """Возвращает (тип, id) отзывов страницы одним запросом"""
+        return [(review_type, review_id) for created_at, review_id, review_type in self._page_query(offset, limit)]
+
+    def _page_query(self, offset, limit):
+        """Объединенный запрос страницы: строки (created_at, id, тип)"""
+        branches = self._branches()
+        parts = []
+        for review_type, queryset in branches:
+            part = queryset.order_by().annotate(
+                review_type=Value(review_type, output_field=CharField())
+            ).values_list('created_at', 'id', 'review_type')
+            if len(branches) > 1 and connection.features.supports_slicing_ordering_in_compound:
+                # Каждая ветка отдает не больше offset + limit строк по индексу
+                part = part.order_by('-created_at', '-id')[:offset + limit]
+            parts.append(part)
+
+        merged = parts[0]
+        if len(parts) > 1:
+            merged = merged.union(*parts[1:], all=True)
+        return merged.order_by('-created_at', '-id')[offset:offset + limit]
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            raise TypeError('ReviewModerationQueue supports only slicing')
+        offset = key.start or 0
+        limit = (key.stop if key.stop is not None else self.count()) - offset
+        if limit <= 0:
+            return []
+        return self._load(self._page_keys(offset, limit))
+
+    def _load(self, keys):
+        """Подгружает отзывы и их объекты пачкой, сохраняя порядок очереди"""
+        from healthcare.models import DoctorReview, FacilityReview
+
+        doctor_ids = [review_id for review_type, review_id in keys if review_type == self.REVIEW_TYPE_DOCTOR]
+        facility_ids = [review_id for review_type, review_id in keys if review_type == self.REVIEW_TYPE_FACILITY]
+
+        loaded = {}
+        if doctor_ids:
+            for review in DoctorReview.objects.select_related('doctor', 'user').filter(id__in=doctor_ids):
+                review.review_type = self.REVIEW_TYPE_DOCTOR
+                review.target_name = review.doctor.full_name
+                review.target_category = 'Врач'
+                loaded[(self.REVIEW_TYPE_DOCTOR, review.id)] = review
+        if facility_ids:
+            for review in FacilityReview.objects.select_related('facility__category', 'user').filter(id__in=facility_ids):
+                review.review_type = self.REVIEW_TYPE_FACILITY
+                review.target_name = review.facility.name
+                review.target_category = review.facility.category.name
+                loaded[(self.REVIEW_TYPE_FACILITY, review.id)] = review
+
+        return [loaded[key] for key in keys if key in loaded]
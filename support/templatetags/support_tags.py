@@ -1,13 +1,13 @@
 from django import template
 
+from accounts.roles import has_role, ROLE_SUPPORT
+
 register = template.Library()
 
 @register.filter
 def is_support_staff(user):
     """Проверяет, является ли пользователь сотрудником техподдержки"""
-    if not user or not user.is_authenticated:
-        return False
-    return hasattr(user, 'supportprofile') and user.supportprofile.is_active
+    return has_role(user, ROLE_SUPPORT)
 
 
 
@@ -1,3 +1,115 @@
+from datetime import date, datetime, time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.utils import timezone
+
+from healthcare.models import Doctor, DoctorReview, FacilityReview, HealthcareCategory, HealthcareFacility
+
+from .services import ReviewModerationQueue
+
+
+class ReviewModerationQueueDateFilterTest(TestCase):
+    """Фильтр очереди по датам включает обе границы в текущем часовом поясе"""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = HealthcareCategory.objects.create(name='Клиники', slug='clinics', icon='bi-hospital', color='primary')
+        facility = HealthcareFacility.objects.create(category=category, name='Клиника', address='Бишкек', phone='1')
+        doctor = Doctor.objects.create(
+            facility=facility, first_name='Айгуль', last_name='Асанова', specialization='Педиатр', experience_years=5,
+        )
+        moments = {
+            'before': datetime(2025, 3, 9, 23, 59),
+            'first': datetime(2025, 3, 10, 0, 0),
+            'last': datetime(2025, 3, 12, 23, 59),
+            'after': datetime(2025, 3, 13, 0, 0),
+        }
+        cls.reviews = {}
+        for title, moment in moments.items():
+            # Отзыв уникален для пары (врач, пользователь)
+            user = User.objects.create_user(f'reviewer_{title}')
+            review = DoctorReview.objects.create(
+                doctor=doctor, user=user, rating=5, title=title, comment='-', visit_date=moment.date(),
+            )
+            # auto_now_add не дает задать время при создании
+            DoctorReview.objects.filter(pk=review.pk).update(created_at=timezone.make_aware(moment))
+            cls.reviews[title] = review
+
+    def test_bounds_are_inclusive_days(self):
+        queue = ReviewModerationQueue(date_from=date(2025, 3, 10), date_to=date(2025, 3, 12))
+        self.assertEqual(queue.count(), 2)
+        self.assertEqual([review.title for review in queue[0:10]], ['last', 'first'])
+
+    def test_filter_uses_datetime_range(self):
+        queue = ReviewModerationQueue(date_from=date(2025, 3, 10), date_to=date(2025, 3, 12))
+        review_type, queryset = queue._branches()[0]
+        sql = str(queryset.query)
+        self.assertNotIn('django_datetime_cast_date', sql)
+        self.assertEqual(
+            queryset.filter(pk=self.reviews['first'].pk).get().created_at,
+            timezone.make_aware(datetime.combine(date(2025, 3, 10), time.min)),
+        )
+
+
+class ReviewModerationQueueUnionTest(TestCase):
+    """Отзывы о врачах и учреждениях в одной очереди"""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = HealthcareCategory.objects.create(name='Клиники', slug='clinics', icon='bi-hospital', color='primary')
+        facility = HealthcareFacility.objects.create(category=category, name='Клиника', address='Бишкек', phone='1')
+        doctor = Doctor.objects.create(
+            facility=facility, first_name='Айгуль', last_name='Асанова', specialization='Педиатр', experience_years=5,
+        )
+        # (модель, день марта, проверен): дни чередуются между ветками
+        reviews = [
+            (DoctorReview, 1, False), (FacilityReview, 2, True), (DoctorReview, 3, True),
+            (FacilityReview, 4, False), (FacilityReview, 5, False), (DoctorReview, 6, False),
+        ]
+        cls.expected = []
+        for number, (model, day, verified) in enumerate(reviews):
+            target = {'doctor': doctor} if model is DoctorReview else {'facility': facility}
+            review = model.objects.create(
+                user=User.objects.create_user(f'reviewer{number}'), rating=4, title=f'{day}', comment='-',
+                visit_date=date(2025, 3, day), is_verified=verified, **target,
+            )
+            model.objects.filter(pk=review.pk).update(created_at=timezone.make_aware(datetime(2025, 3, day, 12)))
+            cls.expected.append(('doctor' if model is DoctorReview else 'facility', review.pk, verified))
+        cls.expected.reverse()
+
+    def keys(self, reviews):
+        return [(review.review_type, review.pk) for review in reviews]
+
+    def test_merged_pages_are_ordered_newest_first(self):
+        queue = ReviewModerationQueue()
+        self.assertEqual(queue.count(), 6)
+        everything = [(review_type, pk) for review_type, pk, verified in self.expected]
+        self.assertEqual(self.keys(queue[0:10]), everything)
+        self.assertEqual(self.keys(queue[2:5]), everything[2:5])
+        self.assertEqual(queue[4:4], [])
+
+    def test_type_discriminator_loads_targets(self):
+        reviews = ReviewModerationQueue()[0:6]
+        self.assertIsInstance(reviews[0], DoctorReview)
+        self.assertEqual((reviews[0].target_name, reviews[0].target_category), (reviews[0].doctor.full_name, 'Врач'))
+        self.assertIsInstance(reviews[1], FacilityReview)
+        self.assertEqual((reviews[1].target_name, reviews[1].target_category), ('Клиника', 'Клиники'))
+
+    def test_filters_apply_to_both_branches(self):
+        unverified = [(review_type, pk) for review_type, pk, verified in self.expected if not verified]
+        self.assertEqual(self.keys(ReviewModerationQueue(unverified=True)[0:10]), unverified)
+        facility = ReviewModerationQueue(review_type='facility')
+        self.assertEqual(facility.count(), 3)
+        self.assertEqual({review.review_type for review in facility[0:10]}, {'facility'})
 
-# Create your tests here.
+    def test_each_branch_is_limited_to_page_end(self):
+        queue = ReviewModerationQueue()
+        with mock.patch.object(connection.features, 'supports_slicing_ordering_in_compound', True):
+            sql = str(queue._page_query(2, 3).query)
+        # Ветки UNION отдают не больше offset + limit строк, итог - страницу
+        self.assertEqual(sql.count('LIMIT 5'), 2)
+        self.assertIn('UNION ALL', sql)
+        self.assertTrue(sql.endswith('LIMIT 3 OFFSET 2'))
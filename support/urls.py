@@ -22,6 +22,7 @@ urlpatterns = [
     
     # Модерация форума
     path('forum/', views.forum_moderation, name='forum_moderation'),
+    path('forum/posts/bulk/', views.bulk_moderate_forum_posts, name='bulk_moderate_forum_posts'),
     path('forum/posts/<int:post_id>/approve/', views.approve_forum_post, name='approve_forum_post'),
     path('forum/posts/<int:post_id>/delete/', views.delete_forum_post, name='delete_forum_post'),
     path('forum/posts/<int:post_id>/edit/', views.edit_forum_post, name='edit_forum_post'),
@@ -5,12 +5,15 @@ from django.contrib import messages
 from django.core.paginator import Paginator
 from django.db.models import Q, Count
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.views.generic import ListView, DetailView, CreateView, UpdateView
 from django.urls import reverse_lazy
 from django.http import JsonResponse
+from django.views.decorators.http import require_POST
 from django.utils.translation import gettext_lazy as _
 
 from .models import SupportTicket, TicketComment, SupportProfile, SupportNotification, SupportDashboard
+from .services import DashboardMetricsService, ReviewModerationQueue
 from .forms import (
     SupportTicketForm, TicketCommentForm, TicketAssignmentForm, 
     SupportDashboardForm, DisputeTicketForm, FacilityRequestReviewForm,
@@ -18,14 +21,16 @@ from .forms import (
 )
 from healthcare_requests.models import HealthcareFacilityRequest
 from forum.models import Post
+from forum.services import PostModerationQueue, PostModerationService
 from blog.models import BlogPost
 from healthcare.models import DoctorReview, FacilityReview
 from accounts.models import WriterApplication, WriterProfile
+from accounts.roles import has_role, ROLE_SUPPORT
 
 
 def is_support_staff(user):
     """Проверяет, является ли пользователь сотрудником техподдержки"""
-    return hasattr(user, 'supportprofile') and user.supportprofile.is_active
+    return has_role(user, ROLE_SUPPORT)
 
 
 class SupportDashboardView(LoginRequiredMixin, UserPassesTestMixin, ListView):
@@ -63,22 +68,13 @@ class SupportDashboardView(LoginRequiredMixin, UserPassesTestMixin, ListView):
         elif assigned == 'unassigned':
             queryset = queryset.filter(assigned_to__isnull=True)
         
-        return queryset.order_by('-created_at')
+        return queryset.select_related('created_by', 'assigned_to__user').order_by('-created_at')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
         # Статистика
-        context['stats'] = {
-            'total_tickets': SupportTicket.objects.count(),
-            'open_tickets': SupportTicket.objects.filter(status='open').count(),
-            'in_progress_tickets': SupportTicket.objects.filter(status='in_progress').count(),
-            'resolved_tickets': SupportTicket.objects.filter(status='resolved').count(),
-            'high_priority_tickets': SupportTicket.objects.filter(priority='high').count(),
-            'urgent_tickets': SupportTicket.objects.filter(priority='urgent').count(),
-            'approved_writers_count': WriterProfile.objects.filter(is_approved=True, is_active=True).count(),
-            'approved_facilities_count': HealthcareFacilityRequest.objects.filter(status='approved').count(),
-        }
+        context['stats'] = DashboardMetricsService.get_stats()
         
         # Заявки учреждений
         context['facility_requests'] = HealthcareFacilityRequest.objects.filter(
@@ -99,7 +95,7 @@ class SupportDashboardView(LoginRequiredMixin, UserPassesTestMixin, ListView):
         # Одобренные учреждения
         context['approved_facilities'] = HealthcareFacilityRequest.objects.filter(
             status='approved'
-        ).order_by('-created_at')[:5]
+        ).select_related('facility_type').order_by('-created_at')[:5]
         
         # Последние тикеты
         context['recent_tickets'] = SupportTicket.objects.order_by('-created_at')[:10]
@@ -224,10 +220,12 @@ def facility_request_detail(request, request_id):
         if action == 'approve':
             facility_request.status = 'approved'
             facility_request.save()
+            DashboardMetricsService.invalidate()
             messages.success(request, _('Заявка одобрена'))
         elif action == 'reject':
             facility_request.status = 'rejected'
             facility_request.save()
+            DashboardMetricsService.invalidate()
             messages.success(request, _('Заявка отклонена'))
     
     return render(request, 'support/facility_request_detail.html', {
@@ -239,28 +237,43 @@ def facility_request_detail(request, request_id):
 @user_passes_test(is_support_staff)
 def forum_moderation(request):
     """Модерация форума"""
-    # Показываем все посты, так как в модели нет поля is_approved
-    posts = Post.objects.all().order_by('-created_at')
-    
-    paginator = Paginator(posts, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    status = request.GET.get('status', '')
+    queue = PostModerationQueue(status=status or None, page_size=20)
+    posts, next_cursor = queue.get_page(request.GET.get('after'))
     
     return render(request, 'support/forum_moderation.html', {
-        'page_obj': page_obj,
-        'posts': page_obj,
+        'posts': posts,
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('after'),
+        'current_status': status,
+        'bulk_actions': PostModerationService.ACTIONS,
     })
 
 
+@login_required
+@user_passes_test(is_support_staff)
+@require_POST
+def bulk_moderate_forum_posts(request):
+    """Массовая модерация сообщений форума"""
+    action = request.POST.get('action')
+    post_ids = [int(post_id) for post_id in request.POST.getlist('post_ids') if post_id.isdigit()]
+    
+    if action not in PostModerationService.ACTIONS or not post_ids:
+        messages.error(request, _('Выберите сообщения и действие'))
+    else:
+        affected = PostModerationService.apply(action, post_ids)
+        messages.success(request, _('Обработано сообщений: {}').format(affected))
+    
+    return redirect('support:forum_moderation')
+
+
 @login_required
 @user_passes_test(is_support_staff)
 def approve_forum_post(request, post_id):
     """Одобрение поста форума"""
     post = get_object_or_404(Post, id=post_id)
-    # В данной модели нет поля is_approved, поэтому просто отмечаем как решение
-    post.is_solution = True
-    post.save()
-    messages.success(request, _('Пост отмечен как решение'))
+    PostModerationService.apply(PostModerationService.ACTION_APPROVE, [post.id])
+    messages.success(request, _('Пост одобрен'))
     return redirect('support:forum_moderation')
 
 
@@ -269,8 +282,7 @@ def approve_forum_post(request, post_id):
 def delete_forum_post(request, post_id):
     """Удаление поста форума"""
     post = get_object_or_404(Post, id=post_id)
-    topic = post.topic
-    post.delete()
+    PostModerationService.apply(PostModerationService.ACTION_DELETE, [post.id])
     messages.success(request, _('Пост удален'))
     return redirect('support:forum_moderation')
 
@@ -506,39 +518,47 @@ def support_profile_edit(request):
     })
 
 
+def _parse_date_param(value):
+    """Разбирает дату из GET-параметра, игнорируя некорректные значения"""
+    try:
+        return parse_date(value or '')
+    except ValueError:
+        return None
+
+
 @login_required
 @user_passes_test(is_support_staff)
 def review_moderation(request):
     """Модерация отзывов"""
-    # Получаем все отзывы (о врачах и учреждениях)
-    doctor_reviews = DoctorReview.objects.all()
-    facility_reviews = FacilityReview.objects.all()
-    
-    # Объединяем отзывы в один список с типом
-    all_reviews = []
-    for review in doctor_reviews:
-        review.review_type = 'doctor'
-        review.target_name = f"{review.doctor.last_name} {review.doctor.first_name} {review.doctor.middle_name}".strip()
-        review.target_category = 'Врач'
-        all_reviews.append(review)
-    
-    for review in facility_reviews:
-        review.review_type = 'facility'
-        review.target_name = review.facility.name
-        review.target_category = review.facility.category.name
-        all_reviews.append(review)
-    
-    # Сортируем по дате создания
-    all_reviews.sort(key=lambda x: x.created_at, reverse=True)
-    
-    # Пагинация
-    paginator = Paginator(all_reviews, 20)
+    review_type = request.GET.get('type')
+    if review_type not in (ReviewModerationQueue.REVIEW_TYPE_DOCTOR, ReviewModerationQueue.REVIEW_TYPE_FACILITY):
+        review_type = None
+    
+    # Отзывы о врачах и учреждениях объединяются и пагинируются в базе
+    queue = ReviewModerationQueue(
+        review_type=review_type,
+        unverified=request.GET.get('unverified') == '1',
+        date_from=_parse_date_param(request.GET.get('date_from')),
+        date_to=_parse_date_param(request.GET.get('date_to')),
+    )
+    
+    paginator = Paginator(queue, 20)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
+    # Параметры фильтров для ссылок пагинации
+    filter_params = request.GET.copy()
+    filter_params.pop('page', None)
+    
     return render(request, 'support/review_moderation.html', {
         'page_obj': page_obj,
         'reviews': page_obj,
+        'is_paginated': page_obj.has_other_pages(),
+        'filter_query': filter_params.urlencode(),
+        'current_type': review_type or '',
+        'current_unverified': queue.unverified,
+        'current_date_from': request.GET.get('date_from', ''),
+        'current_date_to': request.GET.get('date_to', ''),
     })
 
 
@@ -635,12 +655,16 @@ def approve_review(request, review_id):
     review_type = request.GET.get('type', 'facility')
     
     if review_type == 'doctor':
-        review = get_object_or_404(DoctorReview, id=review_id)
+        review = get_object_or_404(DoctorReview.objects.select_related('doctor'), id=review_id)
+        target = review.doctor
     else:
-        review = get_object_or_404(FacilityReview, id=review_id)
+        review = get_object_or_404(FacilityReview.objects.select_related('facility'), id=review_id)
+        target = review.facility
     
-    review.is_approved = True
-    review.save()
+    review.is_verified = True
+    review.save(update_fields=['is_verified', 'updated_at'])
+    # Рейтинг считается только по проверенным отзывам
+    target.update_rating()
     messages.success(request, _('Отзыв одобрен'))
     return redirect('support:review_moderation')
 
@@ -728,6 +752,7 @@ def writer_application_detail(request, application_id):
                 is_approved=True,
                 is_active=True
             )
+            DashboardMetricsService.invalidate()
             
             # Отправляем уведомление пользователю (если есть система уведомлений)
             try: